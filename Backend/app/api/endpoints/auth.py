@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status 
 from sqlalchemy.orm import Session 
+from sqlalchemy.ext.asyncio import AsyncSession 
 from datetime import timedelta 
 from typing import Dict, Any 
 
-from ...services.database import get_db 
+from ...services.database import get_db, get_async_db 
 from ...models.pydantic_models import (
     UserRegistrationRequest,
     UserLoginRequest,
@@ -11,7 +12,7 @@ from ...models.pydantic_models import (
     UserProfileResponse,
     UserInDB
 ) 
-from ...services import user_manager 
+from ...services import user_manager, profile_cache 
 from ...core import auth 
 from ...core.security import get_current_active_user 
 
@@ -19,14 +20,24 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 
 router = APIRouter(tags=["Authentication"]) 
 
+# Seconds a client is asked to wait when the password hashing pool is saturated.
+PASSWORD_HASHING_RETRY_AFTER = 1
+
+def password_hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many authentication requests in progress. Please retry shortly.",
+        headers={"Retry-After": str(PASSWORD_HASHING_RETRY_AFTER)}
+    )
+
 @router.post(
     "/register",
     status_code=status.HTTP_201_CREATED,
     summary="Register a new user"
 )
-def register(
+async def register(
     user_data: UserRegistrationRequest,
-    db: Session = Depends(get_db) 
+    db: AsyncSession = Depends(get_async_db) 
 ) -> Dict[str, str]:
     if user_data.password != user_data.password_confirmation:
         raise HTTPException(
@@ -35,7 +46,7 @@ def register(
         )
     
     try: 
-        user_manager.create_user(
+        await user_manager.acreate_user(
             db=db, 
             user_data=user_data
         ) 
@@ -44,6 +55,8 @@ def register(
     
     except HTTPException as e:
         raise e 
+    except auth.PasswordHashingBusy:
+        raise password_hashing_busy() 
     except Exception as e:
         print(f"Server Error during registration: {e}") 
         raise HTTPException(
@@ -57,12 +70,15 @@ def register(
     response_model=Token,
     summary="AUthenticate user and generate JWT token"
 ) 
-def login(user_data: UserLoginRequest, db: Session = Depends(get_db)) -> Token:
-    user = user_manager.authenticate_user(
-        db=db,
-        user_name=user_data.user_name,
-        password=user_data.password
-    )
+async def login(user_data: UserLoginRequest, db: AsyncSession = Depends(get_async_db)) -> Token:
+    try:
+        user = await user_manager.aauthenticate_user(
+            db=db,
+            user_name=user_data.user_name,
+            password=user_data.password
+        )
+    except auth.PasswordHashingBusy:
+        raise password_hashing_busy() 
 
     if not user:
         raise HTTPException(
@@ -91,9 +107,9 @@ def get_profile(
     current_user: UserInDB = Depends(get_current_active_user), 
     db: Session = Depends(get_db)
 ) -> UserProfileResponse:
-    profile_data = user_manager.get_user_profile(db, int(current_user.id))
+    snapshot = profile_cache.get_profile_snapshot(db, int(current_user.id))
 
-    if not profile_data:
+    if not snapshot:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User profile not found.") 
     
-    return UserProfileResponse.from_db_model(profile_data)
\ No newline at end of file
+    return snapshot.profile
\ No newline at end of file
@@ -1,58 +1,57 @@
+import json 
 import logging 
-import re 
 import uuid 
 from datetime import datetime 
-from typing import Dict, Any, List  
+from typing import Dict, Any, List, AsyncIterator, Tuple  
 
 from fastapi import APIRouter, Depends, HTTPException, status 
-from sqlalchemy.orm import Session 
-
-from ...services.database import get_db 
-from ...chains.main_chain import get_movie_assistant_chain 
+from fastapi.responses import StreamingResponse 
+from sqlalchemy.ext.asyncio import AsyncSession 
+
+from ...services.database import get_async_db, AsyncSessionLocal 
+from ...chains import registry 
+from ...chains.main_chain import (
+    astream_movie_assistant,
+    STAGE_CONTEXT_SUMMARIZED,
+    STAGE_INTENT_PARSED,
+    STAGE_SHOWS_RETRIEVED,
+    STAGE_INTERACTION_SAVED
+) 
 from ...core.security import get_current_active_user 
 from ...models.database_models import User as UserORM 
-from ...models.pydantic_models import ChatMessageRequest, ChatMessageResponse 
+from ...models.pydantic_models import ChatMessageRequest, ChatMessageResponse, RetrievedShow 
 
 router = APIRouter(tags=["Chat"]) 
 logger = logging.getLogger(__name__) 
 
 
-def extract_suggested_titles(retrieved_docs_raw: str) -> List[str]:
-    """
-    Parses the raw retrieved documents string to extract a list of show titles 
-    for the API response.
-    
-    Expected format (from main_chain.py): [Title: <Title>, Sccore: <Score>, Show ID: <ID>]
-    """
-    if not retrieved_docs_raw or "Title:" not in retrieved_docs_raw:
-        return []
+CHAIN_UNAVAILABLE_RETRY_AFTER = int(registry.CONFIG_CHECK_INTERVAL) 
 
-    # REGEX to extract show Title (group 1)
-    pattern = re.compile(r"\[Title: (.*?), Score: .*?, Show ID: (\d+)\]") 
-    
-    suggested_titles: List[str] = []
-    
-    # Iterate over all matches in the raw string
-    for match in pattern.finditer(retrieved_docs_raw):
-        title = match.group(1).strip()
-        if title:
-            suggested_titles.append(title)
-            
-    return suggested_titles
+def chain_unavailable() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="The movie assistant is not available right now. Please retry shortly.",
+        headers={"Retry-After": str(CHAIN_UNAVAILABLE_RETRY_AFTER)}
+    )
+
+
+def extract_suggested_titles(retrieved_shows: List[RetrievedShow]) -> List[str]:
+    """Titles of the shows the retriever returned, for the API response."""
+    return [show.title for show in retrieved_shows or [] if show.title]
 
 
 @router.post("/chat", response_model=ChatMessageResponse, status_code=status.HTTP_200_OK) 
-def handle_chat(
+async def handle_chat(
     request: ChatMessageRequest,
     current_user: UserORM = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Handles an authenticated user's chat message, processes it through the 
     LangChain orchestration pipeline, and returns the AI response along with 
     any suggested shows.
     """
-    user_id = current_user.id 
+    user_id = int(current_user.id) 
 
     session_id = request.session_id if request.session_id else str(uuid.uuid4()) 
     user_input = request.message 
@@ -60,8 +59,11 @@ def handle_chat(
     logger.info(f"API Call: Processing chat for User ID {user_id}, Session {session_id[:8]}...") 
 
     try:
-        movie_assistant_chain = get_movie_assistant_chain() 
+        movie_assistant_chain = await registry.aget_chain() 
+    except registry.ChainUnavailable:
+        raise chain_unavailable()
 
+    try:
         inputs: Dict[str, Any] = {
             "db": db, 
             "user_id": user_id,
@@ -69,12 +71,10 @@ def handle_chat(
             "user_input": user_input
         }
 
-        result = movie_assistant_chain.invoke(inputs) 
+        result = await movie_assistant_chain.ainvoke(inputs) 
 
         final_response = result.get("response", "An error occured during response generation.") 
-        retrieved_docs_raw = result.get("retrieved_docs", "") 
-
-        suggested_shows = extract_suggested_titles(retrieved_docs_raw) 
+        suggested_shows = extract_suggested_titles(result.get("retrieved_shows", [])) 
 
         return ChatMessageResponse(
             session_id=session_id,
@@ -84,8 +84,82 @@ def handle_chat(
     
     except Exception as e:
         logger.error(f"Unexpected Chat Processing Error for User {user_id}: {e}", exc_info=True) 
-        db.rollback() 
+        await db.rollback() 
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An internal server error occured during chat processing."
-        )
\ No newline at end of file
+        )
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_chat_events(stages: List[Tuple[str, Any]], user_id: int, session_id: str, user_input: str) -> AsyncIterator[str]:
+    yield format_sse("start", {"session_id": session_id}) 
+
+    # The request's dependency-managed session may be closed before the stream finishes,
+    # so the stream owns its session for its whole lifetime.
+    async with AsyncSessionLocal() as db:
+        inputs: Dict[str, Any] = {
+            "db": db, 
+            "user_id": user_id,
+            "session_id": session_id,
+            "user_input": user_input
+        }
+
+        try:
+            async for event, payload in astream_movie_assistant(stages, inputs):
+                if event == "token":
+                    yield format_sse("token", {"text": payload}) 
+
+                elif event == STAGE_CONTEXT_SUMMARIZED:
+                    context = payload.get("context_summary") 
+                    yield format_sse(event, {"context_summary": getattr(context, "context_summary", str(context))}) 
+
+                elif event == STAGE_INTENT_PARSED:
+                    yield format_sse(event, payload["parsed_intent"].model_dump(mode="json")) 
+
+                elif event == STAGE_SHOWS_RETRIEVED:
+                    shows = payload.get("retrieved_shows", []) 
+                    yield format_sse(event, {"shows": [show.model_dump(mode="json", include={"show_id", "title", "score"}) for show in shows]}) 
+
+                elif event == STAGE_INTERACTION_SAVED:
+                    yield format_sse("done", {
+                        "session_id": session_id,
+                        "response": payload.get("response", ""),
+                        "suggested_shows": extract_suggested_titles(payload.get("retrieved_shows", []))
+                    }) 
+
+        except Exception as e:
+            logger.error(f"Unexpected Chat Streaming Error for User {user_id}: {e}", exc_info=True) 
+            await db.rollback() 
+            yield format_sse("error", {"detail": "An internal server error occured during chat processing."}) 
+
+
+@router.post("/chat/stream", status_code=status.HTTP_200_OK) 
+async def handle_chat_stream(
+    request: ChatMessageRequest,
+    current_user: UserORM = Depends(get_current_active_user)
+):
+    """
+    Streams the chat pipeline as server-sent events: progress events as each stage 
+    finishes (context summarized, intent parsed, shows retrieved), then the response 
+    tokens as they are generated, then a final 'done' event once the interaction is saved.
+    """
+    user_id = int(current_user.id) 
+    session_id = request.session_id if request.session_id else str(uuid.uuid4()) 
+
+    logger.info(f"API Call: Streaming chat for User ID {user_id}, Session {session_id[:8]}...") 
+
+    # Resolved before the response starts, so an unavailable chain is a 503 rather than an error event.
+    try:
+        stages = await registry.aget_stages() 
+    except registry.ChainUnavailable:
+        raise chain_unavailable()
+
+    return StreamingResponse(
+        stream_chat_events(stages, user_id, session_id, request.message),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
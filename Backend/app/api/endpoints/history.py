@@ -0,0 +1,108 @@
+import logging 
+from datetime import datetime 
+from typing import Optional, Any 
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status 
+from sqlalchemy.ext.asyncio import AsyncSession 
+
+from ...services.database import get_async_db 
+from ...services import history_manager, write_behind 
+from ...core.security import get_current_active_user 
+from ...models.database_models import User as UserORM 
+from ...models.pydantic_models import (
+    HistoryShow,
+    HistoryTurn,
+    HistoryTurnPage,
+    HistorySession,
+    HistorySessionPage
+) 
+
+router = APIRouter(tags=["History"]) 
+logger = logging.getLogger(__name__) 
+
+MAX_PAGE_SIZE = 100
+
+
+def _isoformat(value) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _history_turn(turn: Any) -> HistoryTurn:
+    # A stored InteractionHistoryInDB row, or a write-behind PendingInteraction not committed yet.
+    if isinstance(turn, write_behind.PendingInteraction):
+        return HistoryTurn(
+            id=None,
+            user_message=turn.user_message or "",
+            ai_response=turn.ai_response or "",
+            timestamp=_isoformat(turn.timestamp),
+            recommended_shows=[HistoryShow(show_id=show.show_id, title=show.title) for show in turn.recommended_shows]
+        )
+    return HistoryTurn(
+        id=turn.id,
+        user_message=turn.user_message or "",
+        ai_response=turn.ai_response or "",
+        timestamp=_isoformat(turn.timestamp),
+        recommended_shows=[
+            HistoryShow(show_id=show.show_id, title=show.show_title)
+            for show in turn.recommended_shows
+        ]
+    )
+
+
+@router.get("/history/sessions", response_model=HistorySessionPage, status_code=status.HTTP_200_OK) 
+async def list_sessions(
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: UserORM = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """The current user's chat sessions, most recently active first."""
+    user_id = int(current_user.id) 
+    # Turns still in the write-behind queue are listed too; read before the database, so a
+    # turn committed in between is found there rather than missed by both.
+    pending = write_behind.pending_user_interactions(user_id) 
+    try:
+        sessions, next_cursor = await history_manager.aget_sessions_page(db, user_id, limit, cursor, pending=pending)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return HistorySessionPage(
+        sessions=[
+            HistorySession(
+                session_id=session["session_id"],
+                started_at=_isoformat(session["started_at"]),
+                last_message_at=_isoformat(session["last_message_at"]),
+                turn_count=session["turn_count"]
+            )
+            for session in sessions
+        ],
+        next_cursor=next_cursor
+    )
+
+
+@router.get("/history/sessions/{session_id}", response_model=HistoryTurnPage, status_code=status.HTTP_200_OK) 
+async def list_session_turns(
+    session_id: str,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: UserORM = Depends(get_current_active_user), 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """The turns of one session, newest first, each with the shows recommended in it."""
+    user_id = int(current_user.id) 
+    pending = write_behind.pending_interactions(user_id, session_id) 
+    try:
+        interactions, next_cursor = await history_manager.aget_session_turns_page(
+            db, user_id, session_id, limit, cursor, pending=pending
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if not interactions and cursor is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found.")
+
+    return HistoryTurnPage(
+        session_id=session_id,
+        turns=[_history_turn(turn) for turn in interactions],
+        next_cursor=next_cursor
+    )
@@ -8,7 +8,9 @@ from langchain_huggingface.llms import HuggingFaceEndpoint
 from langchain_core.output_parsers import PydanticOutputParser 
 
 from ..models.pydantic_models import UserContext
-from ..services import serper_client 
+from ..services import news_cache 
+from .output_utils import extract_json 
+from .prompt_budget import PromptBudget, PromptSection, count_prompt_tokens, STAGE_CONTEXT 
 
 load_dotenv() 
 
@@ -30,7 +32,7 @@ def get_context_enhancer_chain():
             task="text-generation",
             temperature=0.1,
             max_new_tokens=510,
-            huggingfacehub_api_token=HUGGINGFACE_API_KEY, 
+            huggingfacehub_api_token=os.getenv("HUGGINGFACE_API_KEY"), 
         )
     except Exception as e:
         print(f"❌ HuggingFace model {LLM_MODEL} failed: {e}")
@@ -39,14 +41,14 @@ def get_context_enhancer_chain():
             task="text2text-generation",
             temperature=0.1,
             max_new_tokens=510,
-            huggingfacehub_api_token=HUGGINGFACE_API_KEY, 
+            huggingfacehub_api_token=os.getenv("HUGGINGFACE_API_KEY"), 
         ) 
 
     parser = PydanticOutputParser(pydantic_object=UserContext) 
 
     def get_latest_movie_news(input_data: Dict[str, Any]) -> str:
-        search_query = "latest movie news and trends" 
-        return serper_client.search_news_talking_points(search_query, num_results=5)
+        # Read from the background-refreshed cache; Serper is never called on the request path.
+        return news_cache.talking_points_for(input_data.get("user_input", ""))
 
     prompt = ChatPromptTemplate.from_messages([
         ("system", ("""
@@ -57,7 +59,7 @@ def get_context_enhancer_chain():
             a concise, focused summary.
 
             You are provided wih:
-            - Conversation History 
+            - Conversation History (a running summary of the session and its most recent turns)
             - Latest User Message 
             - Real-Time Talking Points (recent movie news/trends)  
                     
@@ -80,13 +82,25 @@ def get_context_enhancer_chain():
          Analyze and summarize the context""")        
     ]).partial(format_instructions=parser.get_format_instructions()) 
 
+    # Trimmed first: news, then the oldest part of the history; the user's message is kept whole.
+    budget = PromptBudget(
+        STAGE_CONTEXT,
+        sections=[
+            PromptSection("user_input", priority=0, min_tokens=256),
+            PromptSection("chat_history", priority=1, min_tokens=128, keep="tail"),
+            PromptSection("talking_points", priority=2),
+        ],
+        reserved_tokens=count_prompt_tokens(prompt)
+    )
+
     context_enhancer_chain = (
         RunnablePassthrough.assign(
             talking_points=RunnableLambda(get_latest_movie_news).with_types(input_type=dict, output_type=str)
         )
+        | budget.as_runnable()
         | prompt 
         | llm 
-        | RunnableLambda(lambda x: x.split("```json")[1].split("```")[0].strip() if "```json" in x else x) 
+        | RunnableLambda(extract_json) 
         | parser
     )
     return context_enhancer_chain
\ No newline at end of file
@@ -0,0 +1,94 @@
+import os
+from dotenv import load_dotenv
+from typing import Dict, Any
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnablePassthrough, RunnableLambda
+from langchain_huggingface.llms import HuggingFaceEndpoint
+from langchain_core.output_parsers import PydanticOutputParser
+
+from ..models.pydantic_models import ContextAndIntent
+from ..services import news_cache
+from .intent_parser import INTENT_DESCRIPTION
+from .output_utils import extract_json
+from .prompt_budget import PromptBudget, PromptSection, count_prompt_tokens, STAGE_CONTEXT_INTENT
+
+load_dotenv()
+
+LLM_MODEL = "mistralai/Mistral-7B-Instruct-v0.3"
+
+# 'separate' runs the context enhancer and the intent parser as two LLM calls;
+# 'fused' asks for the summary and the intent in a single structured generation.
+MODE_SEPARATE = "separate"
+MODE_FUSED = "fused"
+INTENT_CONTEXT_MODE = os.getenv("INTENT_CONTEXT_MODE", MODE_SEPARATE).lower()
+
+
+def get_context_intent_chain():
+    try:
+        llm = HuggingFaceEndpoint(
+            repo_id=LLM_MODEL,
+            task="text-generation",
+            temperature=0.0,
+            max_new_tokens=512,
+            huggingfacehub_api_token=os.getenv("HUGGINGFACE_API_KEY"),
+        )
+    except Exception as e:
+        print(f"❌ HuggingFace model {LLM_MODEL} failed: {e}")
+        llm = HuggingFaceEndpoint(
+            repo_id="google/flan-t5-base",
+            task="text2text-generation",
+            temperature=0.0,
+            max_new_tokens=512,
+            huggingfacehub_api_token=os.getenv("HUGGINGFACE_API_KEY"),
+        )
+
+    parser = PydanticOutputParser(pydantic_object=ContextAndIntent)
+
+    def get_latest_movie_news(input_data: Dict[str, Any]) -> str:
+        return news_cache.talking_points_for(input_data.get("user_input", ""))
+
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", (f"""
+            You are the context analysis and intent classification engine of a movie recommendation system.
+
+            You are provided wih:
+            - Conversation History (a running summary of the session and its most recent turns)
+            - Latest User Message
+            - Real-Time Talking Points (recent movie news/trends)
+
+            First, write 'context_summary': a concise summary that captures what the user is currently
+            asking for, relevant context from previous messages, and key preferences or constraints.
+            If the user asks about "current movies" or "what's new", integrate key points from the talking points.
+
+            Then classify the latest user message. {INTENT_DESCRIPTION}
+            You MUST only respond with a single valid JSON object matching the schema:\n{{format_instructions}}
+            """)),
+        ("human", """
+         Real-Time Talking Points (Current News/Trends):\n{talking_points}\n
+         Conversation History:\n{chat_history}\n
+         \nLatest User Message: {user_input}
+         Summarize the context and classify the intent""")
+    ]).partial(format_instructions=parser.get_format_instructions())
+
+    budget = PromptBudget(
+        STAGE_CONTEXT_INTENT,
+        sections=[
+            PromptSection("user_input", priority=0, min_tokens=256),
+            PromptSection("chat_history", priority=1, min_tokens=128, keep="tail"),
+            PromptSection("talking_points", priority=2),
+        ],
+        reserved_tokens=count_prompt_tokens(prompt)
+    )
+
+    context_intent_chain = (
+        RunnablePassthrough.assign(
+            talking_points=RunnableLambda(get_latest_movie_news).with_types(input_type=dict, output_type=str)
+        )
+        | budget.as_runnable()
+        | prompt
+        | llm
+        | RunnableLambda(extract_json)
+        | parser
+    )
+    return context_intent_chain
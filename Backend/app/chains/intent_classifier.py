@@ -0,0 +1,328 @@
+# Local intent tier: rules plus a small linear model, consulted before the LLM intent parser
+import logging
+import os
+import random
+import re
+import threading
+import zlib
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from ..models.pydantic_models import Intent, IntentType
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO
+)
+
+INTENT_CASCADE_ENABLED = os.getenv("INTENT_CASCADE_ENABLED", "true").lower() in ("1", "true", "yes")
+INTENT_CLASSIFIER_PATH = os.getenv("INTENT_CLASSIFIER_PATH", "data/intent_classifier.npz")
+# The linear model's answer is used only at or above this probability.
+INTENT_MODEL_MIN_CONFIDENCE = float(os.getenv("INTENT_MODEL_MIN_CONFIDENCE", "0.85"))
+# Share of locally decided turns that are also sent to the LLM to measure agreement (the LLM answer is used).
+INTENT_SHADOW_SAMPLE_RATE = float(os.getenv("INTENT_SHADOW_SAMPLE_RATE", "0.0"))
+
+SOURCE_RULES = "rules"
+SOURCE_MODEL = "model"
+SOURCE_LLM = "llm"
+
+HASH_FEATURES = 4096
+CLASSES = [intent_type.value for intent_type in IntentType]
+
+GENRE_TERMS = {
+    "action", "adventure", "animation", "animated", "anime", "comedy", "comedies", "crime", "documentary",
+    "documentaries", "drama", "dramas", "family", "fantasy", "historical", "horror", "musical", "musicals",
+    "mystery", "mysteries", "romance", "romantic", "sci-fi", "scifi", "science fiction", "thriller", "thrillers",
+    "war", "western", "westerns", "superhero", "rom-com", "romcom", "noir", "k-drama", "sitcom", "sitcoms",
+}
+MOOD_TERMS = {
+    "feel-good", "funny", "scary", "dark", "uplifting", "sad", "thrilling", "lighthearted", "light-hearted",
+    "cozy", "heartwarming", "mind-bending", "intense", "relaxing", "inspiring", "suspenseful", "creepy", "wholesome",
+}
+
+SMALL_TALK_PATTERN = re.compile(
+    r"^(hi|hello|hey|heya|hiya|yo|howdy|good (morning|afternoon|evening)|thanks?|thank you( so much| very much)?|"
+    r"thx|ty|cheers|bye|goodbye|see (you|ya)|ok(ay)?|cool|great|awesome|nice|perfect|how are you( doing)?|"
+    r"what can you do|who are you)( there)?[\s!.,?]*$",
+    re.IGNORECASE
+)
+LIKES_PATTERN = re.compile(
+    r"^i (really |absolutely |just )?(love|like|enjoy|adore|am into|'m into|prefer) ([a-z\- ]+?)"
+    r"( movies| films| shows| series| ones)?[\s!.]*$",
+    re.IGNORECASE
+)
+RECOMMENDATION_PATTERN = re.compile(
+    r"\b(recommend|suggest|suggestions?|what (should|can|could) i watch|something to watch|looking for|"
+    r"in the mood for|show me|find me|give me|i want (a|an|some|to watch))\b",
+    re.IGNORECASE
+)
+# A negated request ("don't recommend horror", "anything but reality TV") cannot be turned into a
+# search query or a liked genre by stripping filler words, so it always goes to the LLM.
+NEGATION_PATTERN = re.compile(
+    r"\b(don'?t|do not|doesn'?t|does not|not|no|never|nothing|without|except|instead of|other than|anything but|"
+    r"avoid|hate|dislike)\b|n't\b",
+    re.IGNORECASE
+)
+QUERY_FILLER_PATTERN = re.compile(
+    r"\b(can|could|would|will) you\b|\bplease\b|\brecommend(ations?)?\b|\bsuggest(ions?)?\b|"
+    r"\bwhat (should|can|could) i watch\b|\bsomething to watch\b|\bto watch\b|\bi'?m looking for\b|\blooking for\b|"
+    r"\bin the mood for\b|\bshow me\b|\bfind me\b|\bgive me\b|\bi want( to watch)?\b|\bi'?d like\b|"
+    r"\b(me|a|an|some|something|good|great|any|the|tonight|today|movies?|films?|shows?|series)\b|[?!.,]",
+    re.IGNORECASE
+)
+
+
+class LocalIntent(NamedTuple):
+    intent: Intent
+    source: str
+    confidence: float
+
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9']+(?:-[a-z0-9']+)*", text.lower())
+
+
+def feature_indices(text: str, n_features: int = HASH_FEATURES) -> np.ndarray:
+    """Hashed unigrams and bigrams. crc32 keeps the hashing stable across processes, unlike hash()."""
+    tokens = tokenize(text)
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return np.array([zlib.crc32(gram.encode("utf-8")) % n_features for gram in grams], dtype=np.int64)
+
+
+def has_taste_terms(query: str) -> bool:
+    words = set(tokenize(query))
+    return bool(words & (GENRE_TERMS | MOOD_TERMS)) or "science fiction" in query
+
+
+def extract_search_query(text: str) -> str:
+    """'Could you recommend a thrilling sci-fi movie?' -> 'thrilling sci-fi'"""
+    return re.sub(r"\s+", " ", QUERY_FILLER_PATTERN.sub(" ", text)).strip(" -").lower()
+
+
+def extract_liked_genre(text: str) -> Optional[str]:
+    match = LIKES_PATTERN.match(text.strip())
+    if not match:
+        return None
+    value = match.group(3).strip().lower()
+    return value if value in GENRE_TERMS else None
+
+
+def has_negation(text: str) -> bool:
+    return bool(NEGATION_PATTERN.search(text.replace("\u2019", "'")))
+
+
+def classify_by_rules(text: str) -> Optional[LocalIntent]:
+    if SMALL_TALK_PATTERN.match(text.strip()):
+        return LocalIntent(Intent(intent_type=IntentType.CHAT), SOURCE_RULES, 1.0)
+
+    if has_negation(text):
+        return None
+
+    genre = extract_liked_genre(text)
+    if genre:
+        return LocalIntent(
+            Intent(intent_type=IntentType.PROFILE_UPDATE, preference_type="genre", preference_value=genre),
+            SOURCE_RULES, 1.0
+        )
+
+    if RECOMMENDATION_PATTERN.search(text):
+        query = extract_search_query(text)
+        if query and has_taste_terms(query):
+            return LocalIntent(Intent(intent_type=IntentType.RECOMMENDATION, search_query=query), SOURCE_RULES, 1.0)
+    return None
+
+
+class LinearIntentModel:
+    """Multinomial logistic regression over hashed n-gram counts; prediction is a row sum and a softmax."""
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, classes: List[str], metadata: Optional[Dict[str, Any]] = None):
+        self.weights = weights
+        self.bias = bias
+        self.classes = classes
+        self.metadata = metadata or {}
+
+    @property
+    def n_features(self) -> int:
+        return self.weights.shape[0]
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        logits = self.weights[feature_indices(text, self.n_features)].sum(axis=0) + self.bias
+        logits = np.exp(logits - logits.max())
+        return logits / logits.sum()
+
+    def predict(self, text: str):
+        probabilities = self.predict_proba(text)
+        best = int(np.argmax(probabilities))
+        return self.classes[best], float(probabilities[best])
+
+    def save(self, path: str) -> None:
+        np.savez(
+            path,
+            weights=self.weights,
+            bias=self.bias,
+            classes=np.array(self.classes),
+            **{key: np.array(value) for key, value in self.metadata.items()}
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "LinearIntentModel":
+        with np.load(path) as data:
+            metadata = {key: data[key].item() for key in data.files if key not in ("weights", "bias", "classes")}
+            return cls(data["weights"], data["bias"], [str(c) for c in data["classes"]], metadata)
+
+
+def train_linear_model(
+        texts: List[str],
+        labels: List[str],
+        n_features: int = HASH_FEATURES,
+        epochs: int = 30,
+        learning_rate: float = 0.5,
+        l2: float = 1e-4,
+        batch_size: int = 256,
+        seed: int = 0
+) -> LinearIntentModel:
+    """Mini-batch gradient descent on the softmax cross-entropy, one dense batch at a time."""
+    rng = np.random.default_rng(seed)
+    class_index = {label: i for i, label in enumerate(CLASSES)}
+    features = [feature_indices(text, n_features) for text in texts]
+    targets = np.array([class_index[label] for label in labels])
+
+    weights = np.zeros((n_features, len(CLASSES)), dtype=np.float32)
+    bias = np.zeros(len(CLASSES), dtype=np.float32)
+
+    for _ in range(epochs):
+        order = rng.permutation(len(texts))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            x = np.zeros((len(batch), n_features), dtype=np.float32)
+            for row, sample in enumerate(batch):
+                np.add.at(x[row], features[sample], 1.0)
+
+            logits = x @ weights + bias
+            probabilities = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probabilities /= probabilities.sum(axis=1, keepdims=True)
+            probabilities[np.arange(len(batch)), targets[batch]] -= 1.0
+            gradient = probabilities / len(batch)
+
+            weights -= learning_rate * (x.T @ gradient + l2 * weights)
+            bias -= learning_rate * gradient.sum(axis=0)
+
+    return LinearIntentModel(weights, bias, list(CLASSES))
+
+
+_model: Optional[LinearIntentModel] = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+
+def get_model() -> Optional[LinearIntentModel]:
+    """Loads the trained model once per process; until one is trained only the rules run locally."""
+    global _model, _model_loaded
+
+    if not _model_loaded:
+        with _model_lock:
+            if not _model_loaded:
+                if os.path.exists(INTENT_CLASSIFIER_PATH):
+                    try:
+                        _model = LinearIntentModel.load(INTENT_CLASSIFIER_PATH)
+                        logging.info(f"✅ Intent classifier loaded from '{INTENT_CLASSIFIER_PATH}'.")
+                    except Exception as e:
+                        logging.warning(f"❌ Could not load intent classifier '{INTENT_CLASSIFIER_PATH}': {e}")
+                _model_loaded = True
+    return _model
+
+
+def classify_by_model(text: str) -> Optional[LocalIntent]:
+    model = get_model()
+    if model is None:
+        return None
+
+    label, confidence = model.predict(text)
+    if confidence < INTENT_MODEL_MIN_CONFIDENCE:
+        return None
+
+    # The model picks the intent; the fields it implies still have to be extracted reliably.
+    if label == IntentType.CHAT.value:
+        return LocalIntent(Intent(intent_type=IntentType.CHAT), SOURCE_MODEL, confidence)
+    if has_negation(text):
+        return None
+    if label == IntentType.RECOMMENDATION.value:
+        query = extract_search_query(text)
+        if query:
+            return LocalIntent(Intent(intent_type=IntentType.RECOMMENDATION, search_query=query), SOURCE_MODEL, confidence)
+    if label == IntentType.PROFILE_UPDATE.value:
+        genre = extract_liked_genre(text)
+        if genre:
+            return LocalIntent(
+                Intent(intent_type=IntentType.PROFILE_UPDATE, preference_type="genre", preference_value=genre),
+                SOURCE_MODEL, confidence
+            )
+    return None
+
+
+def classify_locally(text: str) -> Optional[LocalIntent]:
+    if not INTENT_CASCADE_ENABLED or not text:
+        return None
+    return classify_by_rules(text) or classify_by_model(text)
+
+
+# --- Metrics ---
+_stats_lock = threading.Lock()
+_stats = {"decisions": 0, SOURCE_RULES: 0, SOURCE_MODEL: 0, SOURCE_LLM: 0, "shadow_checks": 0, "shadow_agreements": 0}
+
+
+def _record(source: str, local: Optional[LocalIntent] = None, llm_intent: Optional[Intent] = None) -> None:
+    with _stats_lock:
+        _stats["decisions"] += 1
+        _stats[source] += 1
+        if local is not None and llm_intent is not None:
+            _stats["shadow_checks"] += 1
+            _stats["shadow_agreements"] += 1 if local.intent.intent_type == llm_intent.intent_type else 0
+
+
+def get_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+    model = get_model()
+    stats["fallback_rate"] = stats[SOURCE_LLM] / stats["decisions"] if stats["decisions"] else 0.0
+    stats["shadow_agreement_rate"] = stats["shadow_agreements"] / stats["shadow_checks"] if stats["shadow_checks"] else None
+    stats["classifier"] = dict(model.metadata) if model is not None else None
+    return stats
+
+
+# --- Cascade ---
+def get_cascade_intent_chain(intent_chain: Runnable) -> Runnable:
+    """
+    Sets `parsed_intent` and `intent_source` in the chain state: from the local tier when it
+    is confident, otherwise from `intent_chain` (the LLM parser, fed the context summary).
+    In fused mode the context stage has already produced the LLM's intent as `fused_intent`,
+    and that is used instead of a second call.
+    """
+    def use_local(local: Optional[LocalIntent]) -> bool:
+        return local is not None and not (INTENT_SHADOW_SAMPLE_RATE and random.random() < INTENT_SHADOW_SAMPLE_RATE)
+
+    def cascade(input_data: Dict[str, Any]) -> Dict[str, Any]:
+        local = classify_locally(input_data.get("user_input", ""))
+        if use_local(local):
+            _record(local.source)
+            return {**input_data, "parsed_intent": local.intent, "intent_source": local.source}
+
+        intent = input_data.get("fused_intent") or intent_chain.invoke(input_data["context_summary"])
+        _record(SOURCE_LLM, local, intent)
+        return {**input_data, "parsed_intent": intent, "intent_source": SOURCE_LLM}
+
+    async def acascade(input_data: Dict[str, Any]) -> Dict[str, Any]:
+        local = classify_locally(input_data.get("user_input", ""))
+        if use_local(local):
+            _record(local.source)
+            return {**input_data, "parsed_intent": local.intent, "intent_source": local.source}
+
+        intent = input_data.get("fused_intent") or await intent_chain.ainvoke(input_data["context_summary"])
+        _record(SOURCE_LLM, local, intent)
+        return {**input_data, "parsed_intent": intent, "intent_source": SOURCE_LLM}
+
+    return RunnableLambda(cascade, afunc=acascade).with_types(input_type=dict, output_type=dict)
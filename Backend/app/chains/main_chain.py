@@ -1,133 +1,235 @@
-import json 
-import re 
-from typing import  Dict, Any, List, Tuple 
+from typing import  Dict, Any, List, Tuple, AsyncIterator, Optional 
 
-from langchain_core.runnables import RunnablePassthrough, RunnableBranch, RunnableLambda 
+from langchain_core.runnables import Runnable, RunnablePassthrough, RunnableBranch, RunnableLambda 
 
 from .context_enhancer import get_context_enhancer_chain 
 from .intent_parser import get_intent_parser_chain 
 from .memory_manager import get_memory_manager_chain 
 from .show_retriever import get_show_retirever_chain 
 from .response_generator import get_response_generator_chain 
+from .intent_classifier import get_cascade_intent_chain 
+from .context_intent import get_context_intent_chain, INTENT_CONTEXT_MODE, MODE_FUSED 
 
-from ..models.pydantic_models import UserProfileResponse, IntentType 
-from ..services import user_manager, history_manager 
+from ..models.pydantic_models import IntentType 
+from ..services import history_manager, semantic_cache, write_behind, profile_cache 
 from sqlalchemy.orm import Session 
+from sqlalchemy.ext.asyncio import AsyncSession 
 
 def format_user_profile_for_llm(db: Session, user_id: int) -> str: 
     try: 
-        db_user = user_manager.get_user_profile(db=db, user_id=user_id) 
-        if not db_user:
-            return "No user profile found."
-        
-        profile_response = UserProfileResponse.from_db_model(db_user=db_user) 
-        preferences_str = ", ".join(profile_response.preferences) 
-
-        return json.dumps({
-            "username": profile_response.user_name,
-            "preferences": preferences_str,
-            "created_at": profile_response.created_at
-        })
+        # Pending first: a preference the worker commits in between is then in the snapshot instead.
+        pending = write_behind.pending_preferences(user_id) 
+        snapshot = profile_cache.get_profile_snapshot(db=db, user_id=user_id) 
+        return render_user_profile(snapshot, pending) 
     except Exception as e:
         print(f"Error formatting user profile: {e}") 
         return "Profile data temporarily unavailable."
+
+async def aformat_user_profile_for_llm(db: AsyncSession, user_id: int) -> str: 
+    try: 
+        pending = write_behind.pending_preferences(user_id) 
+        snapshot = await profile_cache.aget_profile_snapshot(db=db, user_id=user_id) 
+        return render_user_profile(snapshot, pending) 
+    except Exception as e:
+        print(f"Error formatting user profile: {e}") 
+        return "Profile data temporarily unavailable."
+
+def render_user_profile(snapshot: Optional[profile_cache.ProfileSnapshot], pending: List[write_behind.PendingPreference]) -> str:
+    if snapshot is None:
+        return "No user profile found."
+
+    # Preference updates still in the write-behind queue are part of the profile already.
+    if not pending:
+        return snapshot.llm_profile 
+    return profile_cache.render_llm_profile(snapshot.profile, extra_preferences=[pref.preference_value for pref in pending]) 
     
 def get_profile_data(input_data: Dict[str, Any]) -> str:
     db: Session = input_data["db"] 
     user_id: int = input_data["user_id"] 
     return format_user_profile_for_llm(db, user_id) 
 
+async def aget_profile_data(input_data: Dict[str, Any]) -> str:
+    db: AsyncSession = input_data["db"] 
+    user_id: int = input_data["user_id"] 
+    return await aformat_user_profile_for_llm(db, user_id) 
+
 def get_session_history(input_data: Dict[Any, str]) -> str:
     db: Session = input_data["db"] 
     user_id: int = input_data["user_id"] 
     session_id: str = input_data["session_id"] 
 
-    return history_manager.get_chat_history(db, user_id,session_id) 
+    pending = write_behind.pending_interactions(user_id, session_id) 
+    return history_manager.get_chat_history(db, user_id,session_id, pending=pending) 
 
-def save_final_interaction(input_data: Dict[str, Any]) -> Dict[str, Any]:
-    db: Session = input_data["db"] 
+async def aget_session_history(input_data: Dict[str, Any]) -> str:
+    db: AsyncSession = input_data["db"] 
     user_id: int = input_data["user_id"] 
     session_id: str = input_data["session_id"] 
 
-    user_message = input_data.get("user_input", "") 
-    ai_response = input_data.get("response", "") 
-    retrieved_docs_raw: str = input_data.get("retrieved_docs", "") 
-
-    # REGEX to extract show ID and Title from the retrieved_docs string 
-    # This uses the format defined in show_manager.py: [Title: <Title>, Score: <Score>, Show ID: <ID>]
-    pattern = re.compile(r"\[Title: (.*?), Score: .*?, Show ID: (\d+)\]") 
-
-    recommended_shows: List[Tuple[str, str]] = [] 
-
-    if "Title:" in retrieved_docs_raw:
-        for match in pattern.finditer(retrieved_docs_raw):
-            title = match.group(1).strip() 
-            show_id = match.group(2).strip() 
-            if title and show_id:
-                recommended_shows.append((show_id, title)) 
-
-    history_manager.save_interaction(
-        db=db,
-        user_id=user_id,
-        session_id=session_id,
-        user_message=user_message,
-        ai_response=ai_response,
-        recommended_shows=recommended_shows
-    )
+    pending = write_behind.pending_interactions(user_id, session_id) 
+    return await history_manager.aget_chat_history(db, user_id, session_id, pending=pending) 
+
+def get_context_summary_text(input_data: Dict[str, Any]) -> Optional[str]:
+    context = input_data.get("context_summary") 
+    return getattr(context, "context_summary", context) if context else None
+
+def get_intent_type_value(input_data: Dict[str, Any]) -> Optional[str]:
+    intent = input_data.get("parsed_intent") 
+    return intent.intent_type.value if intent is not None else None
+
+def get_interaction_fields(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "user_id": input_data["user_id"],
+        "session_id": input_data["session_id"],
+        "user_message": input_data.get("user_input", ""),
+        "ai_response": input_data.get("response", ""),
+        "recommended_shows": input_data.get("retrieved_shows", []),
+        "context_summary": get_context_summary_text(input_data),
+        "intent_type": get_intent_type_value(input_data),
+        "intent_source": input_data.get("intent_source")
+    }
+
+def save_final_interaction(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    fields = get_interaction_fields(input_data) 
+
+    # Queued for the write-behind worker; written here only if the queue is unavailable or full.
+    if not write_behind.enqueue_interaction(**fields):
+        history_manager.save_interaction(db=input_data["db"], **fields) 
 
     return input_data 
 
+async def asave_final_interaction(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    fields = get_interaction_fields(input_data) 
+
+    if not write_behind.enqueue_interaction(**fields):
+        await history_manager.asave_interaction(db=input_data["db"], **fields) 
+
+    return input_data 
+
+def split_context_intent(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    # The fused stage's single output feeds both slots the two-call pipeline fills.
+    state = {key: value for key, value in input_data.items() if key != "context_intent"} 
+    context_intent = input_data["context_intent"] 
+    return {**state, "context_summary": context_intent.to_user_context(), "fused_intent": context_intent.to_intent()} 
+
 def is_recommendation_intent(input_data: Dict[str, Any]) -> bool:
     intent = input_data.get("parsed_intent") 
     return intent and intent.intent_type == IntentType.RECOMMENDATION 
 
 def get_movie_assistant_chain():
-    context_chain = get_context_enhancer_chain() 
-    intent_chain = get_intent_parser_chain() 
-    memory_chain = get_memory_manager_chain() 
-    retriever_chain = get_show_retirever_chain() 
-    response_chain = get_response_generator_chain() 
-
-    initial_context_passthrough = RunnablePassthrough.assign(
-        user_profile_data=RunnableLambda(get_profile_data),
-        chat_history=RunnableLambda(get_session_history)
+    """Builds every component from scratch. Request handlers should use the shared
+    chain from `registry.get_chain()` instead of calling this per request."""
+    return build_movie_assistant_chain(
+        context_chain=get_context_enhancer_chain(),
+        intent_chain=get_intent_parser_chain(),
+        memory_chain=get_memory_manager_chain(),
+        retriever_chain=get_show_retirever_chain(),
+        response_chain=get_response_generator_chain(),
+        context_intent_chain=get_context_intent_chain() if INTENT_CONTEXT_MODE == MODE_FUSED else None
+    )
+
+# Stage names double as the progress events of the streaming endpoint.
+STAGE_CONTEXT_LOADED = "context_loaded"
+STAGE_CONTEXT_SUMMARIZED = "context_summarized"
+STAGE_INTENT_PARSED = "intent_parsed"
+STAGE_MEMORY_UPDATED = "memory_updated"
+STAGE_SHOWS_RETRIEVED = "shows_retrieved"
+STAGE_RESPONSE = "response"
+STAGE_INTERACTION_SAVED = "interaction_saved"
+
+def build_movie_assistant_stages(context_chain, intent_chain, memory_chain, retriever_chain, response_chain, context_intent_chain=None) -> List[Tuple[str, Runnable]]:
+    # Sequential on purpose: both steps share the request's DB session, which must not
+    # be used concurrently (an AsyncSession raises if it is).
+    initial_context_passthrough = (
+        RunnablePassthrough.assign(
+            user_profile_data=RunnableLambda(get_profile_data, afunc=aget_profile_data)
+        )
+        | RunnablePassthrough.assign(
+            chat_history=RunnableLambda(get_session_history, afunc=aget_session_history)
+        )
     )
 
+    context_stage = RunnablePassthrough.assign(context_summary=context_chain) 
+    if context_intent_chain is not None:
+        # Fused mode: one LLM call for summary and intent. A reply that cannot be parsed
+        # falls back to the two-call path (the cascade then calls the intent parser).
+        context_stage = (
+            RunnablePassthrough.assign(context_intent=context_intent_chain) 
+            | RunnableLambda(split_context_intent)
+        ).with_fallbacks([context_stage]) 
+
     conditional_retrieval_branch = RunnableBranch(
         (RunnableLambda(is_recommendation_intent), retriever_chain),
-        RunnablePassthrough.assign(retrieved_docs=RunnableLambda(lambda x: "No RAG needed for this intent.")) 
+        RunnablePassthrough.assign(retrieved_shows=lambda x: [], retrieved_docs=lambda x: "No RAG needed for this intent.") 
     ) 
 
-    full_chain = (
+    return [
         # Step 0: Inject profile and history data
-        initial_context_passthrough
+        (STAGE_CONTEXT_LOADED, initial_context_passthrough),
 
         # Step 1: Summarize context (now uses fetched chat_history)
-        | RunnablePassthrough.assign(
-            context_summary=context_chain
-        )
+        # (in fused mode this also yields the LLM's intent for step 2)
+        (STAGE_CONTEXT_SUMMARIZED, context_stage),
 
         # Step 2: Determine user intent and extract details
-        | RunnablePassthrough.assign(
-            parsed_intent=(lambda x: x["context_summary"]) | intent_chain
-        )
+        # (rules and a local model answer confident cases; the rest go to the LLM parser)
+        (STAGE_INTENT_PARSED, get_cascade_intent_chain(intent_chain)),
 
         # Step 3: Handle side effects (like updating preferences in DB)
-        | memory_chain 
+        (STAGE_MEMORY_UPDATED, memory_chain),
 
         # Step 4: Conditionally run RAG for recommendations
-        | conditional_retrieval_branch 
+        (STAGE_SHOWS_RETRIEVED, conditional_retrieval_branch),
 
         # Step 5: Generate the final conversational response
-        | RunnablePassthrough.assign(
-            response=response_chain
-        )
+        (STAGE_RESPONSE, RunnablePassthrough.assign(
+            response=RunnableBranch(
+                (RunnableLambda(semantic_cache.cached_response_for), RunnableLambda(semantic_cache.use_cached_response)),
+                response_chain
+            )
+        )),
 
         # Step 6: Save the complete interaction history using the service
-        | RunnableLambda(save_final_interaction).with_types(input_type=dict, output_type=dict) 
+        (STAGE_INTERACTION_SAVED, (
+            RunnableLambda(save_final_interaction, afunc=asave_final_interaction)
+            | RunnableLambda(semantic_cache.remember_turn)
+        ).with_types(input_type=dict, output_type=dict)),
+    ]
+
+def build_movie_assistant_chain(context_chain, intent_chain, memory_chain, retriever_chain, response_chain, context_intent_chain=None):
+    stages = build_movie_assistant_stages(
+        context_chain=context_chain,
+        intent_chain=intent_chain,
+        memory_chain=memory_chain,
+        retriever_chain=retriever_chain,
+        response_chain=response_chain,
+        context_intent_chain=context_intent_chain
     )
 
+    full_chain = stages[0][1]
+    for _, stage in stages[1:]:
+        full_chain = full_chain | stage
+
     return full_chain.with_types(
         input_type=dict, 
         output_type=dict
     )
+
+async def astream_movie_assistant(stages: List[Tuple[str, Runnable]], inputs: Dict[str, Any]) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Runs the stages one at a time, yielding (stage_name, state) after each stage and
+    ("token", text) for every chunk of the response as the response LLM produces it.
+    """
+    state = inputs 
+    for stage_name, stage in stages:
+        if stage_name == STAGE_RESPONSE:
+            response_parts: List[str] = [] 
+            async for chunk in stage.astream(state):
+                token = chunk.get("response") 
+                if token:
+                    response_parts.append(token) 
+                    yield "token", token 
+            state = {**state, "response": "".join(response_parts)} 
+        else:
+            state = await stage.ainvoke(state) 
+        yield stage_name, state 
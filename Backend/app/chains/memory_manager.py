@@ -1,7 +1,8 @@
 from langchain_core.runnables import RunnableLambda 
 from sqlalchemy.orm import Session 
+from sqlalchemy.ext.asyncio import AsyncSession 
 from ..models.pydantic_models import IntentType, Intent 
-from ..services import user_manager 
+from ..services import user_manager, write_behind 
 from typing import Dict , Any 
 
 def handle_side_effects(input_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -13,13 +14,41 @@ def handle_side_effects(input_data: Dict[str, Any]) -> Dict[str, Any]:
         try: 
             score_delta = 1.0 
 
-            user_manager.update_user_preference_score(
-                db=db,
-                user_id=user_id,
-                preference_type=intent.preference_type,
-                preference_value=intent.preference_value,
-                score_delta=score_delta
-            )
+            # Queued for the write-behind worker; written here only if the queue is unavailable or full.
+            queued = write_behind.enqueue_preference(user_id, intent.preference_type, intent.preference_value, score_delta) 
+            if not queued:
+                user_manager.update_user_preference_score(
+                    db=db,
+                    user_id=user_id,
+                    preference_type=intent.preference_type,
+                    preference_value=intent.preference_value,
+                    score_delta=score_delta
+                )
+            print(f"✅ user {user_id} preferenceupdated: Type='{intent.preference_type}', Value='{intent.preference_value}' (Delta: {score_delta})")
+
+        except Exception as e:
+            print(f"⚠️ Error updating preference for user {user_id}: {e}") 
+        
+    return input_data
+
+async def ahandle_side_effects(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    db: AsyncSession = input_data["db"] 
+    user_id: int = input_data["user_id"] 
+    intent: Intent = input_data["parsed_intent"] 
+
+    if intent.intent_type == IntentType.PROFILE_UPDATE and intent.preference_type and intent.preference_value:
+        try: 
+            score_delta = 1.0 
+
+            queued = write_behind.enqueue_preference(user_id, intent.preference_type, intent.preference_value, score_delta) 
+            if not queued:
+                await user_manager.aupdate_user_preference_score(
+                    db=db,
+                    user_id=user_id,
+                    preference_type=intent.preference_type,
+                    preference_value=intent.preference_value,
+                    score_delta=score_delta
+                )
             print(f"✅ user {user_id} preferenceupdated: Type='{intent.preference_type}', Value='{intent.preference_value}' (Delta: {score_delta})")
 
         except Exception as e:
@@ -28,4 +57,4 @@ def handle_side_effects(input_data: Dict[str, Any]) -> Dict[str, Any]:
     return input_data
 
 def get_memory_manager_chain():
-    return RunnableLambda(handle_side_effects).with_types(input_type=dict, output_type=dict)
\ No newline at end of file
+    return RunnableLambda(handle_side_effects, afunc=ahandle_side_effects).with_types(input_type=dict, output_type=dict)
\ No newline at end of file
@@ -0,0 +1,57 @@
+# Helpers for turning raw LLM text into something the output parsers accept
+import json
+import re
+from typing import Iterator, Optional
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def _balanced_objects(text: str) -> Iterator[str]:
+    """Yields every top-level {...} span in `text`, skipping braces inside JSON strings."""
+    depth, start, in_string, escaped = 0, None, False, False
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"' and depth:
+            in_string = True
+        elif char == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif char == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                yield text[start:i + 1]
+
+
+def _loads(candidate: str) -> Optional[str]:
+    for attempt in (candidate, _TRAILING_COMMA.sub(r"\1", candidate)):
+        try:
+            value = json.loads(attempt)
+        except ValueError:
+            continue
+        if isinstance(value, dict):
+            return attempt
+    return None
+
+
+def extract_json(text: str) -> str:
+    """
+    Returns the first JSON object found in an LLM reply: inside a ``` fence if there is
+    one, otherwise anywhere in the text, so preambles ("Here is the JSON:") and trailing
+    commentary are dropped. Trailing commas are removed. If nothing parses, the stripped
+    text is returned unchanged and the output parser reports the error.
+    """
+    sources = [block for block in _FENCE.findall(text)] + [text]
+    for source in sources:
+        for candidate in _balanced_objects(source):
+            parsed = _loads(candidate)
+            if parsed is not None:
+                return parsed
+    return text.strip()
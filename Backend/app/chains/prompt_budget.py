@@ -0,0 +1,222 @@
+# Token budgets for the prompt of each chain stage
+import logging
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO
+)
+
+# Hugging Face tokenizer used for counting. Leave empty to always use the estimate below.
+PROMPT_TOKENIZER = os.getenv("PROMPT_TOKENIZER", "mistralai/Mistral-7B-Instruct-v0.3")
+# Used when the tokenizer cannot be loaded: roughly 4 characters per token for English text.
+CHARS_PER_TOKEN = 4
+
+STAGE_CONTEXT = "context"
+STAGE_INTENT = "intent"
+STAGE_RESPONSE = "response"
+# Fused context + intent stage (INTENT_CONTEXT_MODE=fused); one prompt carrying both sets of instructions.
+STAGE_CONTEXT_INTENT = "context_intent"
+
+# Input token budget per stage (the whole rendered prompt, instructions included).
+DEFAULT_STAGE_BUDGETS = {
+    STAGE_CONTEXT: 2048,
+    STAGE_INTENT: 1024,
+    STAGE_RESPONSE: 3072,
+    STAGE_CONTEXT_INTENT: 2560,
+}
+
+TRUNCATION_MARKER = " [...]"
+
+
+class PromptSection(NamedTuple):
+    """
+    A variable part of a prompt. Sections with the highest `priority` number are trimmed
+    first, never below `min_tokens`. `keep` is the end of the text that survives trimming:
+    'head' for ranked content, 'tail' for history where the latest turns matter most.
+    """
+    name: str
+    priority: int
+    min_tokens: int = 0
+    keep: str = "head"
+
+
+def get_stage_budget(stage: str) -> int:
+    return int(os.getenv(f"PROMPT_BUDGET_{stage.upper()}", str(DEFAULT_STAGE_BUDGETS.get(stage, 2048))))
+
+
+_tokenizer = None
+_tokenizer_loaded = False
+_tokenizer_lock = threading.Lock()
+
+
+def get_tokenizer():
+    """Loads the configured tokenizer once per process; None means the character estimate is used."""
+    global _tokenizer, _tokenizer_loaded
+
+    if _tokenizer_loaded:
+        return _tokenizer
+
+    with _tokenizer_lock:
+        if not _tokenizer_loaded:
+            if PROMPT_TOKENIZER:
+                try:
+                    from tokenizers import Tokenizer
+                    _tokenizer = Tokenizer.from_pretrained(PROMPT_TOKENIZER, token=os.getenv("HUGGINGFACE_API_KEY"))
+                    logging.info(f"✅ Prompt budget tokenizer '{PROMPT_TOKENIZER}' loaded.")
+                except Exception as e:
+                    logging.warning(f"❌ Could not load tokenizer '{PROMPT_TOKENIZER}', estimating tokens from length: {e}")
+            _tokenizer_loaded = True
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def _snap(text: str, keep: str) -> str:
+    # Prefer cutting between lines (whole retrieved shows, whole turns), then between words.
+    for separator in ("\n", " "):
+        if keep == "head":
+            cut = text.rfind(separator)
+            if cut > len(text) // 2:
+                return text[:cut]
+        else:
+            cut = text.find(separator)
+            if 0 <= cut < len(text) // 2:
+                return text[cut + 1:]
+    return text
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep: str = "head") -> str:
+    """Cuts `text` to at most `max_tokens` tokens (marker included), preferring line and word boundaries."""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    max_tokens -= count_tokens(TRUNCATION_MARKER)
+    if max_tokens <= 0:
+        return ""
+
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        max_chars = max_tokens * CHARS_PER_TOKEN
+        kept = text[:max_chars] if keep == "head" else text[-max_chars:]
+    else:
+        offsets = tokenizer.encode(text, add_special_tokens=False).offsets
+        kept = text[:offsets[max_tokens - 1][1]] if keep == "head" else text[offsets[len(offsets) - max_tokens][0]:]
+
+    kept = _snap(kept, keep)
+    return kept.rstrip() + TRUNCATION_MARKER if keep == "head" else TRUNCATION_MARKER.strip() + " " + kept.lstrip()
+
+
+def count_prompt_tokens(prompt: ChatPromptTemplate) -> int:
+    """Tokens used by a prompt's fixed instructions, i.e. the prompt rendered with every variable empty."""
+    return count_tokens(prompt.format(**{name: "" for name in prompt.input_variables}))
+
+
+class PromptBudget:
+    def __init__(self, stage: str, sections: List[PromptSection], budget: Optional[int] = None, reserved_tokens: int = 0):
+        self.stage = stage
+        self.sections = sections
+        self.budget = budget if budget is not None else get_stage_budget(stage)
+        self.reserved_tokens = reserved_tokens
+
+    def fit(self, values: Dict[str, Any]) -> Tuple[Dict[str, str], Dict[str, Dict[str, int]]]:
+        """
+        Returns the section values trimmed so that, with the reserved instruction tokens,
+        they fit the stage budget, plus a per-section report of tokens before and after.
+        """
+        texts = {section.name: "" if values.get(section.name) is None else str(values.get(section.name)) for section in self.sections}
+        used = {name: count_tokens(text) for name, text in texts.items()}
+        report = {name: {"tokens": tokens, "original_tokens": tokens} for name, tokens in used.items()}
+
+        overflow = self.reserved_tokens + sum(used.values()) - self.budget
+        for section in sorted(self.sections, key=lambda s: s.priority, reverse=True):
+            if overflow <= 0:
+                break
+            allowed = max(section.min_tokens, used[section.name] - overflow)
+            if allowed >= used[section.name]:
+                continue
+
+            texts[section.name] = truncate_to_tokens(texts[section.name], allowed, section.keep)
+            new_count = count_tokens(texts[section.name])
+            overflow -= used[section.name] - new_count
+            used[section.name] = new_count
+            report[section.name]["tokens"] = new_count
+
+        _record(self.stage, self.budget, self.reserved_tokens, report, overflow > 0)
+        return texts, report
+
+    def apply(self, input_data: Any) -> Dict[str, Any]:
+        # A single-section stage can receive its value on its own rather than in a dict.
+        if not isinstance(input_data, dict):
+            input_data = {self.sections[0].name: getattr(input_data, self.sections[0].name, input_data)}
+        texts, _ = self.fit(input_data)
+        return {**input_data, **texts}
+
+    def as_runnable(self) -> RunnableLambda:
+        return RunnableLambda(self.apply).with_types(output_type=dict)
+
+
+# --- Usage reporting ---
+_stats_lock = threading.Lock()
+_stage_stats: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+    "calls": 0,
+    "trimmed_calls": 0,
+    "over_budget_calls": 0,
+    "last": {},
+    "section_tokens_total": defaultdict(int),
+})
+
+
+def _record(stage: str, budget: int, reserved_tokens: int, report: Dict[str, Dict[str, int]], over_budget: bool) -> None:
+    trimmed = {name: r for name, r in report.items() if r["tokens"] < r["original_tokens"]}
+    total = reserved_tokens + sum(r["tokens"] for r in report.values())
+
+    with _stats_lock:
+        stats = _stage_stats[stage]
+        stats["budget"] = budget
+        stats["calls"] += 1
+        stats["trimmed_calls"] += 1 if trimmed else 0
+        stats["over_budget_calls"] += 1 if over_budget else 0
+        stats["last"] = {"instructions": reserved_tokens, **{name: r["tokens"] for name, r in report.items()}, "total": total}
+        for name, r in report.items():
+            stats["section_tokens_total"][name] += r["tokens"]
+
+    sections = ", ".join(
+        f"{name}={r['tokens']}" + (f" (trimmed from {r['original_tokens']})" if name in trimmed else "")
+        for name, r in report.items()
+    )
+    logging.info(f"📏 Prompt tokens [{stage}] total={total}/{budget} instructions={reserved_tokens}, {sections}")
+    if over_budget:
+        logging.warning(f"❌ Prompt for stage '{stage}' is still over budget after trimming every section to its minimum.")
+
+
+def get_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        return {
+            stage: {
+                "budget": stats.get("budget"),
+                "calls": stats["calls"],
+                "trimmed_calls": stats["trimmed_calls"],
+                "over_budget_calls": stats["over_budget_calls"],
+                "last": dict(stats["last"]),
+                "avg_section_tokens": {
+                    name: total / stats["calls"] for name, total in stats["section_tokens_total"].items()
+                },
+            }
+            for stage, stats in _stage_stats.items()
+        }
@@ -0,0 +1,244 @@
+"""
+Process-wide registry for the movie assistant chain.
+
+The chain and its provider clients (HuggingFace endpoints, Google embeddings,
+the Pinecone connection) are built once, at startup, and shared by every request
+handled by this process. The assembled chain holds no per-request state (the DB
+session, user and session ids all travel in the chain input), so sharing it
+between concurrent requests is safe.
+
+Each worker process builds its own copy in its startup hook: network clients
+must not be shared across a fork, so "once per process" is the unit of sharing.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import context_enhancer, intent_parser, response_generator, show_retriever, prompt_budget, context_intent
+from .memory_manager import get_memory_manager_chain
+from .main_chain import build_movie_assistant_chain, build_movie_assistant_stages
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for config changes on the request path.
+CONFIG_CHECK_INTERVAL = float(os.getenv("CHAIN_CONFIG_CHECK_INTERVAL", "30"))
+
+STATUS_NOT_STARTED = "not_started"
+STATUS_BUILDING = "building"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+
+class ChainUnavailable(RuntimeError):
+    """No chain has been built yet because the last build failed; a rebuild is retried in the background."""
+
+
+# component name -> (factory, config reader). The config reader returns every setting
+# the factory reads at build time, so a component is only rebuilt when its own
+# configuration changes.
+COMPONENTS: Dict[str, Tuple[Callable[[], Any], Callable[[], Tuple]]] = {
+    "context_chain": (
+        context_enhancer.get_context_enhancer_chain,
+        lambda: (context_enhancer.LLM_MODEL, os.getenv("HUGGINGFACE_API_KEY"), prompt_budget.get_stage_budget(prompt_budget.STAGE_CONTEXT))
+    ),
+    "intent_chain": (
+        intent_parser.get_intent_parser_chain,
+        lambda: (intent_parser.LLM_MODEL, os.getenv("HUGGINGFACE_API_KEY"), prompt_budget.get_stage_budget(prompt_budget.STAGE_INTENT))
+    ),
+    # Built only in fused mode; None keeps the two-call context and intent stages.
+    "context_intent_chain": (
+        lambda: context_intent.get_context_intent_chain() if context_intent.INTENT_CONTEXT_MODE == context_intent.MODE_FUSED else None,
+        lambda: (
+            context_intent.INTENT_CONTEXT_MODE,
+            context_intent.LLM_MODEL,
+            os.getenv("HUGGINGFACE_API_KEY"),
+            prompt_budget.get_stage_budget(prompt_budget.STAGE_CONTEXT_INTENT)
+        )
+    ),
+    "memory_chain": (
+        get_memory_manager_chain,
+        lambda: ()
+    ),
+    "retriever_chain": (
+        show_retriever.get_show_retirever_chain,
+        lambda: (
+            show_retriever.INDEX_NAME,
+            show_retriever.EMBEDDING_MODEL_NAME,
+            os.getenv("GEMINI_API_KEY"),
+            os.getenv("PINECONE_API_KEY"),
+            show_retriever.VECTOR_STORE_BACKEND,
+            show_retriever.LOCAL_VECTOR_STORE_PATH
+        )
+    ),
+    "response_chain": (
+        response_generator.get_response_generator_chain,
+        lambda: (response_generator.LLM_MODEL, os.getenv("HUGGINGFACE_API_KEY"), prompt_budget.get_stage_budget(prompt_budget.STAGE_RESPONSE))
+    ),
+}
+
+
+def _fingerprint(config: Tuple) -> str:
+    # Hash rather than store the raw tuple so API keys never sit in the status payload.
+    return hashlib.sha256(repr(config).encode("utf-8")).hexdigest()
+
+
+class ChainRegistry:
+    def __init__(self, components: Dict[str, Tuple[Callable[[], Any], Callable[[], Tuple]]]):
+        self._components = components
+        self._lock = threading.RLock()
+        self._built: Dict[str, Any] = {}
+        self._fingerprints: Dict[str, str] = {}
+        self._built_at: Dict[str, datetime] = {}
+        self._chain = None
+        self._stages = None
+        self._status = STATUS_NOT_STARTED
+        self._error: Optional[str] = None
+        self._last_config_check = 0.0
+        self._background_refresh: Optional[asyncio.Future] = None
+
+    def _stale_components(self) -> Dict[str, str]:
+        stale = {}
+        for name, (_, read_config) in self._components.items():
+            fingerprint = _fingerprint(read_config())
+            if self._fingerprints.get(name) != fingerprint:
+                stale[name] = fingerprint
+        return stale
+
+    def refresh(self) -> Any:
+        """Builds missing components, rebuilds those whose config changed, and
+        reassembles the chain if anything was (re)built."""
+        with self._lock:
+            self._last_config_check = time.monotonic()
+            stale = self._stale_components()
+            if not stale and self._chain is not None:
+                return self._chain
+
+            self._status = STATUS_BUILDING
+            try:
+                built = dict(self._built)
+                for name, fingerprint in stale.items():
+                    factory, _ = self._components[name]
+                    started = time.perf_counter()
+                    built[name] = factory()
+                    logger.info(f"Chain component '{name}' built in {time.perf_counter() - started:.2f}s.")
+                    self._fingerprints[name] = fingerprint
+                    self._built_at[name] = datetime.utcnow()
+
+                # Only swap in the new chain once every component built successfully.
+                self._chain = build_movie_assistant_chain(**built)
+                self._stages = build_movie_assistant_stages(**built)
+                self._built = built
+                self._status = STATUS_READY
+                self._error = None
+            except Exception as e:
+                for name in stale:
+                    self._fingerprints.pop(name, None)
+                self._status = STATUS_READY if self._chain is not None else STATUS_FAILED
+                self._error = str(e)
+                logger.error(f"Failed to build movie assistant chain: {e}", exc_info=True)
+                if self._chain is None:
+                    raise
+            return self._chain
+
+    def get_chain(self) -> Any:
+        """Returns the shared chain, building it on first use if startup did not."""
+        chain = self._chain
+        if chain is not None and time.monotonic() - self._last_config_check < CONFIG_CHECK_INTERVAL:
+            return chain
+        return self.refresh()
+
+    def get_stages(self) -> List[Tuple[str, Any]]:
+        """Returns the same pipeline as `get_chain()`, split into named stages for streaming."""
+        self.get_chain()
+        return self._stages
+
+    # --- Event loop side ---
+    # refresh() takes a thread lock and may build provider clients synchronously, so
+    # async handlers never call it on the loop: the first build runs in a worker thread,
+    # and config checks and rebuilds after a failure run in the background.
+
+    def _refresh_due(self) -> bool:
+        return time.monotonic() - self._last_config_check >= CONFIG_CHECK_INTERVAL
+
+    def _refresh_quietly(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            pass  # already logged and recorded in status() by refresh()
+
+    def _schedule_refresh(self) -> None:
+        if self._background_refresh is not None and not self._background_refresh.done():
+            return
+        # Claims the interval now, so requests arriving before the thread starts do not schedule another.
+        self._last_config_check = time.monotonic()
+        self._background_refresh = asyncio.get_running_loop().run_in_executor(None, self._refresh_quietly)
+
+    async def aget_chain(self) -> Any:
+        """
+        `get_chain()` for async handlers. Raises ChainUnavailable while the status is
+        failed; the rebuild is retried in the background every CONFIG_CHECK_INTERVAL.
+        """
+        if self._chain is None and self._status != STATUS_FAILED:
+            # Startup has not built it (yet): build it, off the loop.
+            return await asyncio.to_thread(self.refresh)
+
+        if self._refresh_due():
+            self._schedule_refresh()
+        chain = self._chain
+        if chain is None:
+            raise ChainUnavailable(self._error or "The movie assistant chain failed to build.")
+        return chain
+
+    async def aget_stages(self) -> List[Tuple[str, Any]]:
+        await self.aget_chain()
+        return self._stages
+
+    def get_component(self, name: str) -> Any:
+        self.get_chain()
+        return self._built[name]
+
+    def is_ready(self) -> bool:
+        return self._chain is not None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "status": self._status,
+            "ready": self.is_ready(),
+            "error": self._error,
+            "components": {
+                name: self._built_at[name].isoformat() if name in self._built_at else None
+                for name in self._components
+            }
+        }
+
+
+registry = ChainRegistry(COMPONENTS)
+
+
+def get_chain() -> Any:
+    return registry.get_chain()
+
+
+def get_stages() -> List[Tuple[str, Any]]:
+    return registry.get_stages()
+
+
+async def aget_chain() -> Any:
+    return await registry.aget_chain()
+
+
+async def aget_stages() -> List[Tuple[str, Any]]:
+    return await registry.aget_stages()
+
+
+def warm_up() -> None:
+    registry.refresh()
+
+
+def get_status() -> Dict[str, Any]:
+    return registry.status()
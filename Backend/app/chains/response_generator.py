@@ -1,9 +1,11 @@
 import os 
 from dotenv import load_dotenv
 from langchain_core.prompts import ChatPromptTemplate 
-from langchain_core.runnables import RunnablePassthrough 
+from langchain_core.runnables import RunnablePassthrough, RunnableGenerator 
 from langchain_huggingface.llms import HuggingFaceEndpoint 
-from typing import Dict, Any 
+from typing import Dict, Any, Iterator, AsyncIterator 
+
+from .prompt_budget import PromptBudget, PromptSection, count_prompt_tokens, STAGE_RESPONSE 
 
 load_dotenv() 
 
@@ -16,6 +18,39 @@ else:
 
 LLM_MODEL = "microsoft/DialoGPT-medium" 
 
+
+def _strip_chunk(chunk: str, started: bool, pending: str):
+    """One step of a streaming str.strip(): returns (text_to_emit, started, pending)."""
+    if not started:
+        chunk = chunk.lstrip() 
+        if not chunk:
+            return "", False, pending 
+        started = True 
+
+    body = chunk.rstrip() 
+    if not body:
+        return "", started, pending + chunk 
+    return pending + body, started, chunk[len(body):] 
+
+def strip_stream(chunks: Iterator[str]) -> Iterator[str]:
+    """Streaming equivalent of str.strip(): trailing whitespace is held back until more text follows it."""
+    started, pending = False, "" 
+    for chunk in chunks:
+        text, started, pending = _strip_chunk(chunk, started, pending) 
+        if text:
+            yield text 
+    if not started:
+        yield "" 
+
+async def astrip_stream(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    started, pending = False, "" 
+    async for chunk in chunks:
+        text, started, pending = _strip_chunk(chunk, started, pending) 
+        if text:
+            yield text 
+    if not started:
+        yield "" 
+
 def get_response_generator_chain():
     try:
         llm = HuggingFaceEndpoint(
@@ -23,7 +58,7 @@ def get_response_generator_chain():
             task="text-generation",
             temperature=0.8, 
             max_new_tokens=1024,
-            huggingfacehub_api_token=HUGGINGFACE_API_KEY,
+            huggingfacehub_api_token=os.getenv("HUGGINGFACE_API_KEY"),
         )
     except Exception as e:
         print(f"❌ HuggingFace model {LLM_MODEL} failed: {e}")
@@ -32,7 +67,7 @@ def get_response_generator_chain():
             task="text2text-generation",
             temperature=0.8, 
             max_new_tokens=1024,
-            huggingfacehub_api_token=HUGGINGFACE_API_KEY,
+            huggingfacehub_api_token=os.getenv("HUGGINGFACE_API_KEY"),
         )
 
     system_prompt = ("""
@@ -79,10 +114,25 @@ def get_response_generator_chain():
         ("human", "User's Last Message: {user_input}")
     ])
 
+    # Trimmed first: the profile, then the conversation context, then the lower-ranked
+    # retrieved shows. The intent and the user's message are kept whole.
+    budget = PromptBudget(
+        STAGE_RESPONSE,
+        sections=[
+            PromptSection("user_input", priority=0, min_tokens=256),
+            PromptSection("parsed_intent", priority=1, min_tokens=128),
+            PromptSection("retrieved_docs", priority=2, min_tokens=512),
+            PromptSection("context_summary", priority=3, min_tokens=128),
+            PromptSection("user_profile_data", priority=4, min_tokens=64),
+        ],
+        reserved_tokens=count_prompt_tokens(prompt)
+    )
+
     chain = (
-        prompt 
+        budget.as_runnable()
+        | prompt 
         | llm 
-        | (lambda x: x.strip())
+        | RunnableGenerator(strip_stream, astrip_stream)
     )
 
     return chain 
\ No newline at end of file
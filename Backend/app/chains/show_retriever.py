@@ -1,12 +1,15 @@
 import os 
-from langchain_core.runnables import RunnablePassthrough, RunnableLambda 
+from langchain_core.runnables import RunnablePassthrough, RunnableLambda, RunnableBranch 
 from langchain_pinecone import PineconeVectorStore 
 from langchain_google_genai import GoogleGenerativeAIEmbeddings 
 from langchain_core.documents import Document 
-from typing import Dict, Any 
+from typing import Dict, Any, List, Tuple, Optional 
 from pinecone import Pinecone 
 
 from ..services import show_manager 
+from ..services.vector_store import LocalVectorStore 
+from ..services.embedding_cache import CachedQueryEmbeddings 
+from ..services import semantic_cache 
 from ..models.pydantic_models import IntentType
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") 
@@ -14,30 +17,72 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 INDEX_NAME = "cinepal-recommendations" 
 EMBEDDING_MODEL_NAME = "text-embedding-004" 
 
+# 'pinecone' or 'local'. The other backend, when it is available, serves as the fallback.
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone").lower() 
+LOCAL_VECTOR_STORE_PATH = os.getenv("LOCAL_VECTOR_STORE_PATH", "data/vector_index") 
+VECTOR_STORE_BACKENDS = ["pinecone", "local"] 
+# Shows retrieved per recommendation query.
+RETRIEVAL_K = 3 
+
+def connect_vector_store(backend: str, embeddings):
+    if backend == "local":
+        vectorstore = LocalVectorStore(embeddings, LOCAL_VECTOR_STORE_PATH) 
+        if not len(vectorstore.index):
+            raise ValueError(f"local vector index at '{LOCAL_VECTOR_STORE_PATH}' is empty") 
+        return vectorstore 
+    if backend == "pinecone":
+        return PineconeVectorStore.from_existing_index(
+            index_name=INDEX_NAME,
+            embedding=embeddings
+        )
+    raise ValueError(f"unknown vector store backend '{backend}'") 
+
+def get_vector_stores(embeddings) -> List[Tuple[str, Any]]:
+    """Connected stores, the configured backend first, followed by any fallback that is available."""
+    backends = [VECTOR_STORE_BACKEND] + [b for b in VECTOR_STORE_BACKENDS if b != VECTOR_STORE_BACKEND] 
+
+    stores = [] 
+    for backend in backends:
+        try:
+            stores.append((backend, connect_vector_store(backend, embeddings))) 
+        except Exception as e:
+            print(f"Vector store backend '{backend}' unavailable: {e}") 
+    return stores 
+
+def get_scored_search(store):
+    """Similarity search that keeps each match's score (as_retriever would drop it)."""
+    def search(query: str) -> List[Tuple[Document, float]]:
+        return store.similarity_search_with_score(query, k=RETRIEVAL_K) if query else []
+
+    async def asearch(query: str) -> List[Tuple[Document, float]]:
+        return await store.asimilarity_search_with_score(query, k=RETRIEVAL_K) if query else []
+
+    return RunnableLambda(search, afunc=asearch) 
+
 def get_show_retirever_chain():
     # Initialize Google Embeddings for API based RAG lookup
     try:
-        embeddings = GoogleGenerativeAIEmbeddings(
-            model=EMBEDDING_MODEL_NAME,
-            google_api_key=GEMINI_API_KEY
+        # Search queries repeat a lot, so their embeddings are served from a shared cache when possible.
+        embeddings = CachedQueryEmbeddings(
+            GoogleGenerativeAIEmbeddings(
+                model=EMBEDDING_MODEL_NAME,
+                google_api_key=os.getenv("GEMINI_API_KEY")
+            ),
+            model_name=EMBEDDING_MODEL_NAME
         )
     except Exception as e:
         print(f"Error initializing Google Embeddings: {e}") 
-        return RunnablePassthrough.assign(retrieved_docs=RunnableLambda(lambda x: "RAG UNAVAILABLE: Embeddings Error")) 
+        return RunnablePassthrough.assign(retrieved_shows=lambda x: [], retrieved_docs=lambda x: "RAG UNAVAILABLE: Embeddings Error") 
     
-    # Connect to pinecone vector store
-    try:
-        vectorstore = PineconeVectorStore.from_existing_index(
-            index_name=INDEX_NAME,
-            embedding=embeddings
-        )
-
-        retriever = vectorstore.as_retriever(search_kwargs={"k": 3}) 
-
-    except Exception as e:
-        print(f"Error connecting to pinecone: {e}") 
+    # Connect to the configured vector store; a query that fails on it is retried on the fallback
+    stores = get_vector_stores(embeddings) 
+    if not stores:
         print("Falling back to a non-RAG chain.") 
-        return RunnablePassthrough.assign(retrieved_docs=RunnableLambda(lambda x: "RAG UNAVAILABLE: Pinecone Error")) 
+        return RunnablePassthrough.assign(retrieved_shows=lambda x: [], retrieved_docs=lambda x: "RAG UNAVAILABLE: Vector Store Error") 
+
+    print(f"✅ Vector store backends: {', '.join(name for name, _ in stores)}") 
+    searches = [get_scored_search(store) for _, store in stores] 
+    scored_search = searches[0].with_fallbacks(searches[1:]) if len(searches) > 1 else searches[0] 
     
     def get_search_query(input_data: Dict[str, Any]) -> str:
         parsed_intent = input_data.get("parsed_intent")
@@ -45,13 +90,58 @@ def get_show_retirever_chain():
             return parsed_intent.search_query
         return "" 
 
-    chain = (
-        RunnablePassthrough.assign(
-            retrieved_docs=(
-                RunnableLambda(get_search_query).with_types(input_type=dict, output_type=str) 
-                | RunnableLambda(lambda query: retriever.invoke(query) if query else []) 
-                | show_manager.format_retrieved_docs 
+    # Semantic cache: a query close enough to one already answered for the same taste profile
+    # reuses that turn's retrieved shows (and, if enabled, its response).
+    def semantic_fields(input_data: Dict[str, Any], query: str, vector: Optional[List[float]]) -> Dict[str, Any]:
+        match = None 
+        if vector is not None:
+            match = semantic_cache.response_cache.lookup(
+                vector, semantic_cache.profile_fingerprint(input_data.get("user_profile_data"))
             )
-        ).with_types(input_type=dict)
-    )
+        return {**input_data, "search_query": query, "search_embedding": vector, "semantic_match": match} 
+
+    def lookup_semantic_cache(input_data: Dict[str, Any]) -> Dict[str, Any]:
+        query = get_search_query(input_data) 
+        vector = None 
+        if semantic_cache.SEMANTIC_CACHE_ENABLED and query:
+            try:
+                vector = embeddings.embed_query(query) 
+            except Exception as e:
+                print(f"Semantic cache lookup skipped: {e}") 
+        return semantic_fields(input_data, query, vector) 
+
+    async def alookup_semantic_cache(input_data: Dict[str, Any]) -> Dict[str, Any]:
+        query = get_search_query(input_data) 
+        vector = None 
+        if semantic_cache.SEMANTIC_CACHE_ENABLED and query:
+            try:
+                vector = await embeddings.aembed_query(query) 
+            except Exception as e:
+                print(f"Semantic cache lookup skipped: {e}") 
+        return semantic_fields(input_data, query, vector) 
+
+    # Later stages read the structured `retrieved_shows`; `retrieved_docs` is only the prompt rendering.
+    render_shows = RunnablePassthrough.assign(
+        retrieved_docs=lambda x: show_manager.format_retrieved_shows(x["retrieved_shows"])
+    ) 
+
+    retrieval = RunnablePassthrough.assign(
+        retrieved_shows=(
+            RunnableLambda(get_search_query).with_types(input_type=dict, output_type=str) 
+            | scored_search 
+            | show_manager.to_retrieved_shows 
+        )
+    ) 
+
+    chain = (
+        RunnableLambda(lookup_semantic_cache, afunc=alookup_semantic_cache) 
+        | RunnableBranch(
+            (
+                lambda x: x["semantic_match"] is not None,
+                RunnablePassthrough.assign(retrieved_shows=lambda x: x["semantic_match"].retrieved_shows)
+            ),
+            retrieval
+        ) 
+        | render_shows
+    ).with_types(input_type=dict) 
     return chain
\ No newline at end of file
@@ -1,6 +1,11 @@
 import os
+import asyncio 
+import multiprocessing 
+import threading 
+import time 
+from concurrent.futures import ProcessPoolExecutor 
 from datetime import datetime, timedelta, timezone 
-from typing import Optional, Any 
+from typing import Optional, Any, Dict, Tuple 
 from dotenv import load_dotenv
 import logging 
 
@@ -24,7 +29,15 @@ else:
 ALGORITHM = "HS256" 
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto") 
+# bcrypt work factor. Hashes made with any other cost are re-hashed at this one on the
+# user's next successful login, so the cost can be raised (or lowered) gradually.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Processes that run bcrypt for the API; 0 runs it on the default thread pool instead.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hashing requests allowed in flight (running or queued) before new ones are refused.
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS) 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -32,6 +45,85 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(valid, new_hash): new_hash is set when the stored hash uses an outdated scheme or cost."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+# --- Password hashing pool ---
+# bcrypt is deliberately slow CPU work. Run on the request path it occupies the threads
+# that serve every other request, so the API hands it to a separate, bounded process pool.
+
+class PasswordHashingBusy(Exception):
+    """Raised when PASSWORD_HASH_MAX_PENDING hashing requests are already in flight."""
+
+
+_hash_pool: Optional[ProcessPoolExecutor] = None 
+_hash_lock = threading.Lock() 
+_hash_stats = {"submitted": 0, "completed": 0, "rejected": 0, "rehashed": 0, "in_flight": 0, "total_seconds": 0.0} 
+
+def _get_hash_pool() -> Optional[ProcessPoolExecutor]:
+    global _hash_pool
+    if PASSWORD_HASH_WORKERS <= 0:
+        return None
+    with _hash_lock:
+        if _hash_pool is None:
+            # spawn: the workers must not inherit the server's threads and open connections.
+            _hash_pool = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _hash_pool
+
+def start_hash_pool() -> None:
+    pool = _get_hash_pool() 
+    if pool is not None:
+        # Start the worker processes now rather than on the first login.
+        for future in [pool.submit(os.getpid) for _ in range(PASSWORD_HASH_WORKERS)]:
+            future.result() 
+        logging.info(f"✅ Password hashing pool started with {PASSWORD_HASH_WORKERS} workers.")
+
+def shutdown_hash_pool() -> None:
+    global _hash_pool
+    with _hash_lock:
+        pool, _hash_pool = _hash_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+async def _run_hashing(func, *args):
+    with _hash_lock:
+        if _hash_stats["in_flight"] >= PASSWORD_HASH_MAX_PENDING:
+            _hash_stats["rejected"] += 1
+            raise PasswordHashingBusy(f"{PASSWORD_HASH_MAX_PENDING} password hashing requests already pending")
+        _hash_stats["in_flight"] += 1
+        _hash_stats["submitted"] += 1
+
+    started = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_hash_pool(), func, *args)
+    finally:
+        with _hash_lock:
+            _hash_stats["in_flight"] -= 1
+            _hash_stats["completed"] += 1
+            _hash_stats["total_seconds"] += time.perf_counter() - started
+
+async def aget_password_hash(password: str) -> str:
+    return await _run_hashing(get_password_hash, password)
+
+async def averify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    valid, new_hash = await _run_hashing(verify_and_update_password, plain_password, hashed_password)
+    if new_hash is not None:
+        with _hash_lock:
+            _hash_stats["rehashed"] += 1
+    return valid, new_hash
+
+def get_hash_stats() -> Dict[str, Any]:
+    with _hash_lock:
+        stats = dict(_hash_stats)
+    stats["avg_seconds"] = stats.pop("total_seconds") / stats["completed"] if stats["completed"] else 0.0
+    stats.update({"workers": PASSWORD_HASH_WORKERS, "max_pending": PASSWORD_HASH_MAX_PENDING, "bcrypt_rounds": BCRYPT_ROUNDS})
+    return stats
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy() 
     if expires_delta:
@@ -1,18 +1,18 @@
 from typing import Optional 
-from fastapi import Depends, HTTPException, status 
+from fastapi import Depends, HTTPException, Request, status 
 from fastapi.security import OAuth2PasswordBearer 
 from sqlalchemy.orm import Session 
 from jose import JWTError 
 
 from ..core import auth 
-from ..services import user_manager
+from ..services import user_cache
 from ..services.database import get_db  
 from ..models.pydantic_models import UserInDB
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login/token")
 
-def get_current_active_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> UserInDB:
+def get_current_active_user(request: Request, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> UserInDB:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED, 
         detail="Could not validate credentials", 
@@ -34,10 +34,14 @@ def get_current_active_user(db: Session = Depends(get_db), token: str = Depends(
     except ValueError:
         raise credentials_exception 
     
-    db_user = user_manager.get_user_by_id(db, user_id=user_id)  
+    # Memoized for the request and cached briefly across requests; see services/user_cache.
+    user = user_cache.get_user(db, user_id=user_id, request=request)  
 
-    if db_user is None:
+    if user is None:
         raise credentials_exception 
+
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user") 
     
-    return user_manager.convert_db_user_to_userindb(db_user)  
+    return user  
 
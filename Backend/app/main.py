@@ -3,10 +3,15 @@ from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware 
 from fastapi.responses import JSONResponse 
 
-from .services.database import create_all_tables 
+from .services.database import create_all_tables, async_engine 
+from .chains import registry, prompt_budget, intent_classifier 
+from .services.http_client import aclose_async_client 
+from .core import auth 
+from .services import news_cache, tmdb_client, show_manager, embedding_cache, semantic_cache, write_behind, user_cache, profile_cache 
 
 from .api.endpoints.auth import router as auth_router 
 from .api.endpoints.chat import router as chat_router 
+from .api.endpoints.history import router as history_router 
 
 logger = logging.getLogger(__name__) 
 
@@ -25,6 +30,29 @@ def on_startup():
     except Exception as e:
         logger.critical(f"Failed to connect to database or create tables: {e}") 
 
+    # Build the chain and its provider clients once, before the first chat request.
+    try:
+        registry.warm_up() 
+        logger.info("Movie assistant chain built and ready.") 
+    except Exception as e:
+        logger.critical(f"Failed to build the movie assistant chain: {e}") 
+
+@app.on_event("startup") 
+async def start_background_tasks():
+    news_cache.start_refresher() 
+    write_behind.start_worker() 
+    auth.start_hash_pool() 
+
+@app.on_event("shutdown") 
+async def on_shutdown():
+    await news_cache.stop_refresher() 
+    # Commit queued chat turns and preference updates before the engines go away.
+    write_behind.stop_worker() 
+    auth.shutdown_hash_pool() 
+    tmdb_client.client.close() 
+    await aclose_async_client() 
+    await async_engine.dispose() 
+
 origins =[
     "*"
 ]
@@ -41,9 +69,35 @@ app.include_router(auth_router, prefix="/auth")
 
 app.include_router(chat_router, prefix="/api") 
 
+app.include_router(history_router, prefix="/api") 
+
 @app.get("/", status_code=status.HTTP_200_OK, tags=["System"]) 
 def root():
     """Health checkpoint"""
     return {
         "message": "👍🏽 CinePal API is running and healthy"
-    }
\ No newline at end of file
+    }
+
+@app.get("/ready", tags=["System"]) 
+def ready():
+    """Readiness check: 200 once the shared movie assistant chain is built, 503 until then."""
+    chain_status = registry.get_status() 
+    status_code = status.HTTP_200_OK if chain_status["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(status_code=status_code, content={"chain": chain_status})
+
+@app.get("/metrics", status_code=status.HTTP_200_OK, tags=["System"]) 
+def metrics():
+    """Counters for the external providers and in-process caches."""
+    return {
+        "tmdb": tmdb_client.get_stats(),
+        "tmdb_cache": tmdb_client.get_cache_stats(),
+        "show_refresh": show_manager.get_refresh_stats(),
+        "prompt_tokens": prompt_budget.get_stats(),
+        "query_embeddings": embedding_cache.get_stats(),
+        "semantic_cache": semantic_cache.get_stats(),
+        "intent_cascade": intent_classifier.get_stats(),
+        "write_behind": write_behind.get_stats(),
+        "user_cache": user_cache.get_stats(),
+        "profile_snapshots": profile_cache.get_stats(),
+        "password_hashing": auth.get_hash_stats()
+    }
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, JSON, Float
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, JSON, Float, Index
 from sqlalchemy.orm import relationship
 from ..services.database import Base
 from datetime import datetime
@@ -13,6 +13,7 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     is_active = Column(Boolean, default=True)
+    profile_version = Column(Integer, nullable=False, default=0, server_default="0") # bumped on every preference change; keys the profile snapshot cache
 
     preferences = relationship('UserPreference', back_populates='user') 
     interactions = relationship('InteractionHistoryInDB', back_populates='user')
@@ -30,6 +31,11 @@ class UserPreference(Base):
 
     user = relationship('User', back_populates='preferences')
 
+    __table_args__ = (
+        # One row per preference; score updates are upserts against it (services/user_manager).
+        Index('ux_user_preferences_user_type_value', 'user_id', 'preference_type', 'preference_value', unique=True),
+    )
+
 
 # CONVERSATION AND LEARNING MODELS 
 class InteractionHistoryInDB(Base):
@@ -41,22 +47,47 @@ class InteractionHistoryInDB(Base):
     ai_response = Column(Text) 
     session_id = Column(String) # to group messages from the same conversation 
     timestamp = Column(DateTime, default=datetime.utcnow) 
+    intent_type = Column(String) # parsed intent of user_message; labels for the local intent classifier
+    intent_source = Column(String) # 'llm', 'rules' or 'model': which tier produced intent_type
 
     user = relationship('User', back_populates='interactions')
     recommended_shows = relationship('InteractionShowJunctionInDB', back_populates='interaction')
 
+    # Chat history loads a session's latest turns; the history API pages a user's sessions and turns.
+    __table_args__ = (
+        Index('ix_interaction_history_user_session_ts', 'user_id', 'session_id', 'timestamp'),
+        Index('ix_interaction_history_user_ts', 'user_id', 'timestamp'),
+    )
+
 
 class InteractionShowJunctionInDB(Base):
     __tablename__ = "interaction_show_junction"
 
     id = Column(Integer, primary_key=True)
-    interaction_id = Column(Integer, ForeignKey('interaction_history.id'))
-    show_id = Column(Integer, ForeignKey('cached_show.show_id')) 
+    interaction_id = Column(Integer, ForeignKey('interaction_history.id'), index=True)
+    show_id = Column(Integer, ForeignKey('cached_show.show_id'), nullable=True) # null when the vector store entry had no TMDB id
     show_title = Column(String) 
 
     interaction = relationship('InteractionHistoryInDB', back_populates='recommended_shows')
 
 
+class SessionSummaryInDB(Base):
+    __tablename__ = "session_summary"
+
+    # Session ids come from the client, so one is only unique within its user's sessions.
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    session_id = Column(String, primary_key=True)
+    summary = Column(Text) # rolling summary of the conversation, updated after each turn
+    turn_count = Column(Integer, default=0)
+    started_at = Column(DateTime) # timestamp of the session's first turn
+    updated_at = Column(DateTime, default=datetime.utcnow) # timestamp of its latest turn
+
+    __table_args__ = (
+        # Keyset pages of a user's sessions, most recently active first (/api/history/sessions).
+        Index('ix_session_summary_user_updated', 'user_id', 'updated_at', 'session_id'),
+    )
+
+
 # SHOW METADATA AND CACHE MODEL 
 class CachedShow(Base):
     __tablename__ = "cached_show"
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field 
-from typing import Optional, List, Literal, TYPE_CHECKING
+from typing import Optional, List, Literal, Dict, Any, TYPE_CHECKING
 from datetime import datetime
 from enum import Enum 
 import json 
@@ -43,6 +43,47 @@ class UserContext(BaseModel):
     )
 
 
+class ContextAndIntent(Intent, UserContext):
+    """Output of the fused context + intent stage: both schemas filled in by one generation."""
+
+    def to_user_context(self) -> UserContext:
+        return UserContext(context_summary=self.context_summary)
+
+    def to_intent(self) -> Intent:
+        return Intent(**self.model_dump(include=set(Intent.model_fields)))
+
+
+class RetrievedShow(BaseModel):
+    show_id: Optional[int] = Field(
+        None,
+        description="TMDB id of the show, when the vector store entry has a usable one."
+    )
+    title: str 
+    score: Optional[float] = None 
+    content: str = "" 
+    metadata: Dict[str, Any] = Field(default_factory=dict) 
+
+    @classmethod 
+    def from_document(cls, doc, score: Optional[float] = None) -> "RetrievedShow":
+        """`score` is the vector store's similarity for this match; metadata["score"] is only a fallback."""
+        def to_number(value, cast):
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                return None
+            if cast is int and not number.is_integer():
+                return None
+            return cast(number)
+
+        return cls(
+            show_id=to_number(doc.metadata.get("show_id"), int),
+            title=str(doc.metadata.get("title") or "N/A"),
+            score=to_number(score if score is not None else doc.metadata.get("score"), float),
+            content=doc.page_content,
+            metadata=dict(doc.metadata)
+        )
+
+
 # --- Request/Response Models ---
 class UserRegistrationRequest(BaseModel):
     user_name: str = Field(description="The registering user user_name")
@@ -101,6 +142,46 @@ class ChatMessageResponse(BaseModel):
     suggested_shows: List[str]  
 
 
+class HistoryShow(BaseModel):
+    show_id: Optional[int]
+    title: Optional[str]
+
+
+class HistoryTurn(BaseModel):
+    id: Optional[int] = Field(
+        ...,
+        description="Null for a turn that has not been written to the database yet."
+    )
+    user_message: str 
+    ai_response: str 
+    timestamp: str 
+    recommended_shows: List[HistoryShow] 
+
+
+class HistoryTurnPage(BaseModel):
+    session_id: str 
+    turns: List[HistoryTurn] 
+    next_cursor: Optional[str] = Field(
+        default=None,
+        description="Pass as `cursor` to fetch the next (older) page; null on the last page."
+    )
+
+
+class HistorySession(BaseModel):
+    session_id: str 
+    started_at: str 
+    last_message_at: str 
+    turn_count: int 
+
+
+class HistorySessionPage(BaseModel):
+    sessions: List[HistorySession] 
+    next_cursor: Optional[str] = Field(
+        default=None,
+        description="Pass as `cursor` to fetch the next (older) page; null on the last page."
+    )
+
+
 # Internal Logic Models 
 
 class UserIntent(BaseModel):
@@ -180,6 +261,16 @@ class ShowData(BaseModel):
         )
 
 
+class ShowDetailsResult(BaseModel):
+    tmdb_id: int 
+    media_type: str 
+    show: Optional[ShowData] = None 
+    error: Optional[str] = Field(
+        default=None,
+        description="Why this item could not be fetched, if it failed."
+    )
+
+
 class ShowRetrievalResult(BaseModel):
     shows: List[ShowData] 
     retrieval_count: int 
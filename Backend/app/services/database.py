@@ -1,14 +1,110 @@
-from sqlalchemy import create_engine
+import os
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from typing import Generator 
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
+from typing import Generator, AsyncGenerator, Dict, Any, Optional
 
-db_url = 'sqlite:///data/sqlite.db'
+load_dotenv()
 
-engine = create_engine(
-    db_url, 
-    echo=True,
-    connect_args={"check_same_thread": False}
-)
+# --- SETTINGS ---
+db_url = os.getenv("DATABASE_URL", 'sqlite:///data/sqlite.db')
+async_db_url = os.getenv("ASYNC_DATABASE_URL") or db_url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+
+# Applied to every new SQLite connection. WAL lets readers proceed while a writer commits,
+# synchronous=NORMAL is durable under WAL except on power loss, busy_timeout makes writers
+# wait for the lock instead of failing with "database is locked", mmap_size serves reads
+# from the page cache without extra copies.
+SQLITE_PRAGMAS: Dict[str, Any] = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+}
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def is_sqlite_memory(url: str) -> bool:
+    return is_sqlite(url) and (":memory:" in url or url.rstrip("/").endswith("sqlite:"))
+
+
+def _pragma_listener(pragmas: Dict[str, Any]):
+    def apply_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+    return apply_sqlite_pragmas
+
+
+def _exp2(value):
+    return None if value is None else 2.0 ** value
+
+
+def register_sqlite_functions(dbapi_connection, connection_record):
+    # exp2 decays preference scores inside their upsert (user_manager.preference_upsert);
+    # SQLite has no such built-in.
+    dbapi_connection.create_function("exp2", 1, _exp2, deterministic=True)
+
+
+def _engine_options(url: str, echo: bool, pool_size: int, max_overflow: int) -> Dict[str, Any]:
+    options: Dict[str, Any] = {"echo": echo}
+    # In-memory SQLite uses a single shared connection, so pool sizing does not apply.
+    if not is_sqlite_memory(url):
+        options.update(
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE
+        )
+    return options
+
+
+def create_db_engine(
+        url: str = db_url,
+        echo: bool = DB_ECHO,
+        pool_size: int = DB_POOL_SIZE,
+        max_overflow: int = DB_MAX_OVERFLOW,
+        pragmas: Optional[Dict[str, Any]] = None
+) -> Engine:
+    options = _engine_options(url, echo, pool_size, max_overflow)
+    if is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False}
+
+    new_engine = create_engine(url, **options)
+    if is_sqlite(url):
+        event.listen(new_engine, "connect", _pragma_listener(SQLITE_PRAGMAS if pragmas is None else pragmas))
+        event.listen(new_engine, "connect", register_sqlite_functions)
+    return new_engine
+
+
+def create_async_db_engine(
+        url: str = async_db_url,
+        echo: bool = DB_ECHO,
+        pool_size: int = DB_POOL_SIZE,
+        max_overflow: int = DB_MAX_OVERFLOW,
+        pragmas: Optional[Dict[str, Any]] = None
+) -> AsyncEngine:
+    new_engine = create_async_engine(url, **_engine_options(url, echo, pool_size, max_overflow))
+    if is_sqlite(url):
+        event.listen(new_engine.sync_engine, "connect", _pragma_listener(SQLITE_PRAGMAS if pragmas is None else pragmas))
+        event.listen(new_engine.sync_engine, "connect", register_sqlite_functions)
+    return new_engine
+
+
+engine = create_db_engine()
 
 Base = declarative_base()
 
@@ -18,6 +114,15 @@ SessionLocal = sessionmaker(
     bind=engine 
 )
 
+# Async engine for the chat path, so DB work never pins a threadpool thread.
+async_engine = create_async_db_engine()
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 def get_db() -> Generator:
     db = SessionLocal()
     try:
@@ -26,8 +131,54 @@ def get_db() -> Generator:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def migrate_schema(bind: Engine = engine) -> None:
+    """
+    Brings an existing database up to the models: create_all only creates missing tables,
+    so columns and indexes added to a model later are created here.
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                default = column.server_default.arg if column.server_default is not None else None
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                if default is not None:
+                    ddl += f" DEFAULT {default}"
+                conn.execute(text(ddl))
+                print(f"✅Added column {table.name}.{column.name}")
+
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(bind=conn, checkfirst=True)
+                    print(f"✅Created index {index.name}")
+
+
 def create_all_tables():
     from ..models import database_models
     print(f"Attempting to create tables on {db_url}")
     Base.metadata.create_all(bind=engine)
-    print("✅Database tables created successfully.")
\ No newline at end of file
+    from . import user_manager
+    user_manager.merge_duplicate_preferences(engine)
+    from . import history_manager
+    history_manager.rekey_session_summaries(engine)
+    migrate_schema(engine)
+    history_manager.backfill_session_summaries(engine)
+
+    from . import show_manager
+    show_manager.ensure_show_search_index(engine)
+    print("✅Database tables created successfully.")
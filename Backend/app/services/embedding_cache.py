@@ -0,0 +1,192 @@
+# Cache of query embeddings, so repeated search queries skip the remote embedding call
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO
+)
+
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+# SQLite file for persisting embeddings across restarts; empty keeps the cache in memory only.
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+
+# Task type the Google embedding API expects for search queries (documents use RETRIEVAL_DOCUMENT).
+QUERY_TASK_TYPE = "RETRIEVAL_QUERY"
+
+
+def normalize_query(text: str) -> str:
+    """'  Thrilling   Sci-Fi! ' and 'thrilling sci-fi' share one cache entry."""
+    return re.sub(r"\s+", " ", text.lower()).strip(" .,!?;:")
+
+
+class EmbeddingStore:
+    """
+    Bounded LRU of embedding vectors keyed by (model, normalized text), optionally backed
+    by a SQLite table. Embeddings do not change for a given model, so entries never expire;
+    the model name in the key keeps vectors from different models apart.
+    """
+
+    def __init__(self, max_entries: int = 10000, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "disk_hits": 0, "evictions": 0, "remote_calls": 0, "remote_texts": 0}
+
+        self._disk: Optional[sqlite3.Connection] = None
+        if disk_path:
+            try:
+                self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+                self._disk.execute("CREATE TABLE IF NOT EXISTS query_embedding_cache (key TEXT PRIMARY KEY, vector BLOB)")
+                self._disk.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"Embedding disk cache unavailable at '{disk_path}': {e}")
+                self._disk = None
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return f"{model}\x1f{normalize_query(text)}"
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None and self._disk is not None:
+                row = self._disk.execute("SELECT vector FROM query_embedding_cache WHERE key = ?", (key,)).fetchone()
+                if row:
+                    vector = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, vector)
+                    self._stats["disk_hits"] += 1
+
+            if vector is None:
+                self._stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return vector
+
+    def set_many(self, items: Dict[str, List[float]]) -> None:
+        with self._lock:
+            for key, values in items.items():
+                self._remember(key, np.asarray(values, dtype=np.float32))
+            if self._disk is not None:
+                try:
+                    self._disk.executemany(
+                        "INSERT OR REPLACE INTO query_embedding_cache (key, vector) VALUES (?, ?)",
+                        [(key, np.asarray(values, dtype=np.float32).tobytes()) for key, values in items.items()]
+                    )
+                    self._disk.commit()
+                except sqlite3.Error as e:
+                    logging.warning(f"Failed to persist query embeddings: {e}")
+
+    def record_remote_call(self, n_texts: int) -> None:
+        with self._lock:
+            self._stats["remote_calls"] += 1
+            self._stats["remote_texts"] += n_texts
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM query_embedding_cache")
+                self._disk.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings client so query embeddings come from the shared store when they
+    can. Misses from one call are embedded together in a single batched request.
+    Document embeddings (used only when indexing) pass straight through.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, store: Optional[EmbeddingStore] = None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.store = store if store is not None else query_embedding_store
+
+    def _lookup(self, texts: List[str]):
+        keys = [EmbeddingStore.make_key(self.model_name, text) for text in texts]
+        vectors = [self.store.get(key) for key in keys]
+        missing: Dict[str, str] = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None and key not in missing:
+                missing[key] = text
+        return keys, vectors, missing
+
+    def _resolve(self, keys: List[str], vectors: List[Optional[np.ndarray]], fetched: Dict[str, List[float]]) -> List[List[float]]:
+        if fetched:
+            self.store.set_many(fetched)
+        return [vector.tolist() if vector is not None else list(fetched[key]) for key, vector in zip(keys, vectors)]
+
+    def _embed_missing(self, texts: List[str]) -> List[List[float]]:
+        self.store.record_remote_call(len(texts))
+        if len(texts) == 1:
+            return [self.embeddings.embed_query(texts[0])]
+        try:
+            return self.embeddings.embed_documents(texts, task_type=QUERY_TASK_TYPE)
+        except TypeError:
+            # Providers without a task type: their query and document embeddings are the same.
+            return self.embeddings.embed_documents(texts)
+
+    async def _aembed_missing(self, texts: List[str]) -> List[List[float]]:
+        self.store.record_remote_call(len(texts))
+        if len(texts) == 1:
+            return [await self.embeddings.aembed_query(texts[0])]
+        try:
+            return await self.embeddings.aembed_documents(texts, task_type=QUERY_TASK_TYPE)
+        except TypeError:
+            return await self.embeddings.aembed_documents(texts)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors, missing = self._lookup(texts)
+        fetched = dict(zip(missing, self._embed_missing(list(missing.values())))) if missing else {}
+        return self._resolve(keys, vectors, fetched)
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors, missing = self._lookup(texts)
+        fetched = dict(zip(missing, await self._aembed_missing(list(missing.values())))) if missing else {}
+        return self._resolve(keys, vectors, fetched)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_queries([text]))[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+
+query_embedding_store = EmbeddingStore(EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_CACHE_PATH or None)
+
+
+def get_stats() -> Dict[str, Any]:
+    return query_embedding_store.get_stats()
@@ -1,49 +1,86 @@
 from sqlalchemy.orm import Session 
-from sqlalchemy import desc 
-from typing import List, Tuple  
+from sqlalchemy.ext.asyncio import AsyncSession 
+from sqlalchemy import desc, select, and_, or_, text, inspect 
+from sqlalchemy.engine import Engine 
+from sqlalchemy.orm import selectinload 
+from typing import List, Tuple, Optional, Any, Dict  
 from datetime import datetime 
+import base64 
+import json 
 import logging 
+import os 
 
+from ..models.pydantic_models import RetrievedShow 
 from ..models.database_models import (
     InteractionHistoryInDB as InteractionHistoryORM, 
-    InteractionShowJunctionInDB as InteractionShowJunctionORM
+    InteractionShowJunctionInDB as InteractionShowJunctionORM,
+    SessionSummaryInDB as SessionSummaryORM
 )
 
 logging.basicConfig(level=logging.INFO) 
 
-def save_interaction(
-        db: Session,
+# The context stage gets the session's rolling summary plus only this many raw turns.
+HISTORY_RECENT_TURNS = int(os.getenv("HISTORY_RECENT_TURNS", "2"))
+# Sessions started before summaries existed have none yet; they get the old raw window.
+HISTORY_FALLBACK_TURNS = int(os.getenv("HISTORY_FALLBACK_TURNS", "10"))
+SESSION_SUMMARY_MAX_CHARS = int(os.getenv("SESSION_SUMMARY_MAX_CHARS", "1500"))
+SESSION_SUMMARY_MAX_TITLES = int(os.getenv("SESSION_SUMMARY_MAX_TITLES", "20"))
+
+RECOMMENDED_TITLES_PREFIX = "Already recommended: "
+
+def build_interaction(
         user_id: int, 
         session_id: str, 
         user_message: str, 
         ai_response: str, 
-        recommended_shows: List[Tuple[str, str]] 
-) -> None:
+        recommended_shows: List[RetrievedShow],
+        intent_type: Optional[str] = None,
+        intent_source: Optional[str] = None,
+        timestamp: Optional[datetime] = None 
+) -> InteractionHistoryORM:
     new_interaction = InteractionHistoryORM(
         user_id=user_id,
         user_message=user_message,
         ai_response=ai_response,
         session_id=session_id,
-        timestamp=datetime.utcnow()
+        timestamp=timestamp or datetime.utcnow(),
+        intent_type=intent_type,
+        intent_source=intent_source
     )
 
-    for show_id, show_title in recommended_shows:
-        try:
-            show_id_int = int(show_id)
-        except ValueError:
-            logging.warning(f"Could not convert show_id '{show_id}' to integer. Skipping junction record.")
-            continue
-
+    # Shows without a TMDB id are still recorded, by title, with a null show_id.
+    for show in recommended_shows:
         junction_record = InteractionShowJunctionORM(
-            show_id=show_id_int,
-            show_title=show_title
+            show_id=show.show_id,
+            show_title=show.title
         )
 
         new_interaction.recommended_shows.append(junction_record)
 
+    return new_interaction
+
+
+def save_interaction(
+        db: Session,
+        user_id: int, 
+        session_id: str, 
+        user_message: str, 
+        ai_response: str, 
+        recommended_shows: List[RetrievedShow],
+        context_summary: Optional[str] = None,
+        intent_type: Optional[str] = None,
+        intent_source: Optional[str] = None 
+) -> None:
+    new_interaction = build_interaction(
+        user_id, session_id, user_message, ai_response, recommended_shows, intent_type, intent_source
+    )
+    timestamp = new_interaction.timestamp
+
     db.add(new_interaction) 
 
     try:
+        summary_row = db.get(SessionSummaryORM, (user_id, session_id))
+        db.add(apply_session_summary(summary_row, user_id, session_id, context_summary, recommended_shows, timestamp))
         db.commit()
         logging.info(f"💾 Interaction saved for user {user_id} with {len(recommended_shows)} recommendations.")
     except Exception as e:
@@ -51,16 +88,24 @@ def save_interaction(
         logging.error(f"❌ Failed to save interaction: {e}") 
 
 
-def get_chat_history(db: Session, user_id: int, session_id: str, limit: int = 10) -> str:
+def get_chat_history(db: Session, user_id: int, session_id: str, limit: Optional[int] = None, pending: Optional[List[Any]] = None) -> str:
+    summary_row = db.get(SessionSummaryORM, (user_id, session_id))
+    summary = summary_row.summary if summary_row is not None else None
+
     interactions = db.query(InteractionHistoryORM) \
                      .filter(InteractionHistoryORM.user_id == user_id) \
                      .filter(InteractionHistoryORM.session_id == session_id) \
                      .order_by(desc(InteractionHistoryORM.timestamp)) \
-                     .limit(limit) \
+                     .limit(limit or history_window(summary)) \
                      .all()
     
     interactions.reverse() 
+    summary, interactions = merge_pending_turns(summary, interactions, pending, limit)
     
+    return format_session_context(summary, interactions)
+
+
+def format_chat_history(interactions: List[InteractionHistoryORM]) -> str:
     formatted_history = []
     for interaction in interactions:
         formatted_history.append(f"User: {interaction.user_message}")
@@ -69,4 +114,376 @@ def get_chat_history(db: Session, user_id: int, session_id: str, limit: int = 10
     return "\n".join(formatted_history)
 
 
-    
\ No newline at end of file
+# --- Rolling session summaries ---
+# Each turn's context summary already folds in the summary it was given, so keeping the
+# latest one (plus the titles recommended so far) maintains the session summary without
+# an extra LLM call.
+
+def history_window(summary: Optional[str]) -> int:
+    return HISTORY_RECENT_TURNS if summary else HISTORY_FALLBACK_TURNS
+
+
+def merge_pending_turns(
+        summary: Optional[str],
+        interactions: List[Any],
+        pending: Optional[List[Any]],
+        limit: Optional[int] = None
+) -> Tuple[Optional[str], List[Any]]:
+    """
+    Adds turns still waiting in the write-behind queue after the stored ones, so a session
+    reads its own writes. A pending turn is written with its original timestamp; one that
+    already shows up among the stored rows was committed in the meantime and is skipped.
+    """
+    if not pending:
+        return summary, interactions
+
+    stored = {interaction.timestamp for interaction in interactions}
+    fresh = [turn for turn in pending if turn.timestamp not in stored]
+    for turn in fresh:
+        summary = build_session_summary(summary, turn.context_summary, turn.recommended_shows)
+
+    return summary, (interactions + fresh)[-(limit or history_window(summary)):]
+
+
+def format_session_context(summary: Optional[str], interactions: List[InteractionHistoryORM]) -> str:
+    recent_turns = format_chat_history(interactions)
+    if not summary:
+        return recent_turns
+    if not recent_turns:
+        return f"Session summary so far:\n{summary}"
+    return f"Session summary so far:\n{summary}\n\nMost recent turns:\n{recent_turns}"
+
+
+def split_session_summary(summary: Optional[str]) -> Tuple[str, List[str]]:
+    """Separates the summary text from the 'Already recommended' line appended by build_session_summary."""
+    if not summary:
+        return "", []
+
+    if summary.startswith(RECOMMENDED_TITLES_PREFIX):
+        text, titles_line = "", summary[len(RECOMMENDED_TITLES_PREFIX):]
+    else:
+        text, separator, titles_line = summary.rpartition("\n" + RECOMMENDED_TITLES_PREFIX)
+        if not separator:
+            return summary, []
+    return text, [title.strip() for title in titles_line.split(";") if title.strip()]
+
+
+def build_session_summary(
+        previous_summary: Optional[str],
+        context_summary: Optional[str],
+        recommended_shows: List[RetrievedShow]
+) -> str:
+    previous_text, titles = split_session_summary(previous_summary)
+    text = (context_summary or "").strip() or previous_text
+
+    if len(text) > SESSION_SUMMARY_MAX_CHARS:
+        text = text[:SESSION_SUMMARY_MAX_CHARS].rsplit(" ", 1)[0] + "..."
+
+    for show in recommended_shows:
+        title = show.title.replace(";", ",").strip()
+        if title and title not in titles:
+            titles.append(title)
+    titles = titles[-SESSION_SUMMARY_MAX_TITLES:]
+
+    if titles:
+        titles_line = RECOMMENDED_TITLES_PREFIX + "; ".join(titles)
+        text = f"{text}\n{titles_line}" if text else titles_line
+    return text
+
+
+def apply_session_summary(
+        summary_row: Optional[SessionSummaryORM],
+        user_id: int,
+        session_id: str,
+        context_summary: Optional[str],
+        recommended_shows: List[RetrievedShow],
+        timestamp: Optional[datetime] = None
+) -> SessionSummaryORM:
+    """`timestamp` is the turn's own (InteractionHistory.timestamp), so the row orders sessions by their latest turn."""
+    timestamp = timestamp or datetime.utcnow()
+    if summary_row is None:
+        summary_row = SessionSummaryORM(session_id=session_id, user_id=user_id, summary="", turn_count=0, started_at=timestamp)
+
+    summary_row.summary = build_session_summary(summary_row.summary, context_summary, recommended_shows)
+    summary_row.turn_count = (summary_row.turn_count or 0) + 1
+    summary_row.started_at = summary_row.started_at or timestamp
+    summary_row.updated_at = timestamp
+    return summary_row
+
+
+async def asave_interaction(
+        db: AsyncSession,
+        user_id: int, 
+        session_id: str, 
+        user_message: str, 
+        ai_response: str, 
+        recommended_shows: List[RetrievedShow],
+        context_summary: Optional[str] = None,
+        intent_type: Optional[str] = None,
+        intent_source: Optional[str] = None 
+) -> None:
+    new_interaction = build_interaction(
+        user_id, session_id, user_message, ai_response, recommended_shows, intent_type, intent_source
+    )
+    timestamp = new_interaction.timestamp
+
+    db.add(new_interaction) 
+
+    try:
+        summary_row = await db.get(SessionSummaryORM, (user_id, session_id))
+        db.add(apply_session_summary(summary_row, user_id, session_id, context_summary, recommended_shows, timestamp))
+        await db.commit()
+        logging.info(f"💾 Interaction saved for user {user_id} with {len(recommended_shows)} recommendations.")
+    except Exception as e:
+        await db.rollback() 
+        logging.error(f"❌ Failed to save interaction: {e}") 
+
+
+async def aget_chat_history(db: AsyncSession, user_id: int, session_id: str, limit: Optional[int] = None, pending: Optional[List[Any]] = None) -> str:
+    summary_row = await db.get(SessionSummaryORM, (user_id, session_id))
+    summary = summary_row.summary if summary_row is not None else None
+
+    result = await db.execute(
+        select(InteractionHistoryORM)
+        .filter(InteractionHistoryORM.user_id == user_id)
+        .filter(InteractionHistoryORM.session_id == session_id)
+        .order_by(desc(InteractionHistoryORM.timestamp))
+        .limit(limit or history_window(summary))
+    )
+    interactions = list(result.scalars().all())
+    interactions.reverse() 
+    summary, interactions = merge_pending_turns(summary, interactions, pending, limit)
+
+    return format_session_context(summary, interactions)
+
+
+def rekey_session_summaries(bind: Engine) -> None:
+    """
+    Migration for session_summary tables keyed by session_id alone: rebuilds the table with
+    the (user_id, session_id) primary key. Rows are copied as they are; a session id two
+    users shared already has one merged row, which stays with the user who wrote it first;
+    rows without a user cannot be keyed and are dropped.
+    """
+    inspector = inspect(bind)
+    if "session_summary" not in inspector.get_table_names():
+        return
+    if inspector.get_pk_constraint("session_summary")["constrained_columns"] != ["session_id"]:
+        return
+
+    table = SessionSummaryORM.__table__
+    columns = ", ".join(column["name"] for column in inspector.get_columns("session_summary") if column["name"] in table.columns)
+    with bind.begin() as conn:
+        # Indexes keep their names through a rename, so they go first to let the new table create its own.
+        for index in inspector.get_indexes("session_summary"):
+            conn.execute(text(f"DROP INDEX {index['name']}"))
+        conn.execute(text("ALTER TABLE session_summary RENAME TO session_summary_old"))
+        table.create(bind=conn)
+        copied = conn.execute(text(f"INSERT INTO session_summary ({columns}) SELECT {columns} FROM session_summary_old WHERE user_id IS NOT NULL")).rowcount
+        conn.execute(text("DROP TABLE session_summary_old"))
+    print(f"✅Rekeyed session_summary by (user_id, session_id): {copied} rows")
+
+
+# --- History API (keyset pagination) ---
+# A cursor is the sort key of the last row of a page, so the next page is an index range
+# scan from that point instead of an OFFSET that re-reads every earlier row. Sessions are
+# paged over session_summary (one row per user and session, ix_session_summary_user_updated) and
+# turns over interaction_history (ix_interaction_history_user_session_ts); neither
+# aggregates at read time.
+
+def backfill_session_summaries(bind: Engine) -> None:
+    """
+    Migration for sessions listed from session_summary: adds rows for sessions that predate
+    summaries (with a NULL summary, which the context stage treats as having none) and fills
+    started_at, updated_at and turn_count from the stored turns where started_at is missing.
+    """
+    same_session = "h.user_id = session_summary.user_id AND h.session_id = session_summary.session_id"
+    with bind.begin() as conn:
+        updated = conn.execute(text(f"""
+            UPDATE session_summary SET
+                started_at = (SELECT MIN(h.timestamp) FROM interaction_history h WHERE {same_session}),
+                updated_at = COALESCE((SELECT MAX(h.timestamp) FROM interaction_history h WHERE {same_session}), updated_at),
+                turn_count = (SELECT COUNT(*) FROM interaction_history h WHERE {same_session})
+            WHERE started_at IS NULL
+              AND EXISTS (SELECT 1 FROM interaction_history h WHERE {same_session})
+        """)).rowcount
+        inserted = conn.execute(text("""
+            INSERT INTO session_summary (user_id, session_id, summary, turn_count, started_at, updated_at)
+            SELECT h.user_id, h.session_id, NULL, COUNT(*), MIN(h.timestamp), MAX(h.timestamp)
+            FROM interaction_history h
+            WHERE h.user_id IS NOT NULL AND h.session_id IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM session_summary s WHERE s.user_id = h.user_id AND s.session_id = h.session_id)
+            GROUP BY h.user_id, h.session_id
+        """)).rowcount
+    if updated or inserted:
+        print(f"✅Backfilled session summaries: {inserted} added, {updated} updated")
+
+def encode_cursor(timestamp: datetime, key: Any) -> str:
+    raw = json.dumps([timestamp.isoformat(), key])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key_type: type) -> Tuple[datetime, Any]:
+    """
+    Raises ValueError for anything that is not a cursor produced by encode_cursor with a
+    `key_type` key (str session ids, int turn ids), so crafted values never reach a query.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        # bool is an int subclass; it is never a valid key.
+        if not isinstance(timestamp, str) or not isinstance(key, key_type) or isinstance(key, bool):
+            raise TypeError(f"unexpected cursor value types: {type(timestamp).__name__}, {type(key).__name__}")
+        return datetime.fromisoformat(timestamp), key
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _sessions_query(user_id: int):
+    return (
+        select(
+            SessionSummaryORM.session_id,
+            SessionSummaryORM.started_at,
+            SessionSummaryORM.updated_at.label("last_message_at"),
+            SessionSummaryORM.turn_count
+        )
+        .filter(SessionSummaryORM.user_id == user_id)
+    )
+
+
+async def amerge_pending_sessions(
+        db: AsyncSession,
+        user_id: int,
+        sessions: List[Dict[str, Any]],
+        pending: Optional[List[Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Adds every session with turns still in the write-behind queue to a first page of
+    sessions, with those turns in its last_message_at and turn_count. The pages leave these
+    sessions out (see aget_sessions_page), so each is listed once, here. A pending turn no
+    newer than its session's stored last_message_at was committed in the meantime and is
+    not counted again.
+    """
+    if not pending:
+        return sessions
+
+    pending_by_session: Dict[str, List[Any]] = {}
+    for turn in pending:
+        pending_by_session.setdefault(turn.session_id, []).append(turn)
+
+    rows = (await db.execute(_sessions_query(user_id).filter(SessionSummaryORM.session_id.in_(list(pending_by_session))))).all()
+    stored = {row.session_id: dict(row._mapping) for row in rows}
+
+    merged = list(sessions)
+    for session_id, turns in pending_by_session.items():
+        session = stored.get(session_id) or {"session_id": session_id, "started_at": None, "last_message_at": None, "turn_count": 0}
+        last_stored = session["last_message_at"]
+        fresh = [turn.timestamp for turn in turns if last_stored is None or turn.timestamp > last_stored]
+        if fresh:
+            session = {
+                **session,
+                "started_at": session["started_at"] or min(fresh),
+                "last_message_at": max(fresh),
+                "turn_count": session["turn_count"] + len(fresh)
+            }
+        merged.append(session)
+
+    return sorted(merged, key=lambda session: (session["last_message_at"], session["session_id"]), reverse=True)
+
+
+def merge_pending_turns_page(interactions: List[Any], pending: Optional[List[Any]]) -> List[Any]:
+    """
+    Adds a session's queued turns to a first page of its stored turns, newest first. A
+    pending turn whose timestamp is already stored was committed in the meantime and is skipped.
+    """
+    if not pending:
+        return interactions
+    stored = {interaction.timestamp for interaction in interactions}
+    fresh = [turn for turn in pending if turn.timestamp not in stored]
+    return sorted(fresh + interactions, key=lambda turn: turn.timestamp, reverse=True)
+
+
+async def aget_sessions_page(
+        db: AsyncSession,
+        user_id: int,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        pending: Optional[List[Any]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    A user's sessions, most recently active first. Returns (sessions, next_cursor).
+    Sessions with `pending` (write-behind) turns are listed on the first page, on top of
+    its `limit` stored sessions, and left out of every page read from the database.
+    """
+    # Within one user's rows session_id is unique, so (updated_at, session_id) orders them totally.
+    query = (
+        _sessions_query(user_id)
+        .order_by(desc(SessionSummaryORM.updated_at), desc(SessionSummaryORM.session_id))
+        .limit(limit + 1)
+    )
+
+    pending_session_ids = {turn.session_id for turn in pending or []}
+    if pending_session_ids:
+        query = query.filter(SessionSummaryORM.session_id.notin_(pending_session_ids))
+
+    if cursor:
+        cursor_timestamp, cursor_session_id = decode_cursor(cursor, str)
+        query = query.filter(or_(
+            SessionSummaryORM.updated_at < cursor_timestamp,
+            and_(SessionSummaryORM.updated_at == cursor_timestamp, SessionSummaryORM.session_id < cursor_session_id)
+        ))
+
+    rows = (await db.execute(query)).all()
+    sessions = [dict(row._mapping) for row in rows[:limit]]
+
+    # From the last stored row: where pending sessions sort has no bearing on the next page.
+    next_cursor = None
+    if len(rows) > limit:
+        last = sessions[-1]
+        next_cursor = encode_cursor(last["last_message_at"], last["session_id"])
+
+    if not cursor:
+        sessions = await amerge_pending_sessions(db, user_id, sessions, pending)
+    return sessions, next_cursor
+
+
+async def aget_session_turns_page(
+        db: AsyncSession,
+        user_id: int,
+        session_id: str,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        pending: Optional[List[Any]] = None
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    A session's turns, newest first, with their recommended shows loaded in one extra query.
+    `pending` (the session's write-behind turns, which have no id yet) are added to the
+    first page, on top of its `limit` stored turns.
+    """
+    query = (
+        select(InteractionHistoryORM)
+        .options(selectinload(InteractionHistoryORM.recommended_shows))
+        .filter(InteractionHistoryORM.user_id == user_id)
+        .filter(InteractionHistoryORM.session_id == session_id)
+        .order_by(desc(InteractionHistoryORM.timestamp), desc(InteractionHistoryORM.id))
+        .limit(limit + 1)
+    )
+
+    if cursor:
+        cursor_timestamp, cursor_id = decode_cursor(cursor, int)
+        query = query.filter(or_(
+            InteractionHistoryORM.timestamp < cursor_timestamp,
+            and_(InteractionHistoryORM.timestamp == cursor_timestamp, InteractionHistoryORM.id < cursor_id)
+        ))
+
+    interactions = list((await db.execute(query)).scalars().all())
+
+    # From the last stored turn: pending turns have no id and are not in the next page's query.
+    next_cursor = None
+    if len(interactions) > limit:
+        interactions = interactions[:limit]
+        last = interactions[-1]
+        next_cursor = encode_cursor(last.timestamp, last.id)
+
+    if not cursor:
+        interactions = merge_pending_turns_page(interactions, pending)
+    return interactions, next_cursor
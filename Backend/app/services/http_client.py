@@ -0,0 +1,35 @@
+# Shared async HTTP client for the external providers (TMDB, Serper)
+import logging
+from typing import Optional
+
+import httpx
+
+logging.basicConfig(
+    level=logging.INFO
+)
+
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide AsyncClient, creating it on first use.
+    Reusing one client keeps connections (and their TLS sessions) alive between requests.
+    """
+    global _async_client
+
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+    return _async_client
+
+
+async def aclose_async_client() -> None:
+    global _async_client
+
+    if _async_client is not None and not _async_client.is_closed:
+        await _async_client.aclose()
+        logging.info("Shared async HTTP client closed.")
+    _async_client = None
@@ -0,0 +1,109 @@
+# Background-refreshed cache of the movie news talking points used by the context enhancer
+import asyncio
+import logging
+import os
+import re
+import time
+from typing import Optional
+
+from . import serper_client
+
+logging.basicConfig(
+    level=logging.INFO
+)
+
+NEWS_QUERY = "latest movie news and trends"
+NEWS_NUM_RESULTS = 5
+
+# How long a fetched result may be served, and how often the refresher fetches a new one.
+NEWS_CACHE_TTL_SECONDS = float(os.getenv("NEWS_CACHE_TTL_SECONDS", "3600"))
+NEWS_REFRESH_INTERVAL_SECONDS = float(os.getenv("NEWS_REFRESH_INTERVAL_SECONDS", "900"))
+
+# 'always': inject news on every turn, 'relevant': only when the message asks about
+# current releases, 'never': do not inject news at all.
+NEWS_INJECTION_MODE = os.getenv("NEWS_INJECTION_MODE", "relevant").lower()
+
+NEWS_UNAVAILABLE = "No real-time movie news available right now."
+NEWS_NOT_REQUESTED = "Not needed for this message."
+
+CURRENT_RELEASES_PATTERN = re.compile(
+    r"\b(new|newest|latest|recent|recently|current|currently|this (week|weekend|month|year)|"
+    r"trending|popular|upcoming|coming soon|in theaters|in cinemas|box office|just (came out|released)|releases?|premieres?|news)\b",
+    re.IGNORECASE
+)
+
+_talking_points: Optional[str] = None
+_fetched_at: float = 0.0
+_refresher_task: Optional[asyncio.Task] = None
+
+
+def _store(result: str) -> bool:
+    global _talking_points, _fetched_at
+
+    # serper_client reports failures as plain strings; only real results are cached.
+    if not result.startswith("SEARCH RESULTS"):
+        logging.warning(f"News refresh failed, keeping previous talking points: {result}")
+        return False
+
+    _talking_points = result
+    _fetched_at = time.monotonic()
+    return True
+
+
+def refresh() -> bool:
+    return _store(serper_client.search_news_talking_points(NEWS_QUERY, num_results=NEWS_NUM_RESULTS))
+
+
+async def arefresh() -> bool:
+    return _store(await serper_client.asearch_news_talking_points(NEWS_QUERY, num_results=NEWS_NUM_RESULTS))
+
+
+def get_talking_points() -> str:
+    """Returns the cached talking points. Never calls Serper."""
+    if _talking_points is None or time.monotonic() - _fetched_at > NEWS_CACHE_TTL_SECONDS:
+        return NEWS_UNAVAILABLE
+    return _talking_points
+
+
+def wants_current_news(user_input: str) -> bool:
+    return bool(CURRENT_RELEASES_PATTERN.search(user_input or ""))
+
+
+def talking_points_for(user_input: str) -> str:
+    if NEWS_INJECTION_MODE == "never":
+        return NEWS_NOT_REQUESTED
+    if NEWS_INJECTION_MODE == "relevant" and not wants_current_news(user_input):
+        return NEWS_NOT_REQUESTED
+    return get_talking_points()
+
+
+async def _refresh_loop() -> None:
+    while True:
+        try:
+            await arefresh()
+        except Exception as e:
+            logging.error(f"News refresh failed: {e}")
+        await asyncio.sleep(NEWS_REFRESH_INTERVAL_SECONDS)
+
+
+def start_refresher() -> None:
+    """Starts the periodic refresh on the running event loop (first fetch happens immediately)."""
+    global _refresher_task
+
+    if NEWS_INJECTION_MODE == "never" or not serper_client.api_key:
+        logging.info("News refresher disabled.")
+        return
+    if _refresher_task is None or _refresher_task.done():
+        _refresher_task = asyncio.get_running_loop().create_task(_refresh_loop())
+
+
+async def stop_refresher() -> None:
+    global _refresher_task
+
+    if _refresher_task is not None:
+        _refresher_task.cancel()
+        try:
+            await _refresher_task
+        except asyncio.CancelledError:
+            pass
+    _refresher_task = None
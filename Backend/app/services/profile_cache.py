@@ -0,0 +1,170 @@
+# Per-user profile snapshots: ranked preferences and the prompt-ready profile string, keyed by profile_version
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+
+from ..models.database_models import User, UserPreference
+from ..models.pydantic_models import UserProfileResponse
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO
+)
+
+PROFILE_CACHE_MAX_ENTRIES = int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "10000"))
+# Preferences (highest score first) included in the profile the LLM stages see.
+PROFILE_TOP_PREFERENCES = int(os.getenv("PROFILE_TOP_PREFERENCES", "10"))
+# A preference's score halves for every this many days since it was last reinforced; 0 disables decay.
+PREFERENCE_HALF_LIFE_DAYS = float(os.getenv("PREFERENCE_HALF_LIFE_DAYS", "30"))
+
+
+class ProfileSnapshot(NamedTuple):
+    version: int
+    # Every preference, ranked; served by /auth/profile.
+    profile: UserProfileResponse
+    # The JSON profile string for the prompts, with the top PROFILE_TOP_PREFERENCES only.
+    llm_profile: str
+
+
+def decayed_scores(preferences: Sequence[UserPreference], now: Optional[datetime] = None) -> np.ndarray:
+    """Stored scores decayed exponentially by the age of their last_updated, computed for all preferences at once."""
+    scores = np.array([pref.score or 0.0 for pref in preferences], dtype=np.float64)
+    if PREFERENCE_HALF_LIFE_DAYS <= 0 or scores.size == 0:
+        return scores
+
+    now = now or datetime.utcnow()
+    updated = np.array([pref.last_updated or now for pref in preferences], dtype="datetime64[us]")
+    age_days = (np.datetime64(now, "us") - updated) / np.timedelta64(1, "D")
+    return scores * np.exp2(-np.maximum(age_days, 0.0) / PREFERENCE_HALF_LIFE_DAYS)
+
+
+def rank_preferences(preferences: Iterable[UserPreference]) -> List[UserPreference]:
+    """
+    Highest decayed score first, ties by value. Decay scales every score by the same factor
+    as time passes, so this order only changes when a preference does (and profile_version
+    with it): a cached snapshot does not go stale just by ageing.
+    """
+    preferences = list(preferences)
+    if not preferences:
+        return []
+    values = np.array([pref.preference_value or "" for pref in preferences], dtype=str)
+    order = np.lexsort((values, -decayed_scores(preferences)))
+    return [preferences[i] for i in order]
+
+
+def render_llm_profile(profile: UserProfileResponse, extra_preferences: Iterable[str] = ()) -> str:
+    preferences = profile.preferences[:PROFILE_TOP_PREFERENCES]
+    preferences += [value for value in extra_preferences if value not in preferences]
+    return json.dumps({
+        "username": profile.user_name,
+        "preferences": ", ".join(preferences),
+        "created_at": profile.created_at
+    })
+
+
+def build_snapshot(db_user: User) -> ProfileSnapshot:
+    profile = UserProfileResponse.from_db_model(db_user=db_user)
+    profile.preferences = [pref.preference_value for pref in rank_preferences(db_user.preferences)]
+    return ProfileSnapshot(version=db_user.profile_version or 0, profile=profile, llm_profile=render_llm_profile(profile))
+
+
+class ProfileCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, ProfileSnapshot]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0}
+
+    def peek(self, user_id: int) -> Optional[ProfileSnapshot]:
+        with self._lock:
+            return self._entries.get(user_id)
+
+    def record(self, user_id: int, snapshot: Optional[ProfileSnapshot], outcome: str) -> None:
+        """Counts a lookup as a hit, miss or stale entry, and stores the snapshot it ended with."""
+        with self._lock:
+            self._stats[outcome] += 1
+            if snapshot is None:
+                self._entries.pop(user_id, None)
+                return
+            self._entries[user_id] = snapshot
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"] + stats["stale"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+profile_snapshots = ProfileCache(PROFILE_CACHE_MAX_ENTRIES)
+
+
+def _version_query(user_id: int):
+    return select(User.profile_version).where(User.id == user_id)
+
+
+def _snapshot_query(user_id: int):
+    # One statement for the user and all their preferences; populate_existing so a User
+    # already in the session's identity map is refreshed rather than reused as-is.
+    return (
+        select(User)
+        .options(joinedload(User.preferences))
+        .where(User.id == user_id)
+        .execution_options(populate_existing=True)
+    )
+
+
+def get_profile_snapshot(db: Session, user_id: int) -> Optional[ProfileSnapshot]:
+    """
+    The user's profile snapshot. A cached one costs a primary-key lookup of profile_version;
+    it is rebuilt, with a single eager query, only when that version has moved on.
+    """
+    cached = profile_snapshots.peek(user_id)
+    if cached is not None:
+        version = db.execute(_version_query(user_id)).scalar_one_or_none()
+        if version == cached.version:
+            profile_snapshots.record(user_id, cached, "hits")
+            return cached
+
+    db_user = db.execute(_snapshot_query(user_id)).unique().scalar_one_or_none()
+    snapshot = build_snapshot(db_user) if db_user is not None else None
+    profile_snapshots.record(user_id, snapshot, "stale" if cached is not None else "misses")
+    return snapshot
+
+
+async def aget_profile_snapshot(db: AsyncSession, user_id: int) -> Optional[ProfileSnapshot]:
+    cached = profile_snapshots.peek(user_id)
+    if cached is not None:
+        version = (await db.execute(_version_query(user_id))).scalar_one_or_none()
+        if version == cached.version:
+            profile_snapshots.record(user_id, cached, "hits")
+            return cached
+
+    db_user = (await db.execute(_snapshot_query(user_id))).unique().scalar_one_or_none()
+    snapshot = build_snapshot(db_user) if db_user is not None else None
+    profile_snapshots.record(user_id, snapshot, "stale" if cached is not None else "misses")
+    return snapshot
+
+
+def get_stats() -> Dict[str, Any]:
+    return {"top_preferences": PROFILE_TOP_PREFERENCES, **profile_snapshots.get_stats()}
@@ -0,0 +1,211 @@
+# Semantic cache for recommendation turns: near-identical queries from users with the same taste share results
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from ..models.pydantic_models import RetrievedShow
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO
+)
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Cosine similarity between search query embeddings above which a cached turn is reused.
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+# Reusing the generated text as well skips the response LLM call, at the cost of identical wording.
+SEMANTIC_CACHE_REUSE_RESPONSE = os.getenv("SEMANTIC_CACHE_REUSE_RESPONSE", "false").lower() in ("1", "true", "yes")
+# Only the user's top preferences go into the profile hash, so small profile changes keep sharing entries.
+SEMANTIC_CACHE_PROFILE_TOP_N = int(os.getenv("SEMANTIC_CACHE_PROFILE_TOP_N", "5"))
+
+
+class SemanticMatch(NamedTuple):
+    query: str
+    similarity: float
+    retrieved_shows: List[RetrievedShow]
+    response: Optional[str]
+
+
+def profile_fingerprint(user_profile_data: Any, top_n: int = SEMANTIC_CACHE_PROFILE_TOP_N) -> str:
+    """Coarse hash of a profile: its first `top_n` preference values, order-insensitive."""
+    preferences = ""
+    try:
+        preferences = json.loads(user_profile_data).get("preferences", "") if user_profile_data else ""
+    except (TypeError, ValueError, AttributeError):
+        pass
+
+    values = [value.strip().lower() for value in str(preferences).split(",") if value.strip()]
+    values = sorted(set(values[:top_n]))
+    return hashlib.sha256("|".join(values).encode("utf-8")).hexdigest()[:16]
+
+
+class _Bucket:
+    """Entries that share one profile fingerprint, with their query vectors stacked for one matrix product."""
+
+    def __init__(self):
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+
+    def invalidate(self) -> None:
+        self._matrix = None
+
+    def best_match(self, query_vector: np.ndarray):
+        if not self.entries:
+            return None, -1.0
+        if self._matrix is None:
+            self._ids = list(self.entries)
+            self._matrix = np.stack([self.entries[entry_id]["vector"] for entry_id in self._ids])
+        scores = self._matrix @ query_vector
+        best = int(np.argmax(scores))
+        return self._ids[best], float(scores[best])
+
+
+class SemanticCache:
+    def __init__(self, threshold: float, ttl_seconds: float, max_entries: int):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._buckets: Dict[str, _Bucket] = {}
+        # entry id -> profile fingerprint, least recently used first
+        self._lru: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "hits": 0, "expired": 0, "stores": 0, "evictions": 0, "response_reuses": 0}
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, entry_id: str) -> None:
+        profile_hash = self._lru.pop(entry_id, None)
+        bucket = self._buckets.get(profile_hash)
+        if bucket is not None:
+            bucket.entries.pop(entry_id, None)
+            bucket.invalidate()
+            if not bucket.entries:
+                del self._buckets[profile_hash]
+
+    def lookup(self, query_vector, profile_hash: str) -> Optional[SemanticMatch]:
+        query_vector = self._normalize(query_vector)
+        with self._lock:
+            self._stats["lookups"] += 1
+            bucket = self._buckets.get(profile_hash)
+            if bucket is None:
+                return None
+
+            entry_id, similarity = bucket.best_match(query_vector)
+            if entry_id is None or similarity < self.threshold:
+                return None
+
+            entry = bucket.entries[entry_id]
+            if entry["expires_at"] < time.monotonic():
+                self._remove(entry_id)
+                self._stats["expired"] += 1
+                return None
+
+            self._lru.move_to_end(entry_id)
+            self._stats["hits"] += 1
+            return SemanticMatch(entry["query"], similarity, entry["retrieved_shows"], entry["response"])
+
+    def store(self, query: str, query_vector, profile_hash: str, retrieved_shows: List[RetrievedShow], response: Optional[str]) -> None:
+        query_vector = self._normalize(query_vector)
+        with self._lock:
+            bucket = self._buckets.setdefault(profile_hash, _Bucket())
+
+            # A query this close to an existing entry replaces it rather than adding a near-duplicate.
+            entry_id, similarity = bucket.best_match(query_vector)
+            if entry_id is not None and similarity >= self.threshold:
+                self._remove(entry_id)
+                bucket = self._buckets.setdefault(profile_hash, bucket)
+
+            entry_id = uuid.uuid4().hex
+            bucket.entries[entry_id] = {
+                "query": query,
+                "vector": query_vector,
+                "retrieved_shows": list(retrieved_shows),
+                "response": response,
+                "expires_at": time.monotonic() + self.ttl_seconds,
+            }
+            bucket.invalidate()
+            self._lru[entry_id] = profile_hash
+            self._stats["stores"] += 1
+
+            while len(self._lru) > self.max_entries:
+                self._remove(next(iter(self._lru)))
+                self._stats["evictions"] += 1
+
+    def record_response_reuse(self) -> None:
+        with self._lock:
+            self._stats["response_reuses"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+            self._lru.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._lru)
+            stats["profiles"] = len(self._buckets)
+        stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        return stats
+
+
+response_cache = SemanticCache(SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL_SECONDS, SEMANTIC_CACHE_MAX_ENTRIES)
+
+
+# --- Chain state helpers ---
+# The retriever puts the query embedding and any match into the chain state; the response
+# and save stages read them back through these helpers.
+
+def cached_response_for(input_data: Dict[str, Any]) -> Optional[str]:
+    match: Optional[SemanticMatch] = input_data.get("semantic_match")
+    if SEMANTIC_CACHE_REUSE_RESPONSE and match is not None and match.response:
+        return match.response
+    return None
+
+
+def use_cached_response(input_data: Dict[str, Any]) -> str:
+    response_cache.record_response_reuse()
+    return cached_response_for(input_data)
+
+
+def remember_turn(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Stores a freshly retrieved recommendation turn; turns served from the cache are not stored again."""
+    vector = input_data.get("search_embedding")
+    retrieved_shows = input_data.get("retrieved_shows") or []
+    if (
+        not SEMANTIC_CACHE_ENABLED
+        or vector is None
+        or input_data.get("semantic_match") is not None
+        or not retrieved_shows
+    ):
+        return input_data
+
+    response_cache.store(
+        query=input_data.get("search_query", ""),
+        query_vector=vector,
+        profile_hash=profile_fingerprint(input_data.get("user_profile_data")),
+        retrieved_shows=retrieved_shows,
+        response=input_data.get("response")
+    )
+    return input_data
+
+
+def get_stats() -> Dict[str, Any]:
+    return {"enabled": SEMANTIC_CACHE_ENABLED, "threshold": SEMANTIC_CACHE_THRESHOLD, **response_cache.get_stats()}
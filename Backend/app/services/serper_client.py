@@ -1,8 +1,11 @@
 # Wrapper for serper api
 from dotenv import load_dotenv 
 import os, logging, requests, json
+import httpx
 from typing import Optional, List, Dict
 
+from .http_client import get_async_client
+
 
 load_dotenv() 
 
@@ -19,6 +22,30 @@ else:
 
 url = "https://google.serper.dev/search"
 
+def format_talking_points(query: str, data: Dict) -> str:
+    organic_results: Optional[List[Dict]] = data.get('organic')
+
+    if not organic_results:
+        return f"No relevant search results found for query: '{query}'"
+    
+    talking_points = []
+
+    for i, result in enumerate(organic_results):
+        title = result.get('title', 'N/A')
+        snippet = result.get('snippet', 'No detailed snippet available.')
+
+        talking_points.append(
+            f"Source {i + 1} Title: {title}\n"
+            f"Source {i + 1} Snippet: {snippet}\n"
+        )
+
+    compiled_points = "SEARCH RESULTS (Talking Points):\n"
+    compiled_points += "\n".join(talking_points)
+    compiled_points += "\nEND OF SEARCH RESULTS"
+
+    return compiled_points
+
+
 def search_news_talking_points(query: str, num_results: int = 7):
     payload = json.dumps({
         "q": query,
@@ -33,29 +60,7 @@ def search_news_talking_points(query: str, num_results: int = 7):
         response = requests.request("POST", url, headers=headers, data=payload)
         response.raise_for_status()
 
-        data = response.json
-
-        organic_results: Optional[List[Dict]] = data.get('organic')
-
-        if not organic_results:
-            return f"No relevant search results found for query: '{query}'"
-        
-        talking_points = []
-
-        for i, result in enumerate(organic_results):
-            title = result.get('title', 'N/A')
-            snippet = result.get('snippet', 'No detailed snippet available.')
-
-            talking_points.append(
-                f"Source {i + 1} Title: {title}\n"
-                f"Source {i + 1} Snippet: {snippet}\n"
-            )
-
-        compiled_points = "SEARCH RESULTS (Talking Points):\n"
-        compiled_points += "\n".join(talking_points)
-        compiled_points += "\nEND OF SEARCH RESULTS"
-
-        return compiled_points
+        return format_talking_points(query, response.json())
 
     except requests.exceptions.HTTPError as e:
         return f"HTTP Error connecting to Serper API: {e}. Check your API key or endpoint."
@@ -65,8 +70,26 @@ def search_news_talking_points(query: str, num_results: int = 7):
         return f"An unexpected error occurred during search: {e}"
 
 
-    
+async def asearch_news_talking_points(query: str, num_results: int = 7):
+    """Async variant of search_news_talking_points, on the shared httpx client."""
+    payload = {
+        "q": query,
+        "num": num_results,
+    }
+    headers = {
+        'X-API-KEY': api_key or '',
+        'Content-Type': 'application/json'
+    }
 
-       
-       
+    try:
+        response = await get_async_client().post(url, headers=headers, json=payload)
+        response.raise_for_status()
 
+        return format_talking_points(query, response.json())
+
+    except httpx.HTTPStatusError as e:
+        return f"HTTP Error connecting to Serper API: {e}. Check your API key or endpoint."
+    except httpx.RequestError as e:
+        return f"Request Error connecting to Serper API: {e}"
+    except Exception as e:
+        return f"An unexpected error occurred during search: {e}"
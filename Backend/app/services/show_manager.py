@@ -1,18 +1,25 @@
 from sqlalchemy.orm import Session 
-from sqlalchemy import or_  
-from typing import Optional, List 
-from datetime import datetime 
+from sqlalchemy.engine import Engine 
+from sqlalchemy.exc import OperationalError 
+from sqlalchemy import or_, text, select, func, null  
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert 
+from typing import Optional, List, Set, Dict, Any, Tuple 
+from datetime import datetime, timedelta 
+from concurrent.futures import ThreadPoolExecutor 
 from langchain_core.documents import Document
 
 import os 
+import re 
 import json 
 import logging 
+import threading 
 from dotenv import load_dotenv
 
 from ..models.database_models import CachedShow as ShowORM 
-from ..models.pydantic_models import ShowData 
+from ..models.pydantic_models import ShowData, RetrievedShow 
 
 from . import tmdb_client 
+from .database import SessionLocal 
 
 load_dotenv()
 
@@ -20,32 +27,209 @@ logging.basicConfig(
     level=logging.INFO
 )
 
-def format_retrieved_docs(docs: List[Document]) -> str:
-    if not docs:
+# --- FRESHNESS POLICY ---
+# Cached rows older than this are still served, but trigger a background refresh from TMDB.
+SHOW_CACHE_MAX_AGE_HOURS = float(os.getenv("SHOW_CACHE_MAX_AGE_HOURS", "168"))
+SHOW_REFRESH_WORKERS = int(os.getenv("SHOW_REFRESH_WORKERS", "2"))
+
+_refresh_executor = ThreadPoolExecutor(max_workers=SHOW_REFRESH_WORKERS, thread_name_prefix="show-refresh")
+_refreshing: Set[int] = set() 
+_refresh_lock = threading.Lock() 
+_refresh_stats = {"scheduled": 0, "deduplicated": 0, "completed": 0, "failed": 0}
+
+def is_stale(db_show: ShowORM, max_age_hours: float = SHOW_CACHE_MAX_AGE_HOURS) -> bool:
+    if db_show.last_updated is None:
+        return True
+    return datetime.utcnow() - db_show.last_updated > timedelta(hours=max_age_hours)
+
+def _refresh_show(show_id: int, media_type: str) -> None:
+    db = SessionLocal() 
+    outcome = "failed" 
+    try:
+        detailed_show = tmdb_client.get_show_details(show_id, media_type) 
+        if detailed_show:
+            upsert_show(db, detailed_show) 
+            outcome = "completed" 
+            logging.info(f"Cache REFRESH: Refreshed stale show '{detailed_show.title}' (ID: {show_id}).")
+    except Exception as e:
+        logging.error(f"❌ Background refresh failed for show {show_id}: {e}") 
+    finally:
+        db.close() 
+        with _refresh_lock:
+            _refreshing.discard(show_id) 
+            _refresh_stats[outcome] += 1
+
+def schedule_show_refresh(show_id: int, media_type: str) -> bool:
+    """Queues a background refresh of one show. Returns False if a refresh for it is already in flight."""
+    with _refresh_lock:
+        if show_id in _refreshing:
+            _refresh_stats["deduplicated"] += 1
+            return False
+        _refreshing.add(show_id) 
+        _refresh_stats["scheduled"] += 1
+
+    _refresh_executor.submit(_refresh_show, show_id, media_type) 
+    return True
+
+def get_refresh_stats() -> Dict[str, int]:
+    with _refresh_lock:
+        return {**_refresh_stats, "in_flight": len(_refreshing)}
+
+# Rows per INSERT statement in upsert_shows (12 columns each, well under SQLite's bound-parameter limit)
+UPSERT_CHUNK_SIZE = int(os.getenv("SHOW_UPSERT_CHUNK_SIZE", "500"))
+
+# --- FULL-TEXT SEARCH INDEX ---
+# External-content FTS5 table over cached_show: the triggers keep it in sync with every
+# write to cached_show (upsert_show or otherwise), so it never needs manual maintenance.
+SHOW_FTS_TABLE = "cached_show_fts"
+
+# bm25 column weights, in column order: title, plot, genres, cast, directors
+SHOW_FTS_WEIGHTS = "10.0, 1.0, 3.0, 2.0, 2.0"
+
+SHOW_FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SHOW_FTS_TABLE} USING fts5(
+        title, plot, genres, "cast", directors,
+        content='cached_show', content_rowid='show_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SHOW_FTS_TABLE}_ai AFTER INSERT ON cached_show BEGIN
+        INSERT INTO {SHOW_FTS_TABLE}(rowid, title, plot, genres, "cast", directors)
+        VALUES (new.show_id, new.title, new.plot, new.genres, new."cast", new.directors);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SHOW_FTS_TABLE}_ad AFTER DELETE ON cached_show BEGIN
+        INSERT INTO {SHOW_FTS_TABLE}({SHOW_FTS_TABLE}, rowid, title, plot, genres, "cast", directors)
+        VALUES ('delete', old.show_id, old.title, old.plot, old.genres, old."cast", old.directors);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SHOW_FTS_TABLE}_au AFTER UPDATE ON cached_show BEGIN
+        INSERT INTO {SHOW_FTS_TABLE}({SHOW_FTS_TABLE}, rowid, title, plot, genres, "cast", directors)
+        VALUES ('delete', old.show_id, old.title, old.plot, old.genres, old."cast", old.directors);
+        INSERT INTO {SHOW_FTS_TABLE}(rowid, title, plot, genres, "cast", directors)
+        VALUES (new.show_id, new.title, new.plot, new.genres, new."cast", new.directors);
+    END""",
+]
+
+_fts_available = True
+
+def ensure_show_search_index(engine: Engine) -> None:
+    """Creates the FTS index and its triggers, and back-fills it when it is new (migration for existing databases)."""
+    global _fts_available
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": SHOW_FTS_TABLE}
+            ).first() is not None
+
+            for statement in SHOW_FTS_DDL:
+                conn.execute(text(statement))
+
+            if not exists:
+                conn.execute(text(f"INSERT INTO {SHOW_FTS_TABLE}({SHOW_FTS_TABLE}) VALUES ('rebuild')"))
+                logging.info(f"Built full-text index '{SHOW_FTS_TABLE}' from existing cached shows.")
+        _fts_available = True
+    except OperationalError as e:
+        _fts_available = False
+        logging.warning(f"SQLite FTS5 unavailable, show lookups fall back to LIKE scans: {e}")
+
+def build_fts_query(query: str, column: Optional[str] = None, match_all: bool = True) -> Optional[str]:
+    """Turns free text into a safe FTS5 expression: every token quoted, last token prefix-matched."""
+    tokens = re.findall(r"\w+", query.lower())
+    if not tokens:
+        return None
+
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    expression = (" AND " if match_all else " OR ").join(terms)
+    return f"{column} : ({expression})" if column else expression
+
+def find_cached_show_by_title(db: Session, title: str) -> Optional[ShowORM]:
+    """Best title match from the cache: an exact (case-insensitive) title first, then bm25 rank."""
+    global _fts_available
+    match = build_fts_query(title, column="title")
+
+    if _fts_available and match:
+        try:
+            row = db.execute(text(f"""
+                SELECT cached_show.show_id FROM {SHOW_FTS_TABLE}
+                JOIN cached_show ON cached_show.show_id = {SHOW_FTS_TABLE}.rowid
+                WHERE {SHOW_FTS_TABLE} MATCH :match
+                ORDER BY lower(cached_show.title) = lower(:title) DESC, bm25({SHOW_FTS_TABLE}, {SHOW_FTS_WEIGHTS})
+                LIMIT 1
+            """), {"match": match, "title": title}).first()
+            return db.get(ShowORM, row.show_id) if row else None
+        except OperationalError as e:
+            _fts_available = False
+            db.rollback()
+            logging.warning(f"Full-text title lookup failed, falling back to LIKE: {e}")
+
+    return db.query(ShowORM).filter(
+        ShowORM.title.ilike(f"%{title}%")
+    ).first() 
+
+def search_cached_shows(db: Session, query: str, k: int = 10) -> List[ShowData]:
+    """Top-k cached shows for a free-text query, ranked by bm25 over title, plot, genres, cast and directors."""
+    global _fts_available
+    match = build_fts_query(query, match_all=False)
+    if not match:
+        return []
+
+    if _fts_available:
+        try:
+            rows = db.execute(text(f"""
+                SELECT rowid FROM {SHOW_FTS_TABLE}
+                WHERE {SHOW_FTS_TABLE} MATCH :match
+                ORDER BY bm25({SHOW_FTS_TABLE}, {SHOW_FTS_WEIGHTS})
+                LIMIT :k
+            """), {"match": match, "k": k}).all()
+            shows_by_id = {
+                show.show_id: show
+                for show in db.query(ShowORM).filter(ShowORM.show_id.in_([row.rowid for row in rows])).all()
+            }
+            return [ShowData.from_orm_model(shows_by_id[row.rowid]) for row in rows if row.rowid in shows_by_id]
+        except OperationalError as e:
+            _fts_available = False
+            db.rollback()
+            logging.warning(f"Full-text search failed, falling back to LIKE: {e}")
+
+    db_shows = db.query(ShowORM).filter(
+        or_(ShowORM.title.ilike(f"%{query}%"), ShowORM.plot.ilike(f"%{query}%"))
+    ).limit(k).all()
+    return [ShowData.from_orm_model(show) for show in db_shows]
+
+def to_retrieved_shows(scored_docs: List[Tuple[Document, float]]) -> List[RetrievedShow]:
+    """(document, similarity) pairs, as returned by a vector store's similarity_search_with_score."""
+    return [RetrievedShow.from_document(doc, score=score) for doc, score in scored_docs]
+
+def format_retrieved_shows(shows: List[RetrievedShow]) -> str:
+    """Renders retrieved shows for the response prompt; nothing parses this text back."""
+    if not shows:
         return "No relevant cached data found."
     
     formatted_list = [] 
-    for doc in docs:
-        title = doc.metadata.get('title', 'N/A')
-        score = doc.metadata.get("score", "N/A")
-        show_id = doc.metadata.get('show_id', 'N/A')
+    for show in shows:
+        score = show.score if show.score is not None else "N/A"
+        show_id = show.show_id if show.show_id is not None else "N/A"
         
-        formatted_list.append(f"[Title: {title}, Score: {score}, Show ID: {show_id}] {doc.page_content}") 
+        formatted_list.append(f"[Title: {show.title}, Score: {score}, Show ID: {show_id}] {show.content}") 
 
     return "\n\n---\n\n".join(formatted_list)
 
 def get_show_by_title(db: Session, title: str) -> Optional[ShowData]:
     """
-    Attempts to get a show from the local cache first. 
+    Attempts to get a show from the local cache first (stale rows are returned as-is 
+    and refreshed in the background). 
     If not found (Cache MISS), searches TMDB, fetches details, caches, and returns.
     """
     # 1. Cache HIT attempt
-    db_show = db.query(ShowORM).filter(
-        ShowORM.title.ilike(f"%{title}%")
-    ).first() 
+    db_show = find_cached_show_by_title(db, title) 
 
     if db_show:
         logging.info(f"Cache HIT: Found '{db_show.title}' in local database.") 
+
+        # Stale-while-revalidate: serve the cached copy now, refresh it off the request path.
+        if is_stale(db_show) and db_show.type in ('movie', 'tv'):
+            schedule_show_refresh(db_show.show_id, db_show.type) 
+
         return ShowData.from_orm_model(db_show) 
     
     logging.info(f"Cache MISS: Title '{title}' not found locally. Searching TMDB..")
@@ -72,13 +256,8 @@ def get_show_by_title(db: Session, title: str) -> Optional[ShowData]:
     logging.info(f"Failed to fetch details for best match: '{best_match.title}'.")
     return None 
 
-def upsert_show(db: Session, show_data: ShowData) -> None:
-    """Inserts or updates a show record in the local cache."""
-    db_show = db.query(ShowORM).filter(
-        ShowORM.show_id == show_data.show_id
-    ).one_or_none() 
-
-    # Prepare data for insertion/update
+def prepare_show_fields(show_data: ShowData) -> Dict[str, Any]:
+    """Normalizes a ShowData into cached_show column values (JSON list fields, parsed release date)."""
     show_fields = show_data.model_dump(exclude_none=True) 
     show_fields['last_updated'] = datetime.utcnow() 
 
@@ -96,6 +275,17 @@ def upsert_show(db: Session, show_data: ShowData) -> None:
             logging.warning(f"Could not convert release_date '{show_fields['release_date']}' to datetime.")
             show_fields['release_date'] = None 
 
+    return show_fields
+
+def upsert_show(db: Session, show_data: ShowData) -> None:
+    """Inserts or updates a show record in the local cache."""
+    db_show = db.query(ShowORM).filter(
+        ShowORM.show_id == show_data.show_id
+    ).one_or_none() 
+
+    # Prepare data for insertion/update
+    show_fields = prepare_show_fields(show_data) 
+
     if db_show:
         for key, value in show_fields.items():
             setattr(db_show, key, value) 
@@ -118,6 +308,63 @@ def upsert_show(db: Session, show_data: ShowData) -> None:
         db.commit() 
     except Exception as e:
         db.rollback() 
-        logging.error(f"❌ Failed to commit upsert operation: {e}") 
+        logging.error(f"❌ Failed to commit upsert operation: {e}")
+
+
+def upsert_shows(db: Session, shows: List[ShowData], chunk_size: int = UPSERT_CHUNK_SIZE) -> Dict[str, int]:
+    """
+    Bulk version of upsert_show: one INSERT ... ON CONFLICT DO UPDATE per chunk, all chunks 
+    in a single transaction. Returns the inserted, updated and skipped counts.
+    """
+    rows_by_id: Dict[int, Dict[str, Any]] = {} 
+    skipped = 0 
+
+    for show_data in shows:
+        show_fields = prepare_show_fields(show_data) 
+        try:
+            show_fields['show_id'] = int(show_fields['show_id'])
+        except (KeyError, ValueError, TypeError):
+            logging.error(f"Show ID {show_fields.get('show_id')} is not a valid integer. Skipping upsert.")
+            skipped += 1
+            continue
+
+        # A later copy of the same show in the batch wins, as it would with repeated upsert_show calls.
+        if show_fields['show_id'] in rows_by_id:
+            skipped += 1
+        rows_by_id[show_fields['show_id']] = show_fields 
 
+    columns = [column.key for column in ShowORM.__table__.columns] 
+    # Absent fields are bound as SQL NULL (a JSON column would store None as the string 'null').
+    rows = [{column: fields.get(column, null()) for column in columns} for fields in rows_by_id.values()] 
+
+    inserted = updated = 0 
+    try:
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size] 
+            chunk_ids = [row['show_id'] for row in chunk] 
+            existing = db.execute(
+                select(ShowORM.show_id).where(ShowORM.show_id.in_(chunk_ids))
+            ).scalars().all() 
+
+            stmt = sqlite_insert(ShowORM.__table__).values(chunk) 
+            # Fields the new data does not have (None) keep their stored value, as with upsert_show.
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ShowORM.__table__.c.show_id],
+                set_={
+                    column: func.coalesce(stmt.excluded[column], ShowORM.__table__.c[column])
+                    for column in columns if column != 'show_id'
+                }
+            )
+            db.execute(stmt) 
+
+            updated += len(existing) 
+            inserted += len(chunk) - len(existing) 
+
+        db.commit() 
+    except Exception as e:
+        db.rollback() 
+        logging.error(f"❌ Failed to commit bulk upsert of {len(rows)} shows: {e}") 
+        raise
 
+    logging.info(f"Cache BULK UPSERT: {inserted} inserted, {updated} updated, {skipped} skipped.") 
+    return {"inserted": inserted, "updated": updated, "skipped": skipped}
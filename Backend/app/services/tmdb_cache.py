@@ -0,0 +1,115 @@
+# Response cache for TMDB API calls: bounded in-memory LRU with an optional on-disk store
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logging.basicConfig(
+    level=logging.INFO
+)
+
+# Marks a remembered "TMDB has nothing for this" answer.
+NEGATIVE = None
+
+
+class TMDBResponseCache:
+    """
+    Caches raw TMDB JSON payloads keyed by endpoint + params. Entries carry their own
+    expiry, so search results, details and negative answers can use different TTLs.
+    When `disk_path` is set, entries are also written to a small SQLite file and
+    survive restarts; memory stays bounded by `max_entries` either way.
+    """
+
+    def __init__(self, max_entries: int = 5000, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "negative_hits": 0, "disk_hits": 0, "evictions": 0}
+
+        self._disk: Optional[sqlite3.Connection] = None
+        if disk_path:
+            try:
+                self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+                self._disk.execute(
+                    "CREATE TABLE IF NOT EXISTS tmdb_response_cache (key TEXT PRIMARY KEY, expires_at REAL, payload TEXT)"
+                )
+                self._disk.execute("DELETE FROM tmdb_response_cache WHERE expires_at < ?", (time.time(),))
+                self._disk.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"TMDB disk cache unavailable at '{disk_path}': {e}")
+                self._disk = None
+
+    @staticmethod
+    def make_key(path: str, params: Optional[Dict[str, Any]] = None) -> str:
+        # The API key is deliberately left out: it does not change the response.
+        cache_params = {k: v for k, v in (params or {}).items() if k != 'api_key'}
+        return f"{path}?{json.dumps(cache_params, sort_keys=True)}"
+
+    def _remember(self, key: str, expires_at: float, payload: Optional[Dict[str, Any]]) -> None:
+        self._entries[key] = (expires_at, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, key: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Returns (hit, payload). A hit with payload None is a cached negative result."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < now:
+                del self._entries[key]
+                entry = None
+
+            if entry is None and self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT expires_at, payload FROM tmdb_response_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[0] >= now:
+                    entry = (row[0], json.loads(row[1]) if row[1] is not None else NEGATIVE)
+                    self._remember(key, *entry)
+                    self._stats["disk_hits"] += 1
+
+            if entry is None:
+                self._stats["misses"] += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            if entry[1] is NEGATIVE:
+                self._stats["negative_hits"] += 1
+            return True, entry[1]
+
+    def set(self, key: str, payload: Optional[Dict[str, Any]], ttl: float) -> None:
+        if ttl <= 0:
+            return
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, expires_at, payload)
+            if self._disk is not None:
+                try:
+                    self._disk.execute(
+                        "INSERT OR REPLACE INTO tmdb_response_cache (key, expires_at, payload) VALUES (?, ?, ?)",
+                        (key, expires_at, json.dumps(payload) if payload is not NEGATIVE else None)
+                    )
+                    self._disk.commit()
+                except sqlite3.Error as e:
+                    logging.warning(f"Failed to persist TMDB cache entry: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM tmdb_response_cache")
+                self._disk.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
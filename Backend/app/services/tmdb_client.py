@@ -1,10 +1,19 @@
 import os
+import random
+import asyncio
+import threading
+import time
 import requests
+import httpx
 import logging
-from typing import Dict, List, Optional, Any 
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional, Any, Tuple 
 from dotenv import load_dotenv 
 from datetime import datetime
-from ..models.pydantic_models import ShowData
+from ..models.pydantic_models import ShowData, ShowDetailsResult
+from .http_client import get_async_client
+from .tmdb_cache import TMDBResponseCache, NEGATIVE
 
 load_dotenv() 
 
@@ -21,6 +30,30 @@ else:
 
 base_url = "https://api.themoviedb.org/3"
 
+# Connection pool, timeouts, rate limit and retry policy (TMDB allows roughly 40-50 requests/second)
+TMDB_POOL_SIZE = int(os.getenv("TMDB_POOL_SIZE", "20"))
+TMDB_CONNECT_TIMEOUT = float(os.getenv("TMDB_CONNECT_TIMEOUT", "3.05"))
+TMDB_READ_TIMEOUT = float(os.getenv("TMDB_READ_TIMEOUT", "10"))
+TMDB_RATE_LIMIT_PER_SECOND = float(os.getenv("TMDB_RATE_LIMIT_PER_SECOND", "40"))
+TMDB_RATE_LIMIT_BURST = float(os.getenv("TMDB_RATE_LIMIT_BURST", "40"))
+TMDB_MAX_RETRIES = int(os.getenv("TMDB_MAX_RETRIES", "3"))
+TMDB_BACKOFF_BASE = float(os.getenv("TMDB_BACKOFF_BASE", "0.5"))
+TMDB_BACKOFF_MAX = float(os.getenv("TMDB_BACKOFF_MAX", "8"))
+TMDB_DETAILS_CONCURRENCY = int(os.getenv("TMDB_DETAILS_CONCURRENCY", "8"))
+
+# Response cache: separate TTLs for search and details results, a short TTL for negative
+# results (empty searches, 404s), a bounded LRU and an optional on-disk store.
+TMDB_CACHE_SEARCH_TTL = float(os.getenv("TMDB_CACHE_SEARCH_TTL", "3600"))
+TMDB_CACHE_DETAILS_TTL = float(os.getenv("TMDB_CACHE_DETAILS_TTL", "86400"))
+TMDB_CACHE_NEGATIVE_TTL = float(os.getenv("TMDB_CACHE_NEGATIVE_TTL", "300"))
+TMDB_CACHE_MAX_ENTRIES = int(os.getenv("TMDB_CACHE_MAX_ENTRIES", "5000"))
+TMDB_CACHE_PATH = os.getenv("TMDB_CACHE_PATH")
+
+CACHE_SEARCH = "search"
+CACHE_DETAILS = "details"
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
 def map_tmdb_to_showdata(data: Dict[str, Any], media_type: str) -> Optional[ShowData]:
     """Maps raw TMDB response data to the internal ShowData Pydantic model."""
     show_id = str(data.get('id')) 
@@ -80,74 +113,427 @@ def map_tmdb_to_showdata(data: Dict[str, Any], media_type: str) -> Optional[Show
     )
 
 
+def parse_search_results(data: Dict[str, Any], media_type: str) -> List[ShowData]:
+    results: List[ShowData] = [] 
+    for item in data.get('results', []):
+        item_type = item.get('media_type') 
+        map_type = media_type
+        if media_type == 'multi':
+            map_type = item_type
+
+        if map_type in ['movie', 'tv']:
+            show_data = map_tmdb_to_showdata(item, media_type=map_type) 
+            if show_data:
+                results.append(show_data) 
+
+    return results
+
+
+class TokenBucket:
+    """Thread-safe token bucket. Callers reserve a token and sleep for the returned delay,
+    which lets the sync and async paths share one limiter."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class TMDBRequestError(Exception):
+    """Raised when a TMDB request still fails after all retries."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def decode_payload(response) -> Optional[Dict[str, Any]]:
+    """The JSON object in a response body, or None for an HTML error page, a truncated body or any other non-object."""
+    try:
+        payload = response.json()
+    except ValueError:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+class TMDBClient:
+    """
+    TMDB API client with a keep-alive connection pool, timeouts, a token-bucket rate limiter
+    and retries with jittered exponential backoff on 429/5xx and connection errors.
+    The sync path uses a pooled requests.Session; the async path uses the shared httpx client.
+    """
+
+    def __init__(
+            self,
+            api_key: Optional[str],
+            base_url: str = base_url,
+            pool_size: int = TMDB_POOL_SIZE,
+            connect_timeout: float = TMDB_CONNECT_TIMEOUT,
+            read_timeout: float = TMDB_READ_TIMEOUT,
+            rate_limit_per_second: float = TMDB_RATE_LIMIT_PER_SECOND,
+            rate_limit_burst: float = TMDB_RATE_LIMIT_BURST,
+            max_retries: int = TMDB_MAX_RETRIES,
+            backoff_base: float = TMDB_BACKOFF_BASE,
+            backoff_max: float = TMDB_BACKOFF_MAX,
+            cache: Optional[TMDBResponseCache] = None
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = TokenBucket(rate_limit_per_second, rate_limit_burst)
+        self.cache = cache
+        self.cache_ttls = {CACHE_SEARCH: TMDB_CACHE_SEARCH_TTL, CACHE_DETAILS: TMDB_CACHE_DETAILS_TTL}
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "retries": 0,
+            "errors": 0,
+            "rate_limited": 0,
+            "bad_payloads": 0,
+            "latency_total_ms": 0.0,
+            "latency_max_ms": 0.0
+        }
+
+    # --- metrics ---
+
+    def _record(self, latency_s: Optional[float] = None, **counters: int) -> None:
+        with self._stats_lock:
+            for name, value in counters.items():
+                self._stats[name] += value
+            if latency_s is not None:
+                latency_ms = latency_s * 1000
+                self._stats["latency_total_ms"] += latency_ms
+                self._stats["latency_max_ms"] = max(self._stats["latency_max_ms"], latency_ms)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["latency_avg_ms"] = stats["latency_total_ms"] / stats["requests"] if stats["requests"] else 0.0
+        return stats
+
+    # --- retry policy ---
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        # "Full jitter": spreads retries from concurrent callers instead of synchronising them.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    # --- response cache ---
+
+    def _cache_key(self, path: str, params: Optional[Dict[str, Any]], cache_kind: Optional[str]) -> Optional[str]:
+        if self.cache is None or cache_kind is None:
+            return None
+        return self.cache.make_key(path, params)
+
+    def _cache_lookup(self, key: Optional[str], path: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        if key is None:
+            return False, None
+        hit, payload = self.cache.get(key)
+        if hit and payload is NEGATIVE:
+            raise TMDBRequestError(f"TMDB has no result for {path} (cached)", 404)
+        return hit, payload
+
+    def _cache_store(self, key: Optional[str], cache_kind: Optional[str], payload: Optional[Dict[str, Any]]) -> None:
+        if key is None:
+            return
+        if payload is NEGATIVE or (cache_kind == CACHE_SEARCH and not payload.get('results')):
+            self.cache.set(key, payload, TMDB_CACHE_NEGATIVE_TTL)
+        else:
+            self.cache.set(key, payload, self.cache_ttls[cache_kind])
+
+    def _request_params(self, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {'api_key': self.api_key, 'language': 'en-US', **(params or {})}
+
+    def get(self, path: str, params: Optional[Dict[str, Any]] = None, cache_kind: Optional[str] = None) -> Dict[str, Any]:
+        cache_key = self._cache_key(path, params, cache_kind)
+        hit, payload = self._cache_lookup(cache_key, path)
+        if hit:
+            return payload
+
+        url = f"{self.base_url}{path}"
+        request_params = self._request_params(params)
+
+        for attempt in range(self.max_retries + 1):
+            delay = self.limiter.reserve()
+            if delay:
+                time.sleep(delay)
+
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=request_params, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self._record(time.perf_counter() - started, requests=1)
+                if attempt == self.max_retries:
+                    self._record(errors=1)
+                    raise TMDBRequestError(f"TMDB request to {path} failed: {e}") from e
+                self._record(retries=1)
+                time.sleep(self._backoff_delay(attempt))
+                continue
+
+            self._record(time.perf_counter() - started, requests=1)
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                self._record(retries=1, rate_limited=int(response.status_code == 429))
+                time.sleep(self._backoff_delay(attempt, response.headers.get("Retry-After")))
+                continue
+
+            if response.status_code >= 400:
+                self._record(errors=1, rate_limited=int(response.status_code == 429))
+                if response.status_code == 404:
+                    self._cache_store(cache_key, cache_kind, NEGATIVE)
+                raise TMDBRequestError(f"TMDB request to {path} returned HTTP {response.status_code}", response.status_code)
+
+            # A 200 whose body is not JSON (a proxy's error page, a truncated response during a
+            # TMDB incident) is retried like a 5xx and never cached.
+            payload = decode_payload(response)
+            if payload is None:
+                self._record(bad_payloads=1)
+                if attempt < self.max_retries:
+                    self._record(retries=1)
+                    time.sleep(self._backoff_delay(attempt))
+                    continue
+                self._record(errors=1)
+                raise TMDBRequestError(f"TMDB request to {path} returned a body that is not a JSON object", response.status_code)
+
+            self._cache_store(cache_key, cache_kind, payload)
+            return payload
+
+        raise TMDBRequestError(f"TMDB request to {path} failed")
+
+    async def aget(self, path: str, params: Optional[Dict[str, Any]] = None, cache_kind: Optional[str] = None) -> Dict[str, Any]:
+        cache_key = self._cache_key(path, params, cache_kind)
+        hit, payload = self._cache_lookup(cache_key, path)
+        if hit:
+            return payload
+
+        url = f"{self.base_url}{path}"
+        request_params = self._request_params(params)
+        connect_timeout, read_timeout = self.timeout
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        client = get_async_client()
+
+        for attempt in range(self.max_retries + 1):
+            delay = self.limiter.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+
+            started = time.perf_counter()
+            try:
+                response = await client.get(url, params=request_params, timeout=timeout)
+            except httpx.TransportError as e:
+                self._record(time.perf_counter() - started, requests=1)
+                if attempt == self.max_retries:
+                    self._record(errors=1)
+                    raise TMDBRequestError(f"TMDB request to {path} failed: {e}") from e
+                self._record(retries=1)
+                await asyncio.sleep(self._backoff_delay(attempt))
+                continue
+
+            self._record(time.perf_counter() - started, requests=1)
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                self._record(retries=1, rate_limited=int(response.status_code == 429))
+                await asyncio.sleep(self._backoff_delay(attempt, response.headers.get("Retry-After")))
+                continue
+
+            if response.status_code >= 400:
+                self._record(errors=1, rate_limited=int(response.status_code == 429))
+                if response.status_code == 404:
+                    self._cache_store(cache_key, cache_kind, NEGATIVE)
+                raise TMDBRequestError(f"TMDB request to {path} returned HTTP {response.status_code}", response.status_code)
+
+            payload = decode_payload(response)
+            if payload is None:
+                self._record(bad_payloads=1)
+                if attempt < self.max_retries:
+                    self._record(retries=1)
+                    await asyncio.sleep(self._backoff_delay(attempt))
+                    continue
+                self._record(errors=1)
+                raise TMDBRequestError(f"TMDB request to {path} returned a body that is not a JSON object", response.status_code)
+
+            self._cache_store(cache_key, cache_kind, payload)
+            return payload
+
+        raise TMDBRequestError(f"TMDB request to {path} failed")
+
+    # --- endpoints ---
+
+    def search_shows(self, query: str, media_type: str = 'multi') -> List[ShowData]:
+        """Searches TMDB for movies or TV shows based on a query."""
+        if not self.api_key:
+            logging.warning("TMDB API key not configured")
+            return [] 
+
+        try: 
+            data = self.get(f"/search/{media_type}", {'query': query}, cache_kind=CACHE_SEARCH)
+            return parse_search_results(data, media_type)
+        except TMDBRequestError as e:
+            logging.error(f"Error during TMDB search: {e}") 
+            return [] 
+
+    async def asearch_shows(self, query: str, media_type: str = 'multi') -> List[ShowData]:
+        if not self.api_key:
+            logging.warning("TMDB API key not configured")
+            return [] 
+
+        try: 
+            data = await self.aget(f"/search/{media_type}", {'query': query}, cache_kind=CACHE_SEARCH)
+            return parse_search_results(data, media_type)
+        except TMDBRequestError as e:
+            logging.error(f"Error during TMDB search: {e}") 
+            return [] 
+
+    def _validate_details_request(self, media_type: str) -> Optional[str]:
+        if not self.api_key:
+            return "TMDB api key not configured"
+        if media_type not in ["movie", 'tv']:
+            return "media_type must be 'movie' or 'tv'."
+        return None
+
+    @staticmethod
+    def _map_details(details_data: Dict[str, Any], media_type: str) -> Optional[ShowData]:
+        # Credits arrive in the same response through append_to_response.
+        # The payload may be shared with the response cache, so it is copied rather than mutated.
+        credits_data = details_data.get('credits') or {}
+        details_data = {**details_data, 'cast': credits_data.get('cast', []), 'crew': credits_data.get('crew', [])}
+
+        return map_tmdb_to_showdata(details_data, media_type) 
+
+    def get_show_details(self, tmdb_id: int, media_type: str) -> Optional[ShowData]: 
+        error = self._validate_details_request(media_type)
+        if error:
+            logging.error(f"❌ {error}")
+            return None
+
+        try: 
+            details_data = self.get(f"/{media_type}/{tmdb_id}", {'append_to_response': 'credits'}, cache_kind=CACHE_DETAILS)
+            return self._map_details(details_data, media_type)
+        except TMDBRequestError as e:
+            logging.error(f"Error during TMDB fetch: {e}") 
+            return None 
+
+    async def aget_show_details(self, tmdb_id: int, media_type: str) -> Optional[ShowData]: 
+        error = self._validate_details_request(media_type)
+        if error:
+            logging.error(f"❌ {error}")
+            return None
+
+        try: 
+            details_data = await self.aget(f"/{media_type}/{tmdb_id}", {'append_to_response': 'credits'}, cache_kind=CACHE_DETAILS)
+            return self._map_details(details_data, media_type)
+        except TMDBRequestError as e:
+            logging.error(f"Error during TMDB fetch: {e}") 
+            return None 
+
+    def _details_result(self, tmdb_id: int, media_type: str, details_data: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> ShowDetailsResult:
+        show = self._map_details(details_data, media_type) if details_data is not None else None
+        if details_data is not None and show is None:
+            error = "TMDB response could not be mapped to a show."
+        return ShowDetailsResult(tmdb_id=tmdb_id, media_type=media_type, show=show, error=error)
+
+    def get_show_details_many(self, ids: List[Tuple[int, str]], concurrency: int = TMDB_DETAILS_CONCURRENCY) -> List[ShowDetailsResult]:
+        """
+        Fetches details + credits for many (tmdb_id, media_type) pairs, at most `concurrency`
+        at a time. Results come back in input order; failures are reported per item.
+        """
+        def fetch(item: Tuple[int, str]) -> ShowDetailsResult:
+            tmdb_id, media_type = item
+            error = self._validate_details_request(media_type)
+            if error:
+                return self._details_result(tmdb_id, media_type, error=error)
+            try:
+                return self._details_result(tmdb_id, media_type, self.get(f"/{media_type}/{tmdb_id}", {'append_to_response': 'credits'}, cache_kind=CACHE_DETAILS))
+            except TMDBRequestError as e:
+                return self._details_result(tmdb_id, media_type, error=str(e))
+
+        if not ids:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(ids)))) as executor:
+            return list(executor.map(fetch, ids))
+
+    async def aget_show_details_many(self, ids: List[Tuple[int, str]], concurrency: int = TMDB_DETAILS_CONCURRENCY) -> List[ShowDetailsResult]:
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def fetch(item: Tuple[int, str]) -> ShowDetailsResult:
+            tmdb_id, media_type = item
+            error = self._validate_details_request(media_type)
+            if error:
+                return self._details_result(tmdb_id, media_type, error=error)
+            async with semaphore:
+                try:
+                    return self._details_result(tmdb_id, media_type, await self.aget(f"/{media_type}/{tmdb_id}", {'append_to_response': 'credits'}, cache_kind=CACHE_DETAILS))
+                except TMDBRequestError as e:
+                    return self._details_result(tmdb_id, media_type, error=str(e))
+
+        return list(await asyncio.gather(*(fetch(item) for item in ids)))
+
+    def close(self) -> None:
+        self.session.close()
+
+
+# Process-wide client (and response cache) used by the module-level helpers below.
+response_cache = TMDBResponseCache(max_entries=TMDB_CACHE_MAX_ENTRIES, disk_path=TMDB_CACHE_PATH)
+client = TMDBClient(api_key, cache=response_cache)
+
+
 def search_shows(query: str, media_type: str = 'multi') -> List[ShowData]:
     """Searches TMDB for movies or TV shows based on a query."""
-    if not api_key:
-        logging.warning("TMDB API key not configured")
-        return [] 
-    
-    endpoint = f"{base_url}/search/{media_type}" 
-    params = {
-        'api_key' : api_key,
-        'query' : query,
-        'language' : 'en-US'
-    }
+    return client.search_shows(query, media_type)
+
+
+async def asearch_shows(query: str, media_type: str = 'multi') -> List[ShowData]:
+    return await client.asearch_shows(query, media_type)
 
-    try: 
-        response = requests.get(endpoint, params=params) 
-        response.raise_for_status() 
-        data = response.json() 
-
-        results: List[ShowData] = [] 
-        for item in data.get('results', []):
-            item_type = item.get('media_type') 
-            map_type = media_type
-            if media_type == 'multi':
-                map_type = item_type
-
-            if map_type in ['movie', 'tv']:
-                show_data = map_tmdb_to_showdata(item, media_type=map_type) 
-                if show_data:
-                    results.append(show_data) 
-
-        return results
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error during TMDB search: {e}") 
-        return [] 
-    
 
 def get_show_details(tmdb_id: int, media_type: str) -> Optional[ShowData]: 
-    if not api_key:
-        logging.warning("❌ TMDB api key not configured")
-        return None
-    
-    if media_type not in ["movie", 'tv']:
-        logging.error("❌ media_type must be 'movie' or 'tv'.")
-        return None
-    
-    details_endpoint = f"{base_url}/{media_type}/{tmdb_id}" 
-    params = {'api_key': api_key, 'language' : 'en-US'} 
+    return client.get_show_details(tmdb_id, media_type)
 
-    credits_endpoint = f"{base_url}/{media_type}/{tmdb_id}/credits"
 
-    try: 
-        details_response = requests.get(details_endpoint, params=params) 
-        details_response.raise_for_status() 
-        details_data = details_response.json() 
+async def aget_show_details(tmdb_id: int, media_type: str) -> Optional[ShowData]: 
+    return await client.aget_show_details(tmdb_id, media_type)
 
-        credits_response = requests.get(credits_endpoint, params=params) 
-        credits_response.raise_for_status() 
-        credits_data = credits_response.json() 
 
-        details_data['cast'] = credits_data.get('cast', []) 
-        details_data['crew'] = credits_data.get('crew', []) 
+def get_show_details_many(ids: List[Tuple[int, str]], concurrency: int = TMDB_DETAILS_CONCURRENCY) -> List[ShowDetailsResult]:
+    return client.get_show_details_many(ids, concurrency)
+
+
+async def aget_show_details_many(ids: List[Tuple[int, str]], concurrency: int = TMDB_DETAILS_CONCURRENCY) -> List[ShowDetailsResult]:
+    return await client.aget_show_details_many(ids, concurrency)
+
+
+def get_stats() -> Dict[str, Any]:
+    return client.get_stats()
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    return response_cache.get_stats()
 
-        return map_tmdb_to_showdata(details_data, media_type) 
-    
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error during TMDB fetch: {e}") 
-        return None 
-    
 # ----Example block for running locally----
 # if __name__ == '__main__':
 #     # NOTE: You must set the TMDB_API_KEY environment variable for this to run.
@@ -0,0 +1,164 @@
+# Cache of authenticated users: a per-request memo in front of a short-TTL process-wide LRU
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..models.database_models import User
+from ..models.pydantic_models import UserInDB
+from . import user_manager
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO
+)
+
+USER_CACHE_ENABLED = os.getenv("USER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Upper bound on how long a change made outside this process (another worker, a manual
+# SQL update) can go unnoticed; changes made through the ORM here invalidate immediately.
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+
+
+class UserCache:
+    """
+    Active users keyed by id, as the UserInDB the auth dependency returns. Each
+    invalidation bumps an epoch; a load that started before it is not stored, so a read
+    racing an update cannot put the old row back.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Tuple[float, UserInDB]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = 0
+        self._stats = {"hits": 0, "misses": 0, "request_hits": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def epoch(self) -> int:
+        return self._epoch
+
+    def get(self, user_id: int) -> Optional[UserInDB]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[user_id]
+                self._stats["expired"] += 1
+                entry = None
+
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(user_id)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def set(self, user_id: int, user: UserInDB, epoch: int) -> None:
+        with self._lock:
+            if epoch != self._epoch or self.ttl_seconds <= 0:
+                return
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.pop(user_id, None)
+            self._stats["invalidations"] += 1
+
+    def record_request_hit(self) -> None:
+        with self._lock:
+            self._stats["request_hits"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+active_users = UserCache(USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_ENTRIES)
+
+
+def _request_memo(request: Any) -> Dict[int, Optional[UserInDB]]:
+    if request is None:
+        return {}
+    memo = getattr(request.state, "users", None)
+    if memo is None:
+        memo = {}
+        request.state.users = memo
+    return memo
+
+
+def get_user(db: Session, user_id: int, request: Any = None) -> Optional[UserInDB]:
+    """The user with `user_id`: from this request's memo, then the process cache, then the database."""
+    memo = _request_memo(request)
+    if user_id in memo:
+        active_users.record_request_hit()
+        return memo[user_id]
+
+    user = active_users.get(user_id) if USER_CACHE_ENABLED else None
+    if user is None:
+        epoch = active_users.epoch
+        db_user = user_manager.get_user_by_id(db, user_id=user_id)
+        user = user_manager.convert_db_user_to_userindb(db_user) if db_user is not None else None
+        # Only active users are cached; anything else is looked up again every time.
+        if USER_CACHE_ENABLED and user is not None and user.is_active:
+            active_users.set(user_id, user, epoch)
+
+    memo[user_id] = user
+    return user
+
+
+def invalidate_user(user_id: int) -> None:
+    active_users.invalidate(user_id)
+
+
+# --- Invalidation hooks ---
+# Updated users are collected at flush and dropped from the cache when the transaction
+# commits (not at flush, when a concurrent load would still read the old row).
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target: User) -> None:
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault("updated_user_ids", set()).add(target.id)
+
+
+@event.listens_for(User, "after_delete")
+def _user_deleted(mapper, connection, target: User) -> None:
+    _user_updated(mapper, connection, target)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session) -> None:
+    for user_id in session.info.pop("updated_user_ids", ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_users(session: Session) -> None:
+    session.info.pop("updated_user_ids", None)
+
+
+def get_stats() -> Dict[str, Any]:
+    return {"enabled": USER_CACHE_ENABLED, **active_users.get_stats()}
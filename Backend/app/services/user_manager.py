@@ -1,12 +1,18 @@
 # Handles user profile CRUD 
 from fastapi import HTTPException
-from sqlalchemy.orm import Session  
-from typing import Optional, List 
+from sqlalchemy.orm import Session, selectinload  
+from sqlalchemy.ext.asyncio import AsyncSession 
+from sqlalchemy import select, update, func, text, inspect 
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert 
+from sqlalchemy.engine import Engine 
+from typing import Optional, List, Iterable, Tuple, Dict, Any 
+from collections import OrderedDict 
 from datetime import datetime 
 
 from ..models.database_models import User, UserPreference 
 from ..models.pydantic_models import UserInDB, UserRegistrationRequest, UserProfileResponse, UserPreferenceInDB 
-from ..core.auth import get_password_hash, verify_password 
+from ..core.auth import get_password_hash, verify_and_update_password, aget_password_hash, averify_and_update_password 
+from . import profile_cache 
 
 def convert_db_user_to_userindb(db_user: User) -> UserInDB:
     return UserInDB(
@@ -48,10 +54,19 @@ def create_user(db: Session, user_data: UserRegistrationRequest) -> Optional[Use
 def authenticate_user(db: Session, user_name: str, password: str) -> Optional[User]:
     db_user = get_user_by_username(db, user_name=user_name)
 
-    if db_user and verify_password(password, db_user.hashed_password): 
-        return db_user
+    if db_user is None:
+        return None
+
+    valid, new_hash = verify_and_update_password(password, db_user.hashed_password) 
+    if not valid:
+        return None
+
+    if new_hash:
+        # Stored with an outdated cost; replace it while the plain password is at hand.
+        db_user.hashed_password = new_hash 
+        db.commit() 
     
-    return None 
+    return db_user 
 
 def get_user_profile(db: Session, user_id: int) -> Optional[User]:
     db_user = db.query(User).filter(User.id == user_id).one_or_none()
@@ -75,27 +90,173 @@ def get_user_preferences(db: Session, user_id: int) -> List[UserPreferenceInDB]:
         for pref in db_preferences
     ]
 
+# (user_id, preference_type, preference_value, score_delta)
+PreferenceDelta = Tuple[int, str, str, float]
+
+def bump_profile_version(user_ids: Iterable[int]):
+    # Any preference change makes the cached profile snapshot (services/profile_cache) stale.
+    return (
+        update(User)
+        .where(User.id.in_(list(user_ids)))
+        .values(profile_version=User.profile_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+def sum_preference_deltas(deltas: Iterable[PreferenceDelta]) -> "OrderedDict[Tuple[int, str, str], float]":
+    # A preference may appear only once in an upsert statement, so its deltas are summed first.
+    summed: "OrderedDict[Tuple[int, str, str], float]" = OrderedDict()
+    for user_id, preference_type, preference_value, score_delta in deltas:
+        key = (user_id, preference_type, preference_value)
+        summed[key] = summed.get(key, 0.0) + score_delta
+    return summed
+
+def decayed_stored_score(statement):
+    """
+    The stored score decayed to the time of the write, as profile_cache.decayed_scores would
+    read it then; `statement` is the upsert, whose excluded.last_updated is that time.
+    """
+    stored = func.coalesce(UserPreference.score, 0.0)
+    half_life_days = profile_cache.PREFERENCE_HALF_LIFE_DAYS
+    if half_life_days <= 0:
+        return stored
+    age_days = func.julianday(statement.excluded.last_updated) - func.julianday(UserPreference.last_updated)
+    # max() of SQLite is scalar with two arguments; clock skew never inflates a score.
+    return stored * func.exp2(-func.max(func.coalesce(age_days, 0.0), 0.0) / half_life_days)
+
+def preference_upsert(summed: Dict[Tuple[int, str, str], float]):
+    """
+    One INSERT ... ON CONFLICT DO UPDATE for every preference in `summed`. The increment is
+    done by the database against the unique (user_id, preference_type, preference_value)
+    index, so concurrent updates to the same preference cannot lose one another's increments.
+    The stored score is decayed to now before the delta is added, because last_updated
+    restarts the decay clock.
+    """
+    now = datetime.utcnow()
+    statement = sqlite_insert(UserPreference).values([
+        {
+            "user_id": user_id,
+            "preference_type": preference_type,
+            "preference_value": preference_value,
+            "score": score_delta,
+            "last_updated": now
+        }
+        for (user_id, preference_type, preference_value), score_delta in summed.items()
+    ])
+    return statement.on_conflict_do_update(
+        index_elements=[UserPreference.user_id, UserPreference.preference_type, UserPreference.preference_value],
+        set_={
+            "score": decayed_stored_score(statement) + statement.excluded.score,
+            "last_updated": statement.excluded.last_updated
+        }
+    )
+
+def apply_preference_deltas(db: Session, deltas: Iterable[PreferenceDelta]) -> int:
+    """Applies a batch of preference deltas in one statement without committing. Returns how many preferences it touched."""
+    summed = sum_preference_deltas(deltas) 
+    if not summed:
+        return 0
+
+    db.execute(preference_upsert(summed)) 
+    db.execute(bump_profile_version({user_id for user_id, _, _ in summed})) 
+    return len(summed)
+
 def update_user_preference_score(db: Session, user_id: int, preference_type: str, preference_value: str, score_delta: float) -> UserPreference:
-    preference_record = db.query(UserPreference).filter(
-        UserPreference.user_id==user_id, 
-        UserPreference.preference_type==preference_type, 
-        UserPreference.preference_value==preference_value
-        ).one_or_none() 
-    if preference_record:
-        preference_record.score += score_delta
-        preference_record.last_updated = datetime.utcnow() 
-    else:
-        preference_record = UserPreference(
-            user_id=user_id,
-            preference_type=preference_type, 
-            preference_value=preference_value,
-            score=score_delta,
-            last_updated=datetime.utcnow() 
-        )
-        db.add(preference_record) 
+    statement = preference_upsert({(user_id, preference_type, preference_value): score_delta}).returning(UserPreference) 
+    preference_record = db.scalars(statement, execution_options={"populate_existing": True}).one() 
+    db.execute(bump_profile_version([user_id])) 
 
     db.commit() 
-    db.refresh(preference_record) 
 
     return preference_record
-    
+
+def merge_duplicate_preferences(bind: Engine) -> None:
+    """
+    Migration for databases created before the unique preference index: folds duplicate
+    rows into the oldest one (scores summed, latest last_updated kept) so the index can be built.
+    """
+    inspector = inspect(bind)
+    if "user_preferences" not in inspector.get_table_names():
+        return
+    if any(index["name"] == "ux_user_preferences_user_type_value" for index in inspector.get_indexes("user_preferences")):
+        return
+
+    same_preference = (
+        "d.user_id IS user_preferences.user_id "
+        "AND d.preference_type IS user_preferences.preference_type "
+        "AND d.preference_value IS user_preferences.preference_value"
+    )
+    with bind.begin() as conn:
+        merged = conn.execute(text(f"""
+            UPDATE user_preferences SET
+                score = (SELECT SUM(COALESCE(d.score, 0)) FROM user_preferences d WHERE {same_preference}),
+                last_updated = (SELECT MAX(d.last_updated) FROM user_preferences d WHERE {same_preference})
+            WHERE id IN (
+                SELECT MIN(id) FROM user_preferences
+                GROUP BY user_id, preference_type, preference_value HAVING COUNT(*) > 1
+            )
+        """)).rowcount
+        removed = conn.execute(text("""
+            DELETE FROM user_preferences WHERE id NOT IN (
+                SELECT MIN(id) FROM user_preferences GROUP BY user_id, preference_type, preference_value
+            )
+        """)).rowcount
+    if removed:
+        print(f"✅Merged {removed} duplicate preference rows into {merged}")
+
+
+async def aget_user_profile(db: AsyncSession, user_id: int) -> Optional[User]:
+    # Lazy loads are not available on an AsyncSession, so preferences are loaded up front.
+    result = await db.execute(
+        select(User).options(selectinload(User.preferences)).filter(User.id == user_id)
+    )
+    return result.scalar_one_or_none()
+
+async def aupdate_user_preference_score(db: AsyncSession, user_id: int, preference_type: str, preference_value: str, score_delta: float) -> UserPreference:
+    statement = preference_upsert({(user_id, preference_type, preference_value): score_delta}).returning(UserPreference) 
+    preference_record = (await db.scalars(statement, execution_options={"populate_existing": True})).one() 
+    await db.execute(bump_profile_version([user_id])) 
+
+    await db.commit() 
+
+    return preference_record
+
+
+# Async variants for the auth endpoints: bcrypt runs in the password hashing pool
+# (core.auth), so a burst of logins does not tie up the threads serving other requests.
+
+async def aget_user_by_username(db: AsyncSession, user_name: str) -> Optional[User]:
+    result = await db.execute(select(User).filter_by(user_name=user_name))
+    return result.scalar_one_or_none()
+
+async def acreate_user(db: AsyncSession, user_data: UserRegistrationRequest) -> User:
+    user_name_check = await aget_user_by_username(db=db, user_name=user_data.user_name)
+    if user_name_check is not None:
+        raise HTTPException(status_code=400, detail="The username already exists!")
+
+    hashed_password = await aget_password_hash(user_data.password) 
+    user = User(
+        user_name=user_data.user_name,
+        user_email=user_data.user_email,
+        hashed_password=hashed_password,
+    )
+
+    db.add(user)
+    await db.commit() 
+    await db.refresh(user)
+
+    return user
+
+async def aauthenticate_user(db: AsyncSession, user_name: str, password: str) -> Optional[User]:
+    db_user = await aget_user_by_username(db, user_name=user_name)
+    if db_user is None:
+        return None
+
+    valid, new_hash = await averify_and_update_password(password, db_user.hashed_password) 
+    if not valid:
+        return None
+
+    if new_hash:
+        db_user.hashed_password = new_hash 
+        await db.commit() 
+
+    return db_user
@@ -0,0 +1,364 @@
+# In-process vector index: a memory-mapped NumPy matrix, usable wherever the Pinecone store is
+import json
+import logging
+import os
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+logging.basicConfig(
+    level=logging.INFO
+)
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.f32"
+RECORDS_FILE = "records.jsonl"
+IVF_FILE = "ivf.npz"
+IVF_VECTORS_FILE = "ivf_vectors.f32"
+
+# Rows scored per matrix-vector product in exact search; bounds the temporary score buffer.
+SEARCH_CHUNK_ROWS = 262144
+# IVF lists probed per query by default. More lists probed = better recall, slower search.
+DEFAULT_NPROBE = int(os.getenv("LOCAL_VECTOR_NPROBE", "8"))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, k)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+def _write_atomic(path: str, write) -> None:
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class NumpyVectorIndex:
+    """
+    Cosine-similarity index over unit-normalized float32 vectors stored row-major in a
+    flat file and read through np.memmap, so the OS page cache holds the hot part of the
+    matrix and start-up does not load it into memory.
+
+    Search is exact (chunked matrix-vector products) unless an IVF partitioning has been
+    built with `build_ivf`; then only the `nprobe` closest lists are scored, plus any rows
+    appended since the partitioning was built. The partitioning keeps its own copy of the
+    vectors ordered by list, so each probed list is one contiguous slice rather than a
+    gather of scattered rows (this doubles the disk footprint). Appending a record whose
+    id already exists replaces the old row in results.
+    """
+
+    def __init__(self, path: str, dim: Optional[int] = None):
+        self.path = path
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._count = 0
+        self._records_bytes = 0
+        self._records: List[Dict[str, Any]] = []
+        self._row_by_id: Dict[str, int] = {}
+        self._live = np.zeros(0, dtype=bool)
+        self._matrix: Optional[np.ndarray] = None
+        self._ivf: Optional[Dict[str, np.ndarray]] = None
+
+        self._load()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    # --- Persistence ---
+    def _load(self) -> None:
+        manifest_path = self._file(MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return
+
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        self.dim = manifest["dim"]
+        count = manifest["count"]
+
+        # The manifest is written last, so rows past its count belong to an interrupted append.
+        with open(self._file(RECORDS_FILE), "rb") as f:
+            for _ in range(count):
+                line = f.readline()
+                self._records.append(json.loads(line))
+                self._records_bytes += len(line)
+
+        self._count = count
+        self._live = np.ones(count, dtype=bool)
+        for row, record in enumerate(self._records):
+            self._supersede(record["id"], row)
+        self._map_matrix()
+
+        ivf_path = self._file(IVF_FILE)
+        if os.path.exists(ivf_path):
+            with np.load(ivf_path) as data:
+                ivf = {name: data[name] for name in data.files}
+            ivf["vectors"] = np.memmap(self._file(IVF_VECTORS_FILE), dtype=np.float32, mode="r", shape=(int(ivf["count"]), self.dim))
+            self._ivf = ivf
+
+    def _map_matrix(self) -> None:
+        if self._count:
+            self._matrix = np.memmap(self._file(VECTORS_FILE), dtype=np.float32, mode="r", shape=(self._count, self.dim))
+
+    def _supersede(self, record_id: str, row: int) -> None:
+        previous = self._row_by_id.get(record_id)
+        if previous is not None:
+            self._live[previous] = False
+        self._row_by_id[record_id] = row
+
+    def _write_manifest(self) -> None:
+        def write(tmp_path: str) -> None:
+            with open(tmp_path, "w") as f:
+                json.dump({"dim": self.dim, "count": self._count, "metric": "cosine"}, f)
+        _write_atomic(self._file(MANIFEST_FILE), write)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, vectors: np.ndarray, texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str]) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or not (len(vectors) == len(texts) == len(metadatas) == len(ids)):
+            raise ValueError("append expects one vector, text, metadata and id per record")
+        if not len(vectors):
+            return
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} does not match index dimension {self.dim}")
+
+            os.makedirs(self.path, exist_ok=True)
+            row_bytes = self.dim * np.dtype(np.float32).itemsize
+            vectors_path, records_path = self._file(VECTORS_FILE), self._file(RECORDS_FILE)
+            for file_path in (vectors_path, records_path):
+                if not os.path.exists(file_path):
+                    open(file_path, "wb").close()
+
+            with open(vectors_path, "r+b") as f:
+                f.seek(self._count * row_bytes)
+                f.write(np.ascontiguousarray(_normalize(vectors)).tobytes())
+                f.truncate()
+
+            new_records = [
+                {"id": str(record_id), "text": text, "metadata": metadata}
+                for record_id, text, metadata in zip(ids, texts, metadatas)
+            ]
+            lines = [(json.dumps(record) + "\n").encode("utf-8") for record in new_records]
+            with open(records_path, "r+b") as f:
+                f.seek(self._records_bytes)
+                f.writelines(lines)
+                f.truncate()
+
+            start = self._count
+            self._count += len(new_records)
+            self._records_bytes += sum(len(line) for line in lines)
+            self._records.extend(new_records)
+            self._live = np.concatenate([self._live, np.ones(len(new_records), dtype=bool)])
+            for offset, record in enumerate(new_records):
+                self._supersede(record["id"], start + offset)
+
+            self._write_manifest()
+            self._map_matrix()
+
+    # --- IVF partitioning ---
+    def build_ivf(self, n_lists: Optional[int] = None, iterations: int = 10, sample_size: int = 100000, seed: int = 0) -> int:
+        """
+        Clusters the vectors with spherical k-means and stores, per cluster, the rows that
+        belong to it. The centroids are seeded from the k-means sample, so there are at most
+        as many lists as sampled rows. Returns the number of lists built.
+        """
+        with self._lock:
+            matrix, count = self._matrix, self._count
+        if not count:
+            raise ValueError("Cannot partition an empty index")
+
+        sampled = max(1, min(sample_size, count))
+        n_lists = min(n_lists or max(1, int(np.sqrt(count))), sampled)
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(matrix[np.sort(rng.choice(count, size=sampled, replace=False))])
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            filled = np.bincount(assignments, minlength=n_lists) > 0
+            centroids[filled] = _normalize(sums[filled])
+
+        assignments = np.empty(count, dtype=np.int32)
+        for start in range(0, count, SEARCH_CHUNK_ROWS):
+            end = min(start + SEARCH_CHUNK_ROWS, count)
+            assignments[start:end] = np.argmax(matrix[start:end] @ centroids.T, axis=1)
+
+        order = np.argsort(assignments, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(assignments[order], np.arange(n_lists + 1)).astype(np.int64)
+        ivf = {"centroids": centroids.astype(np.float32), "order": order, "offsets": offsets, "count": np.array(count)}
+
+        def write_vectors(tmp_path: str) -> None:
+            with open(tmp_path, "wb") as f:
+                for start in range(0, count, SEARCH_CHUNK_ROWS):
+                    f.write(np.ascontiguousarray(matrix[order[start:start + SEARCH_CHUNK_ROWS]]).tobytes())
+
+        def write(tmp_path: str) -> None:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **ivf)
+
+        with self._lock:
+            self._ivf = None
+        _write_atomic(self._file(IVF_VECTORS_FILE), write_vectors)
+        _write_atomic(self._file(IVF_FILE), write)
+        ivf["vectors"] = np.memmap(self._file(IVF_VECTORS_FILE), dtype=np.float32, mode="r", shape=(count, self.dim))
+
+        with self._lock:
+            self._ivf = ivf
+        logging.info(f"✅ Built IVF partitioning with {n_lists} lists over {count} vectors.")
+        return n_lists
+
+    def drop_ivf(self) -> None:
+        with self._lock:
+            self._ivf = None
+            for name in (IVF_FILE, IVF_VECTORS_FILE):
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+
+    # --- Search ---
+    def _exact_candidates(self, matrix: np.ndarray, live: np.ndarray, query: np.ndarray, start: int, end: int, k: int):
+        rows, scores = [], []
+        for chunk_start in range(start, end, SEARCH_CHUNK_ROWS):
+            chunk_end = min(chunk_start + SEARCH_CHUNK_ROWS, end)
+            chunk_scores = matrix[chunk_start:chunk_end] @ query
+            chunk_scores[~live[chunk_start:chunk_end]] = -np.inf
+            best = _top_k(chunk_scores, k)
+            rows.append(best + chunk_start)
+            scores.append(chunk_scores[best])
+        return rows, scores
+
+    def search(self, query_vector: Iterable[float], k: int = 4, nprobe: Optional[int] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """Returns up to k (record, cosine similarity) pairs, most similar first."""
+        with self._lock:
+            matrix, count, live, records, ivf = self._matrix, self._count, self._live, self._records, self._ivf
+        if not count or k <= 0:
+            return []
+
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+        rows: List[np.ndarray] = []
+        scores: List[np.ndarray] = []
+
+        if ivf is not None and int(ivf["count"]) <= count:
+            indexed = int(ivf["count"])
+            lists = _top_k(ivf["centroids"] @ query, nprobe or DEFAULT_NPROBE)
+            slices = [slice(ivf["offsets"][l], ivf["offsets"][l + 1]) for l in lists]
+            candidates = np.concatenate([ivf["order"][s] for s in slices])
+            if len(candidates):
+                candidate_scores = np.concatenate([ivf["vectors"][s] @ query for s in slices])
+                candidate_scores[~live[candidates]] = -np.inf
+                best = _top_k(candidate_scores, k)
+                rows.append(candidates[best])
+                scores.append(candidate_scores[best])
+            # Rows appended after the partitioning was built are scored exactly.
+            tail_rows, tail_scores = self._exact_candidates(matrix, live, query, indexed, count, k)
+        else:
+            tail_rows, tail_scores = self._exact_candidates(matrix, live, query, 0, count, k)
+        rows += tail_rows
+        scores += tail_scores
+
+        if not rows:
+            return []
+        all_rows, all_scores = np.concatenate(rows), np.concatenate(scores)
+        best = [i for i in _top_k(all_scores, k) if np.isfinite(all_scores[i])]
+        return [(records[int(all_rows[i])], float(all_scores[i])) for i in best]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "vectors": self._count,
+                "live_vectors": int(self._live.sum()),
+                "dim": self.dim,
+                "ivf_lists": int(len(self._ivf["centroids"])) if self._ivf is not None else 0,
+                "ivf_indexed": int(self._ivf["count"]) if self._ivf is not None else 0,
+            }
+
+
+class LocalVectorStore(VectorStore):
+    """LangChain VectorStore over a NumpyVectorIndex, so `as_retriever` works as it does for Pinecone."""
+
+    def __init__(self, embedding: Embeddings, path: str, nprobe: Optional[int] = None):
+        self.embedding = embedding
+        self.index = NumpyVectorIndex(path)
+        self.nprobe = nprobe
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def add_texts(
+            self,
+            texts: Iterable[str],
+            metadatas: Optional[List[dict]] = None,
+            *,
+            ids: Optional[List[str]] = None,
+            **kwargs: Any
+    ) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = [str(i) for i in ids] if ids else [uuid.uuid4().hex for _ in texts]
+        self.index.append(np.asarray(self.embedding.embed_documents(texts), dtype=np.float32), texts, metadatas, ids)
+        return ids
+
+    def _to_documents(self, results: List[Tuple[Dict[str, Any], float]]) -> List[Tuple[Document, float]]:
+        return [
+            (Document(id=record["id"], page_content=record["text"], metadata=record["metadata"]), score)
+            for record, score in results
+        ]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self._to_documents(self.index.search(embedding, k, nprobe=kwargs.get("nprobe", self.nprobe)))
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        # Only the embedding call does I/O; the search itself is in-process.
+        return self.similarity_search_with_score_by_vector(await self.embedding.aembed_query(query), k, **kwargs)
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in await self.asimilarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are cosine similarities in [-1, 1]; map them onto [0, 1].
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(
+            cls,
+            texts: List[str],
+            embedding: Embeddings,
+            metadatas: Optional[List[dict]] = None,
+            *,
+            ids: Optional[List[str]] = None,
+            path: str = "data/vector_index",
+            **kwargs: Any
+    ) -> "LocalVectorStore":
+        store = cls(embedding, path, nprobe=kwargs.get("nprobe"))
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
@@ -0,0 +1,296 @@
+# Write-behind persistence: chat turns and preference updates are queued and committed in batches off the request path
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from ..models.database_models import SessionSummaryInDB as SessionSummaryORM
+from ..models.pydantic_models import RetrievedShow
+from . import history_manager, user_manager
+from .database import SessionLocal
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO
+)
+
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() in ("1", "true", "yes")
+# Writes waiting beyond this many are done synchronously by the request instead.
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "1000"))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "100"))
+# How long the worker waits for more writes to join a batch once it has the first one.
+WRITE_BEHIND_BATCH_WAIT_SECONDS = float(os.getenv("WRITE_BEHIND_BATCH_WAIT_SECONDS", "0.05"))
+WRITE_BEHIND_SHUTDOWN_TIMEOUT = float(os.getenv("WRITE_BEHIND_SHUTDOWN_TIMEOUT", "10"))
+
+
+class PendingInteraction(NamedTuple):
+    user_id: int
+    session_id: str
+    user_message: str
+    ai_response: str
+    recommended_shows: List[RetrievedShow]
+    context_summary: Optional[str]
+    intent_type: Optional[str]
+    intent_source: Optional[str]
+    # Written as the row's timestamp, which is also how readers tell a committed turn from a pending one.
+    timestamp: datetime
+    enqueued_at: float
+
+
+class PendingPreference(NamedTuple):
+    user_id: int
+    preference_type: str
+    preference_value: str
+    score_delta: float
+    enqueued_at: float
+
+
+_STOP = object()
+
+_queue: "queue.Queue[Any]" = queue.Queue(maxsize=WRITE_BEHIND_MAX_QUEUE)
+_worker: Optional[threading.Thread] = None
+_accepting = False
+
+# Queued writes, kept readable until their batch commits.
+_pending_lock = threading.Lock()
+_pending_interactions: Dict[Tuple[int, str], List[PendingInteraction]] = {}
+_pending_preferences: Dict[int, List[PendingPreference]] = {}
+
+_stats_lock = threading.Lock()
+_stats = {
+    "enqueued": 0, "written": 0, "failed": 0, "batches": 0, "sync_fallbacks": 0,
+    "last_batch_size": 0, "last_lag_seconds": 0.0, "max_lag_seconds": 0.0,
+}
+
+
+def _count(key: str, amount: int = 1) -> None:
+    with _stats_lock:
+        _stats[key] += amount
+
+
+# --- Producers (request path) ---
+
+def _enqueue(item) -> bool:
+    """Returns False when the caller has to write synchronously: disabled, not running or full."""
+    if not _accepting:
+        return False
+    try:
+        _queue.put_nowait(item)
+    except queue.Full:
+        _count("sync_fallbacks")
+        logging.warning("⚠️ Write-behind queue full; writing synchronously.")
+        return False
+    _count("enqueued")
+    return True
+
+
+def enqueue_interaction(
+        user_id: int,
+        session_id: str,
+        user_message: str,
+        ai_response: str,
+        recommended_shows: List[RetrievedShow],
+        context_summary: Optional[str] = None,
+        intent_type: Optional[str] = None,
+        intent_source: Optional[str] = None
+) -> bool:
+    item = PendingInteraction(
+        user_id, session_id, user_message, ai_response, list(recommended_shows),
+        context_summary, intent_type, intent_source, datetime.utcnow(), time.monotonic()
+    )
+    # Registered before it is queued, so the worker can never commit it before it is readable here.
+    with _pending_lock:
+        _pending_interactions.setdefault((user_id, session_id), []).append(item)
+    if _enqueue(item):
+        return True
+    _forget([item])
+    return False
+
+
+def enqueue_preference(user_id: int, preference_type: str, preference_value: str, score_delta: float) -> bool:
+    item = PendingPreference(user_id, preference_type, preference_value, score_delta, time.monotonic())
+    with _pending_lock:
+        _pending_preferences.setdefault(user_id, []).append(item)
+    if _enqueue(item):
+        return True
+    _forget([item])
+    return False
+
+
+def pending_interactions(user_id: int, session_id: str) -> List[PendingInteraction]:
+    with _pending_lock:
+        return list(_pending_interactions.get((user_id, session_id), []))
+
+
+def pending_user_interactions(user_id: int) -> List[PendingInteraction]:
+    """Every queued turn of the user's, across sessions."""
+    with _pending_lock:
+        return [item for (owner, _), items in _pending_interactions.items() if owner == user_id for item in items]
+
+
+def pending_preferences(user_id: int) -> List[PendingPreference]:
+    with _pending_lock:
+        return list(_pending_preferences.get(user_id, []))
+
+
+def _forget(items: List[Any]) -> None:
+    with _pending_lock:
+        for item in items:
+            if isinstance(item, PendingInteraction):
+                key, registry = (item.user_id, item.session_id), _pending_interactions
+            else:
+                key, registry = item.user_id, _pending_preferences
+            entries = registry.get(key, [])
+            if item in entries:
+                entries.remove(item)
+            if not entries:
+                registry.pop(key, None)
+
+
+# --- Worker ---
+
+def _apply(db, items: List[Any]) -> None:
+    summaries: Dict[Tuple[int, str], SessionSummaryORM] = {}
+    preference_deltas: List[user_manager.PreferenceDelta] = []
+
+    for item in items:
+        if isinstance(item, PendingInteraction):
+            db.add(history_manager.build_interaction(
+                item.user_id, item.session_id, item.user_message, item.ai_response, item.recommended_shows,
+                item.intent_type, item.intent_source, timestamp=item.timestamp
+            ))
+            # autoflush is off, so rows added earlier in this batch are not visible to db.get.
+            key = (item.user_id, item.session_id)
+            summary_row = summaries.get(key) or db.get(SessionSummaryORM, key)
+            summaries[key] = history_manager.apply_session_summary(
+                summary_row, item.user_id, item.session_id, item.context_summary, item.recommended_shows, item.timestamp
+            )
+            db.add(summaries[key])
+        else:
+            preference_deltas.append((item.user_id, item.preference_type, item.preference_value, item.score_delta))
+
+    # The whole batch's preference updates go out as a single upsert.
+    user_manager.apply_preference_deltas(db, preference_deltas)
+
+
+def _write_batch(items: List[Any]) -> None:
+    db = SessionLocal()
+    error = None
+    try:
+        _apply(db, items)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        error = e
+    finally:
+        db.close()
+
+    if error is not None and len(items) > 1:
+        # One bad write should not take the rest of its batch down with it.
+        logging.warning(f"⚠️ Write-behind batch of {len(items)} failed ({error}); retrying one at a time.")
+        for item in items:
+            _write_batch([item])
+        return
+    if error is not None:
+        logging.error(f"❌ Write-behind failed to persist {type(items[0]).__name__}: {error}")
+
+    _forget(items)
+    lag = max(time.monotonic() - item.enqueued_at for item in items)
+    with _stats_lock:
+        if error is not None:
+            _stats["failed"] += len(items)
+            return
+        _stats["written"] += len(items)
+        _stats["batches"] += 1
+        _stats["last_batch_size"] = len(items)
+        _stats["last_lag_seconds"] = lag
+        _stats["max_lag_seconds"] = max(_stats["max_lag_seconds"], lag)
+
+
+def _next_batch() -> Tuple[List[Any], bool]:
+    """Blocks for the first write, then gathers more for up to the batch wait. Returns (batch, stop)."""
+    first = _queue.get()
+    if first is _STOP:
+        return [], True
+
+    batch = [first]
+    deadline = time.monotonic() + WRITE_BEHIND_BATCH_WAIT_SECONDS
+    while len(batch) < WRITE_BEHIND_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        try:
+            item = _queue.get(timeout=remaining) if remaining > 0 else _queue.get_nowait()
+        except queue.Empty:
+            break
+        if item is _STOP:
+            return batch, True
+        batch.append(item)
+    return batch, False
+
+
+def _run() -> None:
+    stop = False
+    while not stop:
+        batch, stop = _next_batch()
+        if batch:
+            _write_batch(batch)
+
+    # Flush whatever was queued before the stop signal.
+    remaining = []
+    while True:
+        try:
+            item = _queue.get_nowait()
+        except queue.Empty:
+            break
+        if item is not _STOP:
+            remaining.append(item)
+    for start in range(0, len(remaining), WRITE_BEHIND_BATCH_SIZE):
+        _write_batch(remaining[start:start + WRITE_BEHIND_BATCH_SIZE])
+
+
+def start_worker() -> None:
+    global _worker, _accepting
+    if not WRITE_BEHIND_ENABLED or (_worker is not None and _worker.is_alive()):
+        return
+    _worker = threading.Thread(target=_run, name="write-behind", daemon=True)
+    _worker.start()
+    _accepting = True
+    logging.info("✅ Write-behind worker started.")
+
+
+def stop_worker(timeout: float = WRITE_BEHIND_SHUTDOWN_TIMEOUT) -> None:
+    """Stops accepting writes and waits for the queued ones to be committed."""
+    global _worker, _accepting
+    _accepting = False
+    if _worker is None:
+        return
+    _queue.put(_STOP)
+    _worker.join(timeout)
+    if _worker.is_alive():
+        logging.error(f"❌ Write-behind worker did not finish within {timeout}s; {_queue.qsize()} writes left unflushed.")
+    else:
+        logging.info("✅ Write-behind queue flushed.")
+    _worker = None
+
+
+def get_stats() -> Dict[str, Any]:
+    with _pending_lock:
+        pending = [item for items in _pending_interactions.values() for item in items]
+        pending += [item for items in _pending_preferences.values() for item in items]
+    oldest = min((item.enqueued_at for item in pending), default=None)
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update({
+        "enabled": WRITE_BEHIND_ENABLED,
+        "running": _accepting,
+        "queue_depth": _queue.qsize(),
+        "queue_capacity": WRITE_BEHIND_MAX_QUEUE,
+        "pending": len(pending),
+        "oldest_pending_seconds": time.monotonic() - oldest if oldest is not None else 0.0,
+    })
+    return stats
@@ -0,0 +1,109 @@
+# Concurrent read/write throughput of the SQLite engine, before and after the production pragmas
+# Usage (from Backend/): python -m scripts.benchmark_database [--seconds 5] [--readers 8] [--writers 2]
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.services.database import create_db_engine, SQLITE_PRAGMAS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS interaction_history (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER,
+    user_message TEXT,
+    ai_response TEXT,
+    session_id VARCHAR,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+def baseline_engine(url: str):
+    # The configuration database.py used before: default journaling and pool, no pragmas.
+    return create_engine(url, connect_args={"check_same_thread": False})
+
+
+def tuned_engine(url: str):
+    return create_db_engine(url, echo=False, pragmas=SQLITE_PRAGMAS)
+
+
+def run(engine, seconds: float, readers: int, writers: int) -> Dict[str, float]:
+    with engine.begin() as conn:
+        conn.execute(text(SCHEMA))
+        conn.execute(text("DELETE FROM interaction_history"))
+        for i in range(2000):
+            conn.execute(
+                text("INSERT INTO interaction_history (user_id, user_message, ai_response, session_id) VALUES (:u, :m, :r, :s)"),
+                {"u": i % 50, "m": "hello " * 20, "r": "response " * 100, "s": f"session-{i % 200}"}
+            )
+
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def reader():
+        while time.monotonic() < deadline:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(
+                        text("SELECT * FROM interaction_history WHERE user_id = :u AND session_id = :s ORDER BY timestamp DESC LIMIT 10"),
+                        {"u": random.randrange(50), "s": f"session-{random.randrange(200)}"}
+                    ).all()
+                with lock:
+                    counts["reads"] += 1
+            except OperationalError:
+                with lock:
+                    counts["errors"] += 1
+
+    def writer():
+        while time.monotonic() < deadline:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(
+                        text("INSERT INTO interaction_history (user_id, user_message, ai_response, session_id) VALUES (:u, :m, :r, :s)"),
+                        {"u": random.randrange(50), "m": "hi", "r": "response " * 100, "s": f"session-{random.randrange(200)}"}
+                    )
+                with lock:
+                    counts["writes"] += 1
+            except OperationalError:
+                with lock:
+                    counts["errors"] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    return {
+        "reads/s": counts["reads"] / seconds,
+        "writes/s": counts["writes"] / seconds,
+        "errors": counts["errors"]
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SQLite concurrency benchmark")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"\n--- SQLite concurrency benchmark ({args.readers} readers, {args.writers} writers, {args.seconds:.0f}s) ---\n")
+    for label, factory in [("before (default)", baseline_engine), ("after (WAL + pragmas)", tuned_engine)]:
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            result = run(factory(url), args.seconds, args.readers, args.writers)
+        print(f"{label:<24} reads/s: {result['reads/s']:>9.0f}   writes/s: {result['writes/s']:>7.0f}   errors: {result['errors']}")
+
+
+if __name__ == "__main__":
+    main()
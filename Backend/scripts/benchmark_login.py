@@ -0,0 +1,80 @@
+# Login throughput under concurrency: bcrypt inline on the thread pool (the old sync endpoints)
+# versus the dedicated password hashing process pool, and what each does to other requests
+# Usage (from Backend/): BCRYPT_ROUNDS=12 python -m scripts.benchmark_login [--logins 64] [--concurrency 16]
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+from app.core import auth
+
+
+async def probe_thread_pool(stop: asyncio.Event, latencies: List[float], interval: float = 0.01) -> None:
+    """Round trips of a no-op through the thread pool, which sync endpoints and dependencies (get_db) share."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.to_thread(lambda: None)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+
+
+async def run(mode: str, hashed: str, logins: int, concurrency: int) -> Dict[str, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    rejected = 0
+
+    async def login() -> None:
+        nonlocal rejected
+        async with semaphore:
+            if mode == "inline":
+                await asyncio.to_thread(auth.verify_password, "benchmark-password", hashed)
+                return
+            try:
+                await auth.averify_and_update_password("benchmark-password", hashed)
+            except auth.PasswordHashingBusy:
+                rejected += 1
+
+    stop = asyncio.Event()
+    probe_latencies: List[float] = []
+    probe = asyncio.create_task(probe_thread_pool(stop, probe_latencies))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe
+
+    probe_latencies.sort()
+    return {
+        "logins_per_s": (logins - rejected) / elapsed,
+        "rejected": rejected,
+        "probe_p50_ms": statistics.median(probe_latencies) * 1000 if probe_latencies else 0.0,
+        "probe_p99_ms": probe_latencies[int(len(probe_latencies) * 0.99)] * 1000 if probe_latencies else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Login (bcrypt) throughput benchmark")
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    hashed = auth.get_password_hash("benchmark-password")
+    print(f"bcrypt rounds={auth.BCRYPT_ROUNDS}, logins={args.logins}, concurrency={args.concurrency}, "
+          f"pool workers={auth.PASSWORD_HASH_WORKERS}, max pending={auth.PASSWORD_HASH_MAX_PENDING}")
+
+    auth.start_hash_pool()
+    try:
+        for mode in ("inline", "pool"):
+            result = asyncio.run(run(mode, hashed, args.logins, args.concurrency))
+            print(
+                f"{mode:>7}: {result['logins_per_s']:7.1f} logins/s  rejected={result['rejected']:<4} "
+                f"thread pool probe p50={result['probe_p50_ms']:7.2f} ms  p99={result['probe_p99_ms']:7.2f} ms"
+            )
+    finally:
+        auth.shutdown_hash_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import os 
+import argparse 
 from dotenv import load_dotenv 
-from typing import List 
+from typing import List, Optional 
 
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_pinecone import PineconeVectorStore
@@ -8,6 +9,7 @@ from langchain_core.documents import Document
 from pinecone import Pinecone, ServerlessSpec 
 
 from .initial_data import MOCK_MOVIE_DATA 
+from app.services.vector_store import LocalVectorStore 
 
 load_dotenv() 
 
@@ -17,6 +19,7 @@ PINECONE_API_KEY=os.getenv("PINECONE_API_KEY")
 EMBEDDING_MODEL_NAME = "text-embedding-004" 
 INDEX_NAME = "cinepal-recommendations"
 EMBEDDING_DIMENSION = 768
+LOCAL_VECTOR_STORE_PATH = os.getenv("LOCAL_VECTOR_STORE_PATH", "data/vector_index") 
 
 def get_pinecone_index(pinecone_client: Pinecone):
     existing_indexes = [idx.name for idx in pinecone_client.list_indexes()]
@@ -38,13 +41,7 @@ def get_pinecone_index(pinecone_client: Pinecone):
 
     return pinecone_client.Index(INDEX_NAME) 
 
-def populate_pinecone() -> None:
-    print("\n--- 🚀 Starting Pinecone Population ---\n") 
-
-    if not all([PINECONE_API_KEY, GEMINI_API_KEY]):
-        print("❌ ERROR: Missing one or more environment variables (PINECONE_API_KEY, GEMINI_API_KEY).") 
-        return 
-    
+def load_embeddings() -> Optional[GoogleGenerativeAIEmbeddings]:
     print(f"Loading Google Embeddings via API (Model: {EMBEDDING_MODEL_NAME})...") 
     try: 
         embeddings = GoogleGenerativeAIEmbeddings(
@@ -52,11 +49,13 @@ def populate_pinecone() -> None:
             google_api_key=GEMINI_API_KEY
         )
         print("✅ Google Embeddings Client loaded successfully.") 
+        return embeddings 
 
     except Exception as e:
         print(f"❌ Error loading Google Embeddings client: {e}") 
-        return 
-    
+        return None 
+
+def build_documents() -> List[Document]:
     documents: List[Document] = [] 
     for data in MOCK_MOVIE_DATA:
         content = (
@@ -71,6 +70,20 @@ def populate_pinecone() -> None:
             "last_updated": data["last_updated"]             
         }
         documents.append(Document(page_content=content, metadata=metadata)) 
+    return documents 
+
+def populate_pinecone() -> None:
+    print("\n--- 🚀 Starting Pinecone Population ---\n") 
+
+    if not all([PINECONE_API_KEY, GEMINI_API_KEY]):
+        print("❌ ERROR: Missing one or more environment variables (PINECONE_API_KEY, GEMINI_API_KEY).") 
+        return 
+    
+    embeddings = load_embeddings() 
+    if embeddings is None:
+        return 
+    
+    documents = build_documents() 
 
     print("Initializing Pinecone client...") 
     pinecone_client = Pinecone(api_key=PINECONE_API_KEY) 
@@ -89,5 +102,39 @@ def populate_pinecone() -> None:
     print(f"🔍 Pinecone index '{INDEX_NAME}' populated with {len(documents)} documents.") 
     print(f"✅ Vector store is ready for the RAG pipeline.") 
 
+def populate_local(path: str = LOCAL_VECTOR_STORE_PATH, ivf_lists: int = 0) -> None:
+    print("\n--- 🚀 Starting Local Vector Index Population ---\n") 
+
+    if not GEMINI_API_KEY:
+        print("❌ ERROR: Missing environment variable GEMINI_API_KEY.") 
+        return 
+    
+    embeddings = load_embeddings() 
+    if embeddings is None:
+        return 
+    
+    documents = build_documents() 
+
+    print(f"Embedding and appending {len(documents)} documents to the local index at '{path}'...") 
+    vectorstore = LocalVectorStore(embeddings, path) 
+    # Titles as ids: re-running the script replaces documents instead of duplicating them.
+    vectorstore.add_documents(documents, ids=[doc.metadata["title"] for doc in documents]) 
+
+    if ivf_lists:
+        vectorstore.index.build_ivf(n_lists=ivf_lists) 
+
+    print(f"\n--- Success! ---") 
+    print(f"🔍 Local index at '{path}' holds {len(vectorstore.index)} vectors.") 
+    print(f"✅ Set VECTOR_STORE_BACKEND=local to serve retrieval from it.") 
+
 if __name__ == "__main__":
-    populate_pinecone() 
+    parser = argparse.ArgumentParser(description="Embed the seed catalog into a vector store") 
+    parser.add_argument("--backend", choices=["pinecone", "local"], default="pinecone") 
+    parser.add_argument("--path", default=LOCAL_VECTOR_STORE_PATH, help="local index directory") 
+    parser.add_argument("--ivf-lists", type=int, default=0, help="partition the local index into this many IVF lists (0 = exact search)") 
+    args = parser.parse_args() 
+
+    if args.backend == "local":
+        populate_local(args.path, args.ivf_lists) 
+    else:
+        populate_pinecone() 
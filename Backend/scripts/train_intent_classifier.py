@@ -0,0 +1,86 @@
+# Trains the local intent classifier on intents logged in interaction_history
+# Usage (from Backend/): python -m scripts.train_intent_classifier [--holdout 0.2] [--output data/intent_classifier.npz]
+import argparse 
+from datetime import datetime 
+from typing import List, Tuple 
+
+import numpy as np 
+from sqlalchemy import select 
+
+from app.services.database import SessionLocal, create_all_tables 
+from app.models.database_models import InteractionHistoryInDB 
+from app.chains.intent_classifier import (
+    CLASSES,
+    INTENT_CLASSIFIER_PATH,
+    INTENT_MODEL_MIN_CONFIDENCE,
+    SOURCE_LLM,
+    SOURCE_RULES,
+    train_linear_model
+) 
+
+MIN_EXAMPLES = 50 
+
+
+def load_examples() -> List[Tuple[str, str]]:
+    # Labels come from the LLM parser and the rules only; the model's own answers would just reinforce its mistakes.
+    db = SessionLocal() 
+    try:
+        rows = db.execute(
+            select(InteractionHistoryInDB.user_message, InteractionHistoryInDB.intent_type)
+            .filter(InteractionHistoryInDB.intent_type.in_(CLASSES))
+            .filter(InteractionHistoryInDB.intent_source.in_([SOURCE_LLM, SOURCE_RULES]))
+            .filter(InteractionHistoryInDB.user_message.isnot(None))
+        ).all() 
+    finally:
+        db.close() 
+    return [(message, label) for message, label in rows if message.strip()] 
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the local intent classifier") 
+    parser.add_argument("--holdout", type=float, default=0.2, help="share of examples kept for evaluation") 
+    parser.add_argument("--epochs", type=int, default=30) 
+    parser.add_argument("--output", default=INTENT_CLASSIFIER_PATH) 
+    parser.add_argument("--seed", type=int, default=0) 
+    args = parser.parse_args() 
+
+    print("\n--- 🚀 Training intent classifier ---\n") 
+    create_all_tables() 
+    examples = load_examples() 
+    if len(examples) < MIN_EXAMPLES:
+        print(f"❌ Only {len(examples)} labelled interactions; at least {MIN_EXAMPLES} are needed.") 
+        return 
+
+    rng = np.random.default_rng(args.seed) 
+    order = rng.permutation(len(examples)) 
+    n_holdout = max(1, int(len(examples) * args.holdout)) 
+    holdout = [examples[i] for i in order[:n_holdout]] 
+    train = [examples[i] for i in order[n_holdout:]] 
+
+    model = train_linear_model([t for t, _ in train], [l for _, l in train], epochs=args.epochs, seed=args.seed) 
+
+    predictions = [model.predict(text) for text, _ in holdout] 
+    correct = [label == predicted for (_, label), (predicted, _) in zip(holdout, predictions)] 
+    confident = [confidence >= INTENT_MODEL_MIN_CONFIDENCE for _, confidence in predictions] 
+    accuracy = float(np.mean(correct)) 
+    coverage = float(np.mean(confident)) 
+    confident_accuracy = float(np.mean([c for c, ok in zip(correct, confident) if ok])) if any(confident) else 0.0 
+
+    model.metadata = {
+        "trained_at": datetime.utcnow().isoformat(),
+        "train_examples": len(train),
+        "holdout_examples": len(holdout),
+        "holdout_accuracy": accuracy,
+        "holdout_confident_coverage": coverage,
+        "holdout_confident_accuracy": confident_accuracy
+    } 
+    model.save(args.output) 
+
+    print(f"Trained on {len(train)} examples, evaluated on {len(holdout)}.") 
+    print(f"Holdout accuracy: {accuracy:.3f}") 
+    print(f"Answered locally at confidence >= {INTENT_MODEL_MIN_CONFIDENCE}: {coverage:.1%} of holdout, {confident_accuracy:.3f} accurate") 
+    print(f"✅ Saved to '{args.output}'. Restart the API to load it.") 
+
+
+if __name__ == "__main__":
+    main() 
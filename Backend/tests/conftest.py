@@ -0,0 +1,68 @@
+import asyncio
+import os
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+# Keep imports of the app offline and quiet: no model downloads, a JWT key for app.core.auth.
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+from app.services.database import Base, create_db_engine, create_async_db_engine  # noqa: E402
+from app.models import database_models  # noqa: E402,F401  (registers the tables on Base)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """A fresh file-backed SQLite database with every table, per test."""
+    test_engine = create_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=test_engine)
+    yield test_engine
+    test_engine.dispose()
+
+
+@pytest.fixture
+def run_async(engine):
+    """Runs `coroutine_fn(async_db)` against the same database as `db`, on a fresh event loop."""
+    url = str(engine.url).replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+    def run(coroutine_fn):
+        async def main():
+            async_engine = create_async_db_engine(url)
+            try:
+                async with async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)() as async_db:
+                    return await coroutine_fn(async_db)
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user(db):
+    db_user = database_models.User(user_name="tester", user_email="tester@example.com", hashed_password="x")
+    db.add(db_user)
+    db.commit()
+    return db_user
+
+
+@pytest.fixture
+def other_user(db):
+    db_user = database_models.User(user_name="other", user_email="other@example.com", hashed_password="x")
+    db.add(db_user)
+    db.commit()
+    return db_user
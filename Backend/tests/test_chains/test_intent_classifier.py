@@ -0,0 +1,70 @@
+import pytest
+
+from app.chains import intent_classifier
+from app.chains.intent_classifier import SOURCE_RULES, classify_by_rules, classify_locally
+from app.models.pydantic_models import IntentType
+
+
+@pytest.mark.parametrize("text", ["hi", "Hello there!", "thank you so much", "what can you do?"])
+def test_small_talk_is_chat(text):
+    local = classify_by_rules(text)
+    assert local.intent.intent_type == IntentType.CHAT
+    assert (local.source, local.confidence) == (SOURCE_RULES, 1.0)
+
+
+@pytest.mark.parametrize("text, genre", [
+    ("I love horror movies", "horror"),
+    ("i really enjoy westerns", "westerns"),
+    ("I'm into anime", None),  # not a form the rule reads
+])
+def test_liked_genre_is_a_profile_update(text, genre):
+    local = classify_by_rules(text)
+    if genre is None:
+        assert local is None
+        return
+    assert local.intent.intent_type == IntentType.PROFILE_UPDATE
+    assert (local.intent.preference_type, local.intent.preference_value) == ("genre", genre)
+
+
+@pytest.mark.parametrize("text, query", [
+    ("Could you recommend a thrilling sci-fi movie?", "thrilling sci-fi"),
+    ("In the mood for something funny tonight", "funny"),
+    ("show me some dark thrillers", "dark thrillers"),
+])
+def test_recommendation_with_taste_terms(text, query):
+    local = classify_by_rules(text)
+    assert local.intent.intent_type == IntentType.RECOMMENDATION
+    assert local.intent.search_query == query
+
+
+@pytest.mark.parametrize("text", [
+    "recommend something",  # no genre or mood to search for
+    "what is the plot of Dark?",
+])
+def test_unclear_messages_go_to_the_llm(text):
+    assert classify_by_rules(text) is None
+
+
+@pytest.mark.parametrize("text", [
+    "please don't recommend horror",
+    "Please don’t recommend horror",
+    "recommend a comedy but not a romantic one",
+    "suggest something funny, no horror",
+    "give me a thriller without gore",
+    "recommend any drama except war dramas",
+    "show me a comedy instead of a drama",
+    "I want a movie that isn't scary",
+    "I don't like horror movies",
+])
+def test_negated_messages_go_to_the_llm(text):
+    assert classify_by_rules(text) is None
+
+
+def test_negation_also_bypasses_a_confident_model(monkeypatch):
+    class AlwaysRecommend:
+        def predict(self, text):
+            return IntentType.RECOMMENDATION.value, 0.99
+
+    monkeypatch.setattr(intent_classifier, "get_model", lambda: AlwaysRecommend())
+    assert classify_locally("I'd rather not watch anything scary") is None
+    assert classify_locally("anything scary").intent.search_query == "anything scary"
@@ -0,0 +1,11 @@
+from app.chains import main_chain
+from app.services import profile_cache, write_behind
+
+
+def test_profile_reads_pending_preferences_before_the_snapshot(monkeypatch):
+    calls = []
+    monkeypatch.setattr(write_behind, "pending_preferences", lambda user_id: calls.append("pending") or [])
+    monkeypatch.setattr(profile_cache, "get_profile_snapshot", lambda db, user_id: calls.append("snapshot") or None)
+
+    assert main_chain.format_user_profile_for_llm(db=None, user_id=1) == "No user profile found."
+    assert calls == ["pending", "snapshot"]
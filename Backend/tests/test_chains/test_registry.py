@@ -0,0 +1,78 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.chains import registry as registry_module
+from app.chains.registry import ChainRegistry, ChainUnavailable, STATUS_FAILED, STATUS_READY
+
+
+@pytest.fixture
+def assembled(monkeypatch):
+    """Stands in for the real assembly so the registry can be driven with fake components."""
+    monkeypatch.setattr(registry_module, "build_movie_assistant_chain", lambda **built: ("chain", dict(built)))
+    monkeypatch.setattr(registry_module, "build_movie_assistant_stages", lambda **built: [("stage", dict(built))])
+
+
+def make_registry(factory):
+    return ChainRegistry({"component": (factory, lambda: ())})
+
+
+def test_aget_chain_returns_503_state_without_rebuilding_on_the_loop(assembled, monkeypatch):
+    calls = []
+
+    def failing_factory():
+        calls.append(threading.current_thread())
+        raise RuntimeError("provider down")
+
+    chains = make_registry(failing_factory)
+    with pytest.raises(RuntimeError):
+        chains.refresh()  # the startup build
+    assert chains.status()["status"] == STATUS_FAILED
+
+    with pytest.raises(ChainUnavailable):
+        asyncio.run(chains.aget_chain())
+    assert len(calls) == 1  # within the check interval: no rebuild at all
+
+
+def test_failed_chain_is_rebuilt_in_the_background(assembled, monkeypatch):
+    monkeypatch.setattr(registry_module, "CONFIG_CHECK_INTERVAL", 0.0)
+    build_threads = []
+    provider_up = threading.Event()
+
+    def flaky_factory():
+        build_threads.append(threading.current_thread())
+        # The startup build fails at once; the background rebuild waits for the provider.
+        if len(build_threads) == 1 or not provider_up.wait(timeout=5):
+            raise RuntimeError("provider down")
+        return "component"
+
+    chains = make_registry(flaky_factory)
+    with pytest.raises(RuntimeError):
+        chains.refresh()
+
+    async def request():
+        loop_thread = threading.current_thread()
+        # The rebuild is scheduled, but this request is answered (503) without waiting for it.
+        with pytest.raises(ChainUnavailable):
+            await chains.aget_chain()
+        provider_up.set()
+        await chains._background_refresh
+        return loop_thread, await chains.aget_chain()
+
+    loop_thread, chain = asyncio.run(request())
+    assert chain == ("chain", {"component": "component"})
+    assert chains.status()["status"] == STATUS_READY
+    assert len(build_threads) == 2 and build_threads[1] is not loop_thread
+
+
+def test_first_build_runs_off_the_loop(assembled):
+    build_threads = []
+    chains = make_registry(lambda: build_threads.append(threading.current_thread()) or "component")
+
+    async def request():
+        return threading.current_thread(), await chains.aget_stages()
+
+    loop_thread, stages = asyncio.run(request())
+    assert stages == [("stage", {"component": "component"})]
+    assert build_threads[0] is not loop_thread
@@ -0,0 +1,46 @@
+import asyncio
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from app.chains import show_retriever
+from app.services import show_manager
+from app.services.vector_store import LocalVectorStore
+
+VECTORS = {
+    "space opera": [1.0, 0.0, 0.0],
+    "courtroom drama": [0.0, 1.0, 0.0],
+    "sci-fi": [0.9, 0.1, 0.0],
+}
+
+
+class TableEmbeddings(Embeddings):
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [VECTORS[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return VECTORS[text]
+
+
+def make_store(tmp_path) -> LocalVectorStore:
+    store = LocalVectorStore(TableEmbeddings(), str(tmp_path / "index"))
+    store.add_texts(
+        ["space opera", "courtroom drama"],
+        metadatas=[{"show_id": 11, "title": "The Expanse"}, {"show_id": 12, "title": "Suits"}]
+    )
+    return store
+
+
+def test_scored_search_carries_similarity_into_retrieved_shows(tmp_path):
+    search = show_retriever.get_scored_search(make_store(tmp_path)) | show_manager.to_retrieved_shows
+
+    shows = search.invoke("sci-fi")
+
+    assert [show.title for show in shows] == ["The Expanse", "Suits"]
+    assert all(show.score is not None for show in shows)
+    assert shows[0].score > shows[1].score
+    assert asyncio.run(search.ainvoke("sci-fi")) == shows
+
+
+def test_scored_search_without_query_returns_nothing(tmp_path):
+    assert show_retriever.get_scored_search(make_store(tmp_path)).invoke("") == []
@@ -0,0 +1,200 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app.models.database_models import SessionSummaryInDB
+from app.services import history_manager
+
+
+def store_turn(db, user_id, session_id, message, timestamp):
+    db.add(history_manager.build_interaction(user_id, session_id, message, "ok", [], timestamp=timestamp))
+    summary_row = db.get(SessionSummaryInDB, (user_id, session_id))
+    db.add(history_manager.apply_session_summary(summary_row, user_id, session_id, None, [], timestamp))
+    db.commit()
+
+
+def test_users_sharing_a_session_id_keep_separate_summaries(db, user, other_user, run_async):
+    history_manager.save_interaction(db, user.id, "shared", "hi", "hello", [], context_summary="Alice likes noir.")
+    run_async(lambda adb: history_manager.asave_interaction(adb, other_user.id, "shared", "hi", "hello", [], context_summary="Bob likes westerns."))
+    history_manager.save_interaction(db, user.id, "shared", "more", "sure", [], context_summary="Alice likes noir and heists.")
+
+    db.expire_all()
+    assert db.get(SessionSummaryInDB, (user.id, "shared")).turn_count == 2
+    assert db.get(SessionSummaryInDB, (other_user.id, "shared")).turn_count == 1
+
+    alice = history_manager.get_chat_history(db, user.id, "shared")
+    bob = run_async(lambda adb: history_manager.aget_chat_history(adb, other_user.id, "shared"))
+    assert "Alice likes noir and heists." in alice and "Bob" not in alice
+    assert "Bob likes westerns." in bob and "Alice" not in bob
+
+
+def test_rekey_rebuilds_a_session_summary_keyed_by_session_id(tmp_path):
+    from sqlalchemy import inspect
+
+    from app.services.database import Base, create_db_engine
+
+    legacy_engine = create_db_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with legacy_engine.begin() as conn:
+        conn.execute(text("CREATE TABLE session_summary (session_id VARCHAR PRIMARY KEY, user_id INTEGER, summary TEXT, "
+                          "turn_count INTEGER, updated_at DATETIME)"))
+        conn.execute(text("CREATE INDEX ix_session_summary_user_id ON session_summary (user_id)"))
+        conn.execute(text("INSERT INTO session_summary VALUES ('s1', 1, 'noir', 3, '2025-01-01 00:00:00.000000'), "
+                          "('s2', NULL, 'orphan', 1, '2025-01-01 00:00:00.000000')"))
+    Base.metadata.create_all(bind=legacy_engine)
+
+    history_manager.rekey_session_summaries(legacy_engine)
+    history_manager.rekey_session_summaries(legacy_engine)  # already rekeyed: a no-op
+
+    inspector = inspect(legacy_engine)
+    assert inspector.get_pk_constraint("session_summary")["constrained_columns"] == ["user_id", "session_id"]
+    assert "ix_session_summary_user_updated" in {index["name"] for index in inspector.get_indexes("session_summary")}
+    with legacy_engine.connect() as conn:
+        rows = conn.execute(text("SELECT user_id, session_id, summary, turn_count, started_at FROM session_summary")).all()
+    assert [tuple(row) for row in rows] == [(1, "s1", "noir", 3, None)]
+    legacy_engine.dispose()
+
+
+def collect_pages(run_async, fetch_page):
+    pages, cursor = [], None
+    while True:
+        items, cursor = run_async(lambda adb: fetch_page(adb, cursor))
+        pages.append(items)
+        if cursor is None:
+            return pages
+
+
+def test_sessions_are_paged_by_latest_turn_without_gaps_or_repeats(db, user, run_async):
+    start = datetime(2025, 1, 1)
+    for i in range(5):
+        store_turn(db, user.id, f"s{i}", "first", start + timedelta(minutes=i))
+    store_turn(db, user.id, "s0", "resumed", start + timedelta(hours=1))
+    # Same latest timestamp: the session id breaks the tie.
+    store_turn(db, user.id, "s5", "first", start + timedelta(minutes=4))
+
+    pages = collect_pages(run_async, lambda adb, cursor: history_manager.aget_sessions_page(adb, user.id, limit=2, cursor=cursor))
+
+    assert [[session["session_id"] for session in page] for page in pages] == [["s0", "s5"], ["s4", "s3"], ["s2", "s1"]]
+    assert pages[0][0]["turn_count"] == 2
+    assert pages[0][0]["started_at"] == start
+
+
+def test_turns_are_paged_newest_first(db, user, run_async):
+    start = datetime(2025, 1, 1)
+    for i in range(5):
+        store_turn(db, user.id, "s1", f"turn {i}", start + timedelta(minutes=i))
+
+    pages = collect_pages(run_async, lambda adb, cursor: history_manager.aget_session_turns_page(adb, user.id, "s1", limit=2, cursor=cursor))
+
+    assert [[turn.user_message for turn in page] for page in pages] == [["turn 4", "turn 3"], ["turn 2", "turn 1"], ["turn 0"]]
+
+
+def test_sessions_page_is_an_index_range_scan(engine):
+    with engine.connect() as conn:
+        plan = " ".join(row[-1] for row in conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT session_id FROM session_summary WHERE user_id = 1 "
+            "AND (updated_at < '2025-01-01' OR (updated_at = '2025-01-01' AND session_id < 'x')) "
+            "ORDER BY updated_at DESC, session_id DESC LIMIT 21"
+        )))
+    assert "ix_session_summary_user_updated" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_backfill_adds_summaries_for_sessions_that_predate_them(db, user, engine):
+    start = datetime(2025, 1, 1)
+    for i in range(3):
+        db.add(history_manager.build_interaction(user.id, "legacy", f"turn {i}", "ok", [], timestamp=start + timedelta(minutes=i)))
+    # A summary row written before started_at existed: counted only its own turns.
+    db.add(history_manager.build_interaction(user.id, "partial", "turn", "ok", [], timestamp=start))
+    db.add(history_manager.build_interaction(user.id, "partial", "turn", "ok", [], timestamp=start + timedelta(minutes=1)))
+    db.add(SessionSummaryInDB(session_id="partial", user_id=user.id, summary="talked about noir", turn_count=1, updated_at=datetime(2030, 1, 1)))
+    db.commit()
+
+    history_manager.backfill_session_summaries(engine)
+    history_manager.backfill_session_summaries(engine)  # idempotent
+
+    db.expire_all()
+    legacy = db.get(SessionSummaryInDB, (user.id, "legacy"))
+    assert (legacy.summary, legacy.turn_count, legacy.started_at, legacy.updated_at) == (None, 3, start, start + timedelta(minutes=2))
+    partial = db.get(SessionSummaryInDB, (user.id, "partial"))
+    assert (partial.summary, partial.turn_count, partial.started_at, partial.updated_at) == (
+        "talked about noir", 2, start, start + timedelta(minutes=1)
+    )
+
+
+def test_backfill_keeps_users_sharing_a_session_id_apart(db, user, other_user, engine, run_async):
+    start = datetime(2025, 1, 1)
+    db.add(history_manager.build_interaction(user.id, "shared", "mine", "ok", [], timestamp=start))
+    db.add(history_manager.build_interaction(user.id, "shared", "mine again", "ok", [], timestamp=start + timedelta(minutes=1)))
+    db.add(history_manager.build_interaction(other_user.id, "shared", "theirs", "ok", [], timestamp=start + timedelta(hours=1)))
+    # Written before started_at existed; only this user's turns belong to it.
+    db.add(SessionSummaryInDB(session_id="shared", user_id=user.id, summary="noir", turn_count=1))
+    db.commit()
+
+    history_manager.backfill_session_summaries(engine)
+
+    mine, _ = run_async(lambda adb: history_manager.aget_sessions_page(adb, user.id))
+    theirs, _ = run_async(lambda adb: history_manager.aget_sessions_page(adb, other_user.id))
+    assert [(s["session_id"], s["turn_count"], s["started_at"], s["last_message_at"]) for s in mine] == [
+        ("shared", 2, start, start + timedelta(minutes=1))
+    ]
+    assert [(s["session_id"], s["turn_count"], s["started_at"]) for s in theirs] == [("shared", 1, start + timedelta(hours=1))]
+
+
+def craft_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trips():
+    timestamp = datetime(2025, 1, 1, 12, 30)
+    assert history_manager.decode_cursor(history_manager.encode_cursor(timestamp, "s1"), str) == (timestamp, "s1")
+    assert history_manager.decode_cursor(history_manager.encode_cursor(timestamp, 42), int) == (timestamp, 42)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 !",
+    craft_cursor({"a": 1}),
+    craft_cursor(["2025-01-01T00:00:00"]),
+    craft_cursor(["2025-01-01T00:00:00", ["s1"]]),
+    craft_cursor(["2025-01-01T00:00:00", {"id": 1}]),
+    craft_cursor(["2025-01-01T00:00:00", True]),
+    craft_cursor([1735689600, 1]),
+    craft_cursor([None, 1]),
+    craft_cursor(["yesterday", 1]),
+    craft_cursor(["2025-01-01T00:00:00", "1"]),
+])
+def test_crafted_turn_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        history_manager.decode_cursor(cursor, int)
+
+
+def test_session_cursor_needs_a_string_key():
+    with pytest.raises(ValueError):
+        history_manager.decode_cursor(craft_cursor(["2025-01-01T00:00:00", 7]), str)
+
+
+def test_crafted_cursor_is_a_400_not_a_500(db, user, engine):
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from app.core.security import get_current_active_user
+    from app.main import app
+    from app.services.database import create_async_db_engine, get_async_db
+
+    async_engine = create_async_db_engine(str(engine.url).replace("sqlite://", "sqlite+aiosqlite://", 1))
+
+    async def test_db():
+        async with async_sessionmaker(bind=async_engine, expire_on_commit=False)() as async_db:
+            yield async_db
+
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    app.dependency_overrides[get_async_db] = test_db
+    try:
+        client = TestClient(app)
+        cursor = craft_cursor(["2025-01-01T00:00:00", {"id": 1}])
+        assert client.get("/api/history/sessions", params={"cursor": cursor}).status_code == 400
+        assert client.get("/api/history/sessions/s1", params={"cursor": cursor}).status_code == 400
+    finally:
+        app.dependency_overrides.clear()
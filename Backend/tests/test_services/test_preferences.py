@@ -0,0 +1,159 @@
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.models.database_models import User, UserPreference
+from app.services import profile_cache, user_manager
+
+
+@pytest.fixture
+def no_decay(monkeypatch):
+    """Increments in these tests are milliseconds apart; without decay their sums are exact."""
+    monkeypatch.setattr(profile_cache, "PREFERENCE_HALF_LIFE_DAYS", 0.0)
+
+
+def preference(db, user_id, value):
+    return db.query(UserPreference).filter_by(user_id=user_id, preference_value=value).one()
+
+
+def test_update_creates_then_increments(db, user, no_decay):
+    created = user_manager.update_user_preference_score(db, user.id, "genre", "noir", 1.5)
+    assert created.score == 1.5
+
+    updated = user_manager.update_user_preference_score(db, user.id, "genre", "noir", 2.0)
+    assert updated.id == created.id
+    assert updated.score == 3.5
+    assert db.query(UserPreference).count() == 1
+
+
+def test_concurrent_increments_are_not_lost(session_factory, user, no_decay):
+    def worker():
+        session = session_factory()
+        try:
+            for _ in range(20):
+                user_manager.update_user_preference_score(session, user.id, "genre", "drama", 1.0)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    session = session_factory()
+    assert preference(session, user.id, "drama").score == 120.0
+    session.close()
+
+
+def test_batch_sums_repeated_preferences_into_one_statement(db, user, no_decay):
+    user_manager.update_user_preference_score(db, user.id, "genre", "drama", 1.0)
+
+    touched = user_manager.apply_preference_deltas(db, [
+        (user.id, "genre", "drama", 2.0),
+        (user.id, "genre", "comedy", 1.0),
+        (user.id, "genre", "drama", 0.5),
+    ])
+    db.commit()
+
+    assert touched == 2
+    assert preference(db, user.id, "drama").score == 3.5
+    assert preference(db, user.id, "comedy").score == 1.0
+    assert user_manager.apply_preference_deltas(db, []) == 0
+
+
+def test_increment_decays_the_stored_score_first(db, user, run_async, monkeypatch):
+    monkeypatch.setattr(profile_cache, "PREFERENCE_HALF_LIFE_DAYS", 30.0)
+    stale = datetime.utcnow() - timedelta(days=60)
+    db.add_all([
+        UserPreference(user_id=user.id, preference_type="genre", preference_value="noir", score=12.0, last_updated=stale),
+        UserPreference(user_id=user.id, preference_type="genre", preference_value="war", score=12.0, last_updated=stale),
+    ])
+    db.commit()
+
+    # Two half-lives old: 12 is worth 3 now, and one fresh reinforcement adds to that.
+    noir = user_manager.update_user_preference_score(db, user.id, "genre", "noir", 1.0)
+    assert noir.score == pytest.approx(4.0, rel=1e-6)
+    assert noir.last_updated > stale
+    run_async(lambda adb: user_manager.aupdate_user_preference_score(adb, user.id, "genre", "war", 1.0))
+    db.expire_all()
+    assert preference(db, user.id, "war").score == pytest.approx(4.0, rel=1e-6)
+
+    # Read back right away, the decayed score is the one just written.
+    np.testing.assert_allclose(profile_cache.decayed_scores([preference(db, user.id, "noir")]), [4.0], rtol=1e-6)
+
+
+def test_every_update_bumps_profile_version(db, user):
+    user_manager.update_user_preference_score(db, user.id, "genre", "drama", 1.0)
+    user_manager.apply_preference_deltas(db, [(user.id, "genre", "drama", 1.0), (user.id, "genre", "war", 1.0)])
+    db.commit()
+
+    db.expire_all()
+    assert db.get(User, user.id).profile_version == 2
+
+
+def test_merge_duplicate_preferences_folds_rows_before_the_unique_index(tmp_path):
+    from sqlalchemy import inspect, text
+
+    from app.services.database import Base, create_db_engine, migrate_schema
+
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE user_preferences (id INTEGER PRIMARY KEY, user_id INTEGER, preference_type VARCHAR, "
+                          "preference_value VARCHAR, score FLOAT, last_updated DATETIME)"))
+        conn.execute(text("INSERT INTO user_preferences (user_id, preference_type, preference_value, score, last_updated) VALUES "
+                          "(1, 'genre', 'noir', 1.0, '2025-01-01'), (1, 'genre', 'noir', 2.5, '2025-03-01'), "
+                          "(1, 'genre', 'war', 4.0, '2025-01-01')"))
+    Base.metadata.create_all(bind=engine)
+
+    user_manager.merge_duplicate_preferences(engine)
+    migrate_schema(engine)
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT id, preference_value, score, last_updated FROM user_preferences ORDER BY id")).all()
+    assert [(row.id, row.preference_value, row.score) for row in rows] == [(1, "noir", 3.5), (3, "war", 4.0)]
+    assert rows[0].last_updated.startswith("2025-03-01")
+    assert "ux_user_preferences_user_type_value" in {index["name"] for index in inspect(engine).get_indexes("user_preferences")}
+    engine.dispose()
+
+
+def stub_preference(value, score, age_days, now):
+    return SimpleNamespace(preference_value=value, score=score, last_updated=now - timedelta(days=age_days))
+
+
+def test_decayed_scores_halve_every_half_life(monkeypatch):
+    monkeypatch.setattr(profile_cache, "PREFERENCE_HALF_LIFE_DAYS", 30.0)
+    now = datetime(2025, 6, 1)
+    preferences = [
+        stub_preference("fresh", 8.0, 0, now),
+        stub_preference("month", 8.0, 30, now),
+        stub_preference("two months", 8.0, 60, now),
+        SimpleNamespace(preference_value="unscored", score=None, last_updated=None),
+        stub_preference("future", 8.0, -1, now),  # clock skew never inflates a score
+    ]
+
+    np.testing.assert_allclose(profile_cache.decayed_scores(preferences, now), [8.0, 4.0, 2.0, 0.0, 8.0])
+
+
+def test_decay_can_be_turned_off(monkeypatch):
+    monkeypatch.setattr(profile_cache, "PREFERENCE_HALF_LIFE_DAYS", 0.0)
+    now = datetime(2025, 6, 1)
+    np.testing.assert_allclose(profile_cache.decayed_scores([stub_preference("old", 3.0, 365, now)], now), [3.0])
+
+
+def test_ranking_uses_decayed_scores_and_breaks_ties_by_value(monkeypatch):
+    monkeypatch.setattr(profile_cache, "PREFERENCE_HALF_LIFE_DAYS", 30.0)
+    now = datetime.utcnow()
+    preferences = [
+        stub_preference("old favourite", 10.0, 300, now),
+        stub_preference("recent", 2.0, 0, now),
+        stub_preference("b-tie", 1.0, 0, now),
+        stub_preference("a-tie", 1.0, 0, now),
+    ]
+
+    ranked = [pref.preference_value for pref in profile_cache.rank_preferences(preferences)]
+    assert ranked == ["recent", "a-tie", "b-tie", "old favourite"]
+    assert profile_cache.rank_preferences([]) == []
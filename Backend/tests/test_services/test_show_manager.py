@@ -0,0 +1,46 @@
+import json
+
+from app.models.database_models import CachedShow
+from app.models.pydantic_models import ShowData
+from app.services import show_manager
+
+
+def make_show(show_id="1", title="Dark", **overrides) -> ShowData:
+    fields = dict(
+        show_id=show_id, title=title, type="tv", genres=["Drama"], plot="Time travel in Winden.",
+        release_date="2017-12-01", runtime="60", cast=["Louis Hofmann"], directors=["Baran bo Odar"],
+        poster_url="/dark.jpg", tmdb_rating=8.4
+    )
+    fields.update(overrides)
+    return ShowData(**fields)
+
+
+def test_upsert_shows_counts_inserts_updates_and_skips(db):
+    counts = show_manager.upsert_shows(db, [make_show("1"), make_show("2", "1899")])
+    assert counts == {"inserted": 2, "updated": 0, "skipped": 0}
+
+    counts = show_manager.upsert_shows(db, [
+        make_show("1", "Dark (renamed)"),
+        make_show("3", "Barbarians"),
+        make_show("3", "Barbarians (later copy)"),
+        make_show("not-an-id"),
+    ])
+    assert counts == {"inserted": 1, "updated": 1, "skipped": 2}
+    assert db.get(CachedShow, 1).title == "Dark (renamed)"
+    assert db.get(CachedShow, 3).title == "Barbarians (later copy)"
+
+
+def test_upsert_shows_keeps_stored_values_for_missing_fields(db):
+    show_manager.upsert_shows(db, [make_show("1")])
+
+    # A partial re-import: no plot, poster or cast.
+    partial = make_show("1", "Dark (partial)").model_copy(update={"plot": None, "poster_url": None, "cast": None})
+    counts = show_manager.upsert_shows(db, [partial])
+
+    assert counts["updated"] == 1
+    db.expire_all()
+    stored = db.get(CachedShow, 1)
+    assert stored.title == "Dark (partial)"
+    assert stored.plot == "Time travel in Winden."
+    assert stored.poster_url == "/dark.jpg"
+    assert json.loads(stored.cast) == ["Louis Hofmann"]
@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+import requests
+
+from app.services import tmdb_client
+from app.services.tmdb_client import TMDBClient, TMDBResponseCache
+
+SHOW = {"id": 1399, "name": "Game of Thrones", "overview": "Seven noble families...", "first_air_date": "2011-04-17",
+        "genres": [{"name": "Drama"}], "credits": {"cast": [], "crew": []}, "vote_average": 8.4}
+HTML = b"<html><body>502 Bad Gateway</body></html>"
+
+
+def make_client(max_retries=2) -> TMDBClient:
+    return TMDBClient(
+        "key", max_retries=max_retries, backoff_base=0.0, rate_limit_per_second=1000, rate_limit_burst=1000,
+        cache=TMDBResponseCache(max_entries=100)
+    )
+
+
+def requests_response(body: bytes) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    return response
+
+
+class ScriptedSession:
+    def __init__(self, bodies):
+        self.bodies = list(bodies)
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        return requests_response(self.bodies.pop(0))
+
+
+@pytest.fixture
+def scripted_async(monkeypatch):
+    def install(bodies):
+        bodies = list(bodies)
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, content=bodies.pop(0))
+
+        monkeypatch.setattr(tmdb_client, "get_async_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        return calls
+    return install
+
+
+def test_non_json_body_is_retried():
+    client = make_client()
+    client.session = ScriptedSession([HTML, b'{"id": 1399, "na', json.dumps(SHOW).encode()])
+
+    assert client.get("/tv/1399", cache_kind=tmdb_client.CACHE_DETAILS) == SHOW
+    assert client.session.calls == 3
+    stats = client.get_stats()
+    assert (stats["bad_payloads"], stats["retries"], stats["errors"]) == (2, 2, 0)
+
+
+def test_persistent_non_json_body_returns_none_and_is_not_cached():
+    client = make_client(max_retries=1)
+    client.session = ScriptedSession([HTML, HTML, json.dumps(SHOW).encode()])
+
+    assert client.get_show_details(1399, "tv") is None
+    assert client.get_stats()["errors"] == 1
+    # Not negative-cached: the next call reaches TMDB again and succeeds.
+    assert client.get_show_details(1399, "tv").title == "Game of Thrones"
+
+
+def test_json_that_is_not_an_object_is_rejected():
+    client = make_client(max_retries=0)
+    client.session = ScriptedSession([b"null"])
+    assert client.search_shows("dark") == []
+
+
+def test_async_non_json_body_is_retried_then_returns_none(scripted_async):
+    calls = scripted_async([HTML, json.dumps(SHOW).encode()])
+    client = make_client(max_retries=1)
+    assert asyncio.run(client.aget_show_details(1399, "tv")).title == "Game of Thrones"
+    assert len(calls) == 2
+
+    calls = scripted_async([HTML, HTML])
+    client = make_client(max_retries=1)
+    assert asyncio.run(client.aget_show_details(1400, "tv")) is None
+    assert client.get_stats()["bad_payloads"] == 2
@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import auth
+from app.core.security import get_current_active_user
+from app.models.database_models import User
+from app.services import user_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    user_cache.active_users.clear()
+    yield
+    user_cache.active_users.clear()
+
+
+def fake_request():
+    return SimpleNamespace(state=SimpleNamespace())
+
+
+def test_active_user_is_served_from_the_cache(db, user):
+    first = user_cache.get_user(db, user.id)
+    hits = user_cache.active_users.get_stats()["hits"]
+
+    assert user_cache.get_user(db, user.id) == first
+    assert user_cache.active_users.get_stats()["hits"] == hits + 1
+
+
+def test_request_memo_answers_repeat_lookups(db, user):
+    request = fake_request()
+    user_cache.get_user(db, user.id, request)
+    request_hits = user_cache.active_users.get_stats()["request_hits"]
+
+    user_cache.get_user(db, user.id, request)
+    assert user_cache.active_users.get_stats()["request_hits"] == request_hits + 1
+
+
+def test_committed_update_invalidates_the_cached_user(db, user):
+    assert user_cache.get_user(db, user.id).is_active
+
+    user.is_active = False
+    db.commit()
+
+    assert user_cache.get_user(db, user.id).is_active is False
+
+
+def test_rolled_back_update_does_not_invalidate(db, user):
+    user_cache.get_user(db, user.id)
+    invalidations = user_cache.active_users.get_stats()["invalidations"]
+
+    user.user_email = "changed@example.com"
+    db.flush()
+    db.rollback()
+
+    assert user_cache.active_users.get_stats()["invalidations"] == invalidations
+    assert user_cache.get_user(db, user.id).user_email == "tester@example.com"
+
+
+def test_load_that_raced_an_invalidation_is_not_stored(db, user):
+    epoch = user_cache.active_users.epoch
+    stale = user_cache.get_user(db, user.id)
+    user_cache.active_users.clear()
+
+    user_cache.invalidate_user(user.id)
+    user_cache.active_users.set(user.id, stale, epoch)
+
+    assert user_cache.active_users.get(user.id) is None
+
+
+def test_inactive_users_are_not_cached(db, user):
+    user.is_active = False
+    db.commit()
+
+    user_cache.get_user(db, user.id)
+    assert user_cache.active_users.get_stats()["size"] == 0
+
+
+def test_deactivated_user_is_rejected_on_their_next_request(db, user):
+    token = auth.create_access_token({"sub": str(user.id)})
+    assert get_current_active_user(fake_request(), db, token).user_name == "tester"
+
+    db.get(User, user.id).is_active = False
+    db.commit()
+
+    with pytest.raises(HTTPException) as rejected:
+        get_current_active_user(fake_request(), db, token)
+    assert rejected.value.status_code == 400
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from app.services.vector_store import NumpyVectorIndex, RECORDS_FILE, VECTORS_FILE
+
+
+def make_index(path, vectors, prefix="doc"):
+    index = NumpyVectorIndex(str(path))
+    index.append(
+        vectors,
+        [f"{prefix} {i}" for i in range(len(vectors))],
+        [{"row": i} for i in range(len(vectors))],
+        [f"{prefix}-{i}" for i in range(len(vectors))]
+    )
+    return index
+
+
+def clustered_vectors(count=2000, dim=32, clusters=40, seed=1):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(clusters, size=count)] + 0.3 * rng.normal(size=(count, dim))).astype(np.float32)
+
+
+def ids(results):
+    return [record["id"] for record, _ in results]
+
+
+def test_reload_maps_the_same_vectors_and_records(tmp_path):
+    vectors = clustered_vectors(count=50)
+    index = make_index(tmp_path, vectors)
+    query = vectors[7]
+
+    reloaded = NumpyVectorIndex(str(tmp_path))
+
+    assert len(reloaded) == 50 and reloaded.dim == 32
+    assert isinstance(reloaded._matrix, np.memmap)
+    assert ids(reloaded.search(query, k=5)) == ids(index.search(query, k=5))
+    record, score = reloaded.search(query, k=1)[0]
+    assert record == {"id": "doc-7", "text": "doc 7", "metadata": {"row": 7}}
+    assert score == pytest.approx(1.0, abs=1e-5)
+
+
+def test_reload_ignores_rows_past_the_manifest(tmp_path):
+    make_index(tmp_path, clustered_vectors(count=10))
+    # An append interrupted before its manifest write leaves extra rows behind.
+    with open(tmp_path / VECTORS_FILE, "ab") as f:
+        f.write(np.ones((2, 32), dtype=np.float32).tobytes())
+    with open(tmp_path / RECORDS_FILE, "a") as f:
+        f.write('{"id": "torn", "text": "torn", "metadata": {}}\n')
+
+    reloaded = NumpyVectorIndex(str(tmp_path))
+    assert len(reloaded) == 10
+    reloaded.append(np.ones((1, 32), dtype=np.float32), ["next"], [{}], ["next"])
+
+    assert "torn" not in ids(NumpyVectorIndex(str(tmp_path)).search(np.ones(32), k=11))
+    assert len(NumpyVectorIndex(str(tmp_path))) == 11
+
+
+def test_append_with_an_existing_id_supersedes_the_old_row(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path))
+    index.append(np.array([[1.0, 0.0], [0.0, 1.0]]), ["old a", "b"], [{}, {}], ["a", "b"])
+    index.append(np.array([[0.6, 0.8]]), ["new a"], [{}], ["a"])
+
+    for current in (index, NumpyVectorIndex(str(tmp_path))):
+        results = current.search([1.0, 0.0], k=3)
+        assert [(record["text"], round(score, 4)) for record, score in results] == [("new a", 0.6), ("b", 0.0)]
+        assert current.get_stats()["vectors"] == 3 and current.get_stats()["live_vectors"] == 2
+
+
+def test_append_rejects_a_different_dimension(tmp_path):
+    index = make_index(tmp_path, clustered_vectors(count=3))
+    with pytest.raises(ValueError):
+        index.append(np.ones((1, 8)), ["x"], [{}], ["x"])
+
+
+def test_ivf_recall_against_exact_search(tmp_path):
+    vectors = clustered_vectors()
+    index = make_index(tmp_path, vectors)
+    queries = clustered_vectors(count=50, seed=2)
+    exact = [set(ids(index.search(query, k=10))) for query in queries]
+
+    assert index.build_ivf(n_lists=40) == 40
+    for current in (index, NumpyVectorIndex(str(tmp_path))):
+        approximate = [set(ids(current.search(query, k=10, nprobe=8))) for query in queries]
+        recall = np.mean([len(found & truth) / 10 for found, truth in zip(approximate, exact)])
+        assert recall >= 0.9
+        # Probing every list is exact again.
+        assert [set(ids(current.search(query, k=10, nprobe=40))) for query in queries] == exact
+
+
+def test_rows_appended_after_the_ivf_build_are_searched(tmp_path):
+    index = make_index(tmp_path, clustered_vectors(count=200))
+    index.build_ivf(n_lists=10)
+    fresh = np.zeros((1, 32), dtype=np.float32)
+    fresh[0, 0] = 1.0
+    index.append(fresh, ["fresh"], [{}], ["fresh"])
+
+    assert ids(index.search(fresh[0], k=1, nprobe=1)) == ["fresh"]
+    assert index.get_stats()["ivf_indexed"] == 200
+
+
+def test_ivf_lists_are_capped_at_the_sample_size(tmp_path):
+    index = make_index(tmp_path, clustered_vectors(count=100))
+
+    assert index.build_ivf(n_lists=50, sample_size=10) == 10
+    assert index.get_stats()["ivf_lists"] == 10
+    assert len(index.search(clustered_vectors(count=1, seed=3)[0], k=5, nprobe=10)) == 5
@@ -0,0 +1,153 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.database_models import InteractionHistoryInDB, SessionSummaryInDB, UserPreference
+from app.models.pydantic_models import RetrievedShow
+from app.services import history_manager, write_behind
+
+
+@pytest.fixture
+def worker(session_factory, monkeypatch):
+    """The write-behind worker, writing to the test database."""
+    monkeypatch.setattr(write_behind, "SessionLocal", session_factory)
+    monkeypatch.setattr(write_behind, "WRITE_BEHIND_ENABLED", True)
+    write_behind.start_worker()
+    yield write_behind
+    write_behind.stop_worker()
+
+
+def pending_turn(user_id, session_id, message, timestamp, shows=()):
+    return write_behind.PendingInteraction(
+        user_id, session_id, message, f"re: {message}", list(shows), None, "chat", "rules", timestamp, 0.0
+    )
+
+
+def store_turn(db, user_id, session_id, message, timestamp):
+    db.add(history_manager.build_interaction(user_id, session_id, message, "ok", [], timestamp=timestamp))
+    summary_row = db.get(SessionSummaryInDB, (user_id, session_id))
+    db.add(history_manager.apply_session_summary(summary_row, user_id, session_id, None, [], timestamp))
+    db.commit()
+
+
+def test_stop_worker_flushes_queued_writes(worker, db, user):
+    show = RetrievedShow(show_id=None, title="Dark")
+    assert worker.enqueue_interaction(user.id, "s1", "hi", "hello", [show], context_summary="greeting")
+    assert worker.enqueue_interaction(user.id, "s1", "more", "sure", [])
+    assert worker.enqueue_preference(user.id, "genre", "drama", 1.0)
+    assert worker.enqueue_preference(user.id, "genre", "drama", 2.0)
+
+    worker.stop_worker()
+
+    turns = db.query(InteractionHistoryInDB).filter_by(session_id="s1").order_by(InteractionHistoryInDB.timestamp).all()
+    assert [turn.user_message for turn in turns] == ["hi", "more"]
+    assert turns[0].recommended_shows[0].show_title == "Dark"
+    assert db.get(SessionSummaryInDB, (user.id, "s1")).turn_count == 2
+    assert db.query(UserPreference).filter_by(preference_value="drama").one().score == 3.0
+
+    assert worker.pending_interactions(user.id, "s1") == []
+    assert worker.pending_preferences(user.id) == []
+    stats = worker.get_stats()
+    assert stats["written"] == 4 and stats["pending"] == 0 and stats["failed"] == 0
+
+
+def test_enqueue_is_refused_when_the_worker_is_not_running(user):
+    assert write_behind.enqueue_interaction(user.id, "s1", "hi", "hello", []) is False
+    assert write_behind.pending_interactions(user.id, "s1") == []
+
+
+def test_chat_history_reads_its_own_pending_writes(db, user):
+    now = datetime.utcnow()
+    db.add(history_manager.build_interaction(user.id, "s1", "stored", "ok", [], timestamp=now - timedelta(seconds=5)))
+    db.commit()
+
+    pending = [pending_turn(user.id, "s1", "queued", now)]
+    history = history_manager.get_chat_history(db, user.id, "s1", limit=10, pending=pending)
+
+    assert history.index("stored") < history.index("queued")
+
+
+def test_pending_turn_committed_in_between_is_not_repeated(db, user):
+    now = datetime.utcnow()
+    committed = pending_turn(user.id, "s1", "once", now)
+    db.add(history_manager.build_interaction(user.id, "s1", "once", "re: once", [], timestamp=now))
+    db.commit()
+
+    history = history_manager.get_chat_history(db, user.id, "s1", limit=10, pending=[committed])
+
+    assert history.count("User: once") == 1
+
+
+def collect_pages(run_async, fetch_page):
+    pages, cursor = [], None
+    while True:
+        items, cursor = run_async(lambda adb: fetch_page(adb, cursor))
+        pages.append(items)
+        if cursor is None:
+            return pages
+
+
+def test_pending_turns_are_added_to_the_first_turn_page(db, user, run_async):
+    now = datetime.utcnow()
+    for seconds in (30, 20, 10):
+        store_turn(db, user.id, "s1", f"stored {seconds}", now - timedelta(seconds=seconds))
+    pending = [pending_turn(user.id, "s1", "queued", now, [RetrievedShow(show_id=7, title="Ozark")])]
+
+    pages = collect_pages(run_async, lambda adb, cursor: history_manager.aget_session_turns_page(adb, user.id, "s1", limit=2, cursor=cursor, pending=pending))
+
+    assert [[turn.user_message for turn in page] for page in pages] == [["queued", "stored 10", "stored 20"], ["stored 30"]]
+
+
+def test_pending_turn_at_the_page_boundary_skips_no_stored_turn(db, user, run_async):
+    # A turn written synchronously after this one was queued is stored with a later timestamp.
+    now = datetime.utcnow()
+    store_turn(db, user.id, "s1", "older", now - timedelta(seconds=30))
+    store_turn(db, user.id, "s1", "newer", now - timedelta(seconds=10))
+    pending = [pending_turn(user.id, "s1", "queued", now - timedelta(seconds=20))]
+
+    pages = collect_pages(run_async, lambda adb, cursor: history_manager.aget_session_turns_page(adb, user.id, "s1", limit=1, cursor=cursor, pending=pending))
+
+    assert [[turn.user_message for turn in page] for page in pages] == [["newer", "queued"], ["older"]]
+
+
+def test_session_moved_up_by_a_pending_turn_is_listed_once(db, user, run_async):
+    start = datetime(2025, 1, 1)
+    for i in range(5):
+        store_turn(db, user.id, f"s{i}", "stored", start + timedelta(minutes=i))
+    pending = [pending_turn(user.id, "s0", "queued", datetime.utcnow())]
+
+    pages = collect_pages(run_async, lambda adb, cursor: history_manager.aget_sessions_page(adb, user.id, limit=2, cursor=cursor, pending=pending))
+
+    assert [[session["session_id"] for session in page] for page in pages] == [["s0", "s4", "s3"], ["s2", "s1"]]
+    assert pages[0][0]["turn_count"] == 2
+
+
+def test_batch_keeps_summaries_of_users_sharing_a_session_id_apart(worker, db, user, other_user):
+    now = datetime.utcnow()
+    worker._write_batch([
+        pending_turn(user.id, "shared", "mine", now),
+        pending_turn(other_user.id, "shared", "theirs", now + timedelta(seconds=1)),
+        pending_turn(user.id, "shared", "mine again", now + timedelta(seconds=2)),
+    ])
+
+    assert db.get(SessionSummaryInDB, (user.id, "shared")).turn_count == 2
+    assert db.get(SessionSummaryInDB, (other_user.id, "shared")).turn_count == 1
+
+
+def test_session_page_lists_sessions_with_only_pending_turns(db, user, run_async):
+    now = datetime.utcnow()
+    store_turn(db, user.id, "old", "stored", now - timedelta(minutes=5))
+    store_turn(db, user.id, "resumed", "stored", now - timedelta(minutes=10))
+    pending = [
+        pending_turn(user.id, "new", "queued", now - timedelta(seconds=2)),
+        pending_turn(user.id, "resumed", "queued", now),
+    ]
+
+    sessions, _ = run_async(lambda adb: history_manager.aget_sessions_page(adb, user.id, limit=10, pending=pending))
+
+    assert [session["session_id"] for session in sessions] == ["resumed", "new", "old"]
+    resumed = sessions[0]
+    assert resumed["turn_count"] == 2
+    assert resumed["started_at"] == now - timedelta(minutes=10)
+    assert resumed["last_message_at"] == now
+    assert sessions[1]["turn_count"] == 1